@@ -1,118 +1,267 @@
 # ID_Manager_v4.0.py
+import argparse
 import sys
-import os
-import json
 import threading
+import time
+import multiprocessing
 import tkinter as tk
 from tkinter import messagebox, simpledialog, filedialog
-from ttkbootstrap import Style, Label, Entry, Button, Frame
-
-
-def get_resource_path(relative_path):
-    """获取资源的绝对路径（支持开发模式和打包模式）"""
-    try:
-        base_path = sys._MEIPASS  # PyInstaller创建的临时文件夹
-    except AttributeError:
-        base_path = os.path.abspath(".")
-
-    # 如果目标路径不存在则自动创建（用于database.sfz）
-    full_path = os.path.join(base_path, relative_path)
-    dir_path = os.path.dirname(full_path)
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-
-    return full_path
-
-
-def validate_check_code(id_number):
-    """验证身份证校验码"""
-    if len(id_number) != 18:
-        return False
-    try:
-        coeffs = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
-        check_codes = "10X98765432"
-        total = sum(int(a) * b for a, b in zip(id_number[:17], coeffs))
-        return id_number[-1].upper() == check_codes[total % 11]
-    except:
-        return False
-
-
-class AreaCodeLoader:
-    """行政区划数据加载器"""
-
-    @classmethod
-    def load(cls):
-        area_map = {}
-        path = get_resource_path("config/area_code.json")
-
-        def process_node(node, parent_names=[]):
-            code = str(node["code"])[:6]
-            current_name = node["name"]
-            current_level = node["level"]
-
-            if current_level == 1 and current_name.endswith(("市", "省", "自治区")):
-                parent_names = [current_name]
-
-            full_name = "".join(parent_names) + current_name
-            area_map[code] = full_name.replace("市辖区", "")
-
-            if "children" in node:
-                new_parent = parent_names.copy()
-                if current_level == 1:
-                    new_parent = [current_name]
-                elif current_level == 2 and current_name != "市辖区":
-                    new_parent.append(current_name)
-                for child in node["children"]:
-                    process_node(child, new_parent)
 
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for province in data:
-                    process_node(province)
-            return area_map
-        except Exception as e:
-            messagebox.showerror(
-                "致命错误",
-                f"无法加载行政区划数据：\n{str(e)}\n"
-                f"请确认config/area_code.json存在且格式正确",
-            )
-            sys.exit(1)
+from idcard import instrument
+from idcard.area import AreaCodeLoader, AreaDataError
+from idcard.browse import SORT_AREA, SORT_BIRTH, SORT_NAME, RowSource
+from idcard.importer import (
+    DEFAULT_WORKERS,
+    BatchImporter,
+    ImportCancelled,
+    ImportCheckpoint,
+)
+from idcard.parser import CachedParser
+from idcard.progress import ProgressReporter
+from idcard.query import GENDER_FEMALE, GENDER_MALE, RecordFilter, RecordQuery
+from idcard.search import SearchIndex, is_id_query
+from idcard.table import store_table
+from idcard.paths import get_resource_path
+from idcard.store import RECORD_EXISTS, RECORD_NEW, STORE_BACKENDS, create_store
+from idcard.validator import check_id_number
+
+
+class VirtualTable:
+    """只渲染可见行的记录列表
+
+    Treeview中始终只有一屏的行，滚动时复用这些行并从RowSource读取对应数据，
+    记录数再多也不会创建更多控件。排序只重排行号，大量记录时在后台线程进行。
+    """
+
+    COLUMNS = (
+        ("name", "姓名", 110, SORT_NAME),
+        ("id", "身份证号", 190, None),
+        ("area", "户籍地", 250, SORT_AREA),
+        ("birth", "出生日期", 110, SORT_BIRTH),
+        ("gender", "性别", 60, None),
+    )
+    ROW_HEIGHT = 24
+    HEADING_HEIGHT = 28
+    # 超过这么多行时在后台线程排序
+    ASYNC_SORT_ROWS = 50000
+
+    def __init__(self, master, row_values, on_status):
+        from ttkbootstrap import Frame, Scrollbar, Treeview
+
+        self.row_values = row_values
+        self.on_status = on_status
+        self.source = RowSource()
+        self.top = 0
+        self.visible = 1
+        self.selected = None
+        self._rendered = 0
+        self._sorting = False
+
+        self.frame = Frame(master)
+        self.tree = Treeview(
+            self.frame,
+            columns=[key for key, _, _, _ in self.COLUMNS],
+            show="headings",
+            selectmode="browse",
+        )
+        for key, text, width, sort_key in self.COLUMNS:
+            command = (lambda k=sort_key: self._on_heading(k)) if sort_key else ""
+            self.tree.heading(key, text=text, anchor="w", command=command)
+            self.tree.column(key, width=width, anchor="w")
+        self.scrollbar = Scrollbar(
+            self.frame, orient="vertical", command=self._on_scrollbar
+        )
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        for key, step in (("Up", -1), ("Down", 1)):
+            self.tree.bind(f"<{key}>", lambda e, n=step: self._move_selection(n))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-len(self.source)))
+        self.tree.bind("<End>", lambda e: self._move_selection(len(self.source)))
+
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def set_source(self, source, selected=None):
+        """显示新的行集合，selected为要选中并滚动到的显示位置"""
+        self.source = source
+        self.selected = selected
+        self.top = 0 if selected is None else selected - self.visible // 2
+        self._update_headings()
+        self.render()
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return "break"
+
+    def render(self):
+        """用当前可见范围的数据刷新已有的行"""
+        with instrument.timer("gui.render_rows"):
+            total = len(self.source)
+            self.top = max(0, min(self.top, total - self.visible))
+            rows = self.source.rows(self.top, self.top + self.visible)
+            for i, (name, id_number) in enumerate(rows):
+                values = self.row_values(name, id_number)
+                iid = str(i)
+                if i < self._rendered:
+                    self.tree.item(iid, values=values)
+                else:
+                    self.tree.insert("", "end", iid=iid, values=values)
+            for i in range(len(rows), self._rendered):
+                self.tree.delete(str(i))
+            self._rendered = len(rows)
+
+            if total:
+                self.scrollbar.set(self.top / total, (self.top + len(rows)) / total)
+            else:
+                self.scrollbar.set(0, 1)
+            if self.selected is not None and 0 <= self.selected - self.top < len(rows):
+                self.tree.selection_set(str(self.selected - self.top))
+            else:
+                self.tree.selection_set(())
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.HEADING_HEIGHT) // self.ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.source))
+            self.render()
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_wheel(self, event):
+        # Windows每格为120，macOS为1
+        return self.scroll(-event.delta // 40 or (-1 if event.delta > 0 else 1))
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.top + int(selection[0])
+
+    def _move_selection(self, step):
+        """键盘移动选中行，超出可见范围时滚动"""
+        total = len(self.source)
+        if not total:
+            return "break"
+        current = self.top if self.selected is None else self.selected
+        self.selected = max(0, min(current + step, total - 1))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.render()
+        return "break"
+
+    def _on_heading(self, key):
+        """点击列标题排序，再次点击同一列切换升降序"""
+        if self._sorting or not len(self.source):
+            return
+        descending = key == self.source.sort_key and not self.source.descending
+        source = self.source
+        if len(source) < self.ASYNC_SORT_ROWS:
+            self._apply_order(source, source.ordered_by(key, descending))
+            return
+
+        self._sorting = True
+        self.on_status(f"正在排序 {len(source):,} 条记录……")
 
+        def work():
+            ordered = source.ordered_by(key, descending)
+            self.tree.after(0, lambda: self._apply_order(source, ordered))
 
-def parse_id_info(id_number, area_codes):
-    """解析身份证信息"""
-    code = id_number[:6]
-    location = area_codes.get(code)
-    if not location:  # 分级查询
-        code_4 = id_number[:4] + "00"
-        location = area_codes.get(code_4)
-        if not location:
-            code_2 = id_number[:2] + "0000"
-            location = area_codes.get(code_2, "未知地区")
+        threading.Thread(target=work, daemon=True).start()
 
-    birth_date = f"{id_number[6:10]}-{id_number[10:12]}-{id_number[12:14]}"
-    gender = "男" if int(id_number[16]) % 2 else "女"
-    return {"户籍地": location, "出生日期": birth_date, "性别": gender}
+    def _apply_order(self, source, ordered):
+        self._sorting = False
+        if source is not self.source:
+            return  # 排序期间已切换到其他结果
+        self.on_status(None)
+        self.set_source(ordered)
+
+    def _update_headings(self):
+        for key, text, _, sort_key in self.COLUMNS:
+            if sort_key is not None and sort_key == self.source.sort_key:
+                text += " ▼" if self.source.descending else " ▲"
+            self.tree.heading(key, text=text)
 
 
 class SFZApp:
-    def __init__(self, master):
+    # 后台加载期间检查是否完成的间隔（毫秒）
+    LOAD_POLL_MS = 50
+    # 输入停顿这么久（毫秒）后才执行边输边搜
+    SEARCH_DELAY_MS = 150
+    # 边输边搜最多列出的姓名数、记录数与身份证号数
+    LIVE_NAMES = 50
+    LIVE_ROWS = 1000
+    LIVE_IDS = 200
+
+    def __init__(self, master, backend="csv", workers=DEFAULT_WORKERS):
+        self.started = time.perf_counter()
         self.master = master
         self.master.title("身份证信息管理系统 v4.0")
         self.master.geometry("820x580")
 
-        # 初始化样式
-        self.style = Style(theme="minty")
-        self._configure_styles()
+        self.area_codes = None
+        self.parser = None
+        self.store = create_store(backend)
+        self.checkpoint = ImportCheckpoint.for_store(self.store)
+        self.workers = workers
+        self._importer = None  # 进行中的批量导入
+        self._import_thread = None
+        self._closing = False
+        self.ready = False
+        self._loaded = threading.Event()
+        self._load_errors = []
+        self.search_index = None
+        self.record_filter = None
+        # 列式记录表：文本记录库即其自身的记录表，其他后端为读取后建立的
+        self.records = None
+        self._area_map = None
+        self._index_adds = None  # 重建索引期间新增的记录
+        self._rebuild_again = False
+        self._search_job = None
+        self.master.protocol("WM_DELETE_WINDOW", self._on_close)
+
+        # 先显示窗口，行政区划与记录在后台线程加载
+        self._show_splash()
+        threading.Thread(target=self._load_data, daemon=True).start()
+
+        # 主题与控件只能在界面线程创建，与后台加载同时进行
+        with instrument.timer("startup.style"):
+            self._init_style()
+        with instrument.timer("startup.widgets"):
+            self._create_widgets()
+        self.splash.destroy()
+        self.master.after(self.LOAD_POLL_MS, self._poll_loading)
+
+    def _show_splash(self):
+        """用原生tk控件立即显示加载提示（此时尚未导入ttkbootstrap）"""
+        self.splash = tk.Label(
+            self.master, text="身份证信息管理系统\n\n正在启动……", font=("微软雅黑", 14)
+        )
+        self.splash.place(relx=0.5, rely=0.5, anchor="center")
+        self.master.update()
+        instrument.record("startup.first_paint", time.perf_counter() - self.started)
 
-        # 加载数据
-        self.area_codes = AreaCodeLoader.load()
-        self.database_path = get_resource_path("config/database.sfz")
-        self.existing_records = self._load_records()
+    def _init_style(self):
+        """初始化主题（导入ttkbootstrap较慢，放在窗口显示之后）"""
+        from ttkbootstrap import Style
 
-        # 构建界面
-        self._create_widgets()
+        self.style = Style(theme="minty")
+        self._configure_styles()
 
     def _configure_styles(self):
         """配置界面样式"""
@@ -121,7 +270,9 @@ class SFZApp:
         self.style.configure("status.TLabel", font=("微软雅黑", 10))
 
     def _create_widgets(self):
-        """创建界面组件"""
+        """创建界面组件，加载完成前输入与按钮不可用"""
+        from ttkbootstrap import Button, Combobox, Entry, Frame, Label
+
         main_frame = Frame(self.master)
         main_frame.pack(pady=20, padx=20, fill="both", expand=True)
 
@@ -130,89 +281,384 @@ class SFZApp:
         input_frame.pack(fill="x", pady=10)
 
         Label(input_frame, text="姓　　名：").pack(side="left", padx=5)
-        self.name_entry = Entry(input_frame, width=28)
+        self.name_entry = Entry(input_frame, width=28, state="disabled")
         self.name_entry.pack(side="left", padx=5)
         self.name_entry.bind("<Return>", lambda e: self._search_record())
+        self.name_entry.bind("<KeyRelease>", self._schedule_search)
 
         # 按钮组
         btn_frame = Frame(input_frame)
         btn_frame.pack(side="left", padx=15)
-        Button(
-            btn_frame,
-            text="查询/录入",
-            command=self._search_record,
-            bootstyle="primary",
-        ).pack(side="left", padx=3)
-        Button(
-            btn_frame,
-            text="批量导入",
-            command=self._start_batch_import,
-            bootstyle="success",
-        ).pack(side="left", padx=3)
+        self.buttons = [
+            Button(
+                btn_frame,
+                text="查询/录入",
+                command=self._search_record,
+                bootstyle="primary",
+                state="disabled",
+            ),
+            Button(
+                btn_frame,
+                text="批量导入",
+                command=self._start_batch_import,
+                bootstyle="success",
+                state="disabled",
+            ),
+            Button(
+                btn_frame,
+                text="浏览全部",
+                command=self._browse_all,
+                bootstyle="info",
+                state="disabled",
+            ),
+        ]
+        for button in self.buttons:
+            button.pack(side="left", padx=3)
+
+        # 条件筛选
+        filter_frame = Frame(main_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        Label(filter_frame, text="户 籍 地：").pack(side="left", padx=5)
+        self.area_entry = Entry(filter_frame, width=16, state="disabled")
+        self.area_entry.pack(side="left", padx=5)
+        Label(filter_frame, text="出生").pack(side="left", padx=(10, 2))
+        self.birth_from_entry = Entry(filter_frame, width=10, state="disabled")
+        self.birth_from_entry.pack(side="left")
+        Label(filter_frame, text="至").pack(side="left", padx=2)
+        self.birth_to_entry = Entry(filter_frame, width=10, state="disabled")
+        self.birth_to_entry.pack(side="left")
+        Label(filter_frame, text="性别").pack(side="left", padx=(10, 2))
+        self.gender_box = Combobox(
+            filter_frame,
+            values=("不限", GENDER_MALE, GENDER_FEMALE),
+            width=4,
+            state="disabled",
+        )
+        self.gender_box.set("不限")
+        self.gender_box.pack(side="left")
+        self.filter_entries = [
+            self.area_entry,
+            self.birth_from_entry,
+            self.birth_to_entry,
+        ]
+        for entry in self.filter_entries:
+            entry.bind("<Return>", lambda e: self._run_query())
+        self.buttons.append(
+            Button(
+                filter_frame,
+                text="筛选",
+                command=self._run_query,
+                bootstyle="info-outline",
+                state="disabled",
+            )
+        )
+        self.buttons[-1].pack(side="left", padx=10)
 
         # 结果显示
         self.result_frame = Frame(main_frame)
         self.result_frame.pack(fill="both", expand=True, pady=15)
+        header = Frame(self.result_frame)
+        header.pack(fill="x", pady=(0, 8))
+        self.result_label = Label(header, text="")
+        self.result_label.pack(side="left")
+        self.add_same_button = Button(
+            header,
+            text="新增同名人员",
+            command=lambda: self._add_new_record(self.result_name),
+            bootstyle="primary-outline",
+        )
+        self.result_name = None
+        self.browsing_all = False
+        self.table = VirtualTable(self.result_frame, self._row_values, self._set_status)
+        self.table.pack(fill="both", expand=True)
 
         # 状态栏
         self.status_bar = Label(
             main_frame,
-            text=f"就绪 | 记录总数：{len(self.existing_records)}",
+            text="正在加载行政区划数据与记录……",
             bootstyle="secondary",
         )
         self.status_bar.pack(side="bottom", fill="x")
 
-    def _load_records(self):
-        """加载已有记录"""
-        records = {}
-        if os.path.exists(self.database_path):
-            try:
-                with open(self.database_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        parts = line.strip().split(",", 2)
-                        if len(parts) >= 2:
-                            records[parts[0]] = parts[1]
-            except Exception as e:
-                messagebox.showerror(
+    def _load_data(self):
+        """后台线程：加载行政区划数据与已有记录，不操作界面"""
+        try:
+            self.area_codes = self._load_area_codes()
+            self.parser = CachedParser(self.area_codes, result_cache_size=256)
+        except AreaDataError as e:
+            self._load_errors.append(
+                (
+                    "致命错误",
+                    f"无法加载行政区划数据：\n{str(e)}\n"
+                    f"请确认config/area_code.json存在且格式正确",
+                )
+            )
+            self._loaded.set()
+            return
+        try:
+            self._load_records()
+        except Exception as e:
+            self._load_errors.append(
+                (
                     "数据错误",
-                    f"无法读取数据库文件：\n{str(e)}\n"
-                    "请检查config/database.sfz文件格式",
+                    f"无法读取数据库文件：\n{str(e)}\n请检查config/database.sfz文件格式",
                 )
-        return records
+            )
+        self._loaded.set()
+
+    def _load_area_codes(self):
+        """加载行政区划数据"""
+        with instrument.timer("startup.area_codes"):
+            return AreaCodeLoader.load()
+
+    def _load_records(self):
+        """加载已有记录"""
+        with instrument.timer("gui.load_records"):
+            self.store.load()
+
+    def _poll_loading(self):
+        """在界面线程等待后台加载完成，完成后启用输入"""
+        if not self._loaded.is_set():
+            self.master.after(self.LOAD_POLL_MS, self._poll_loading)
+            return
+
+        for title, message in self._load_errors:
+            messagebox.showerror(title, message)
+        if self.area_codes is None:
+            sys.exit(1)
+
+        elapsed = time.perf_counter() - self.started
+        instrument.record("startup.ready", elapsed)
+        self.ready = True
+        for widget in [self.name_entry, *self.filter_entries, *self.buttons]:
+            widget.config(state="normal")
+        self.gender_box.config(state="readonly")
+        self.name_entry.focus_set()
+        self.status_bar.config(
+            text=f"就绪 | 记录总数：{len(self.store)} | 启动用时 {elapsed:.1f} 秒"
+        )
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """在后台线程（重新）建立搜索索引，期间的新增记录在完成后补入
+
+        文本记录库直接使用其记录表筛选与浏览；其他后端读取一遍建立一份记录表。
+        """
+        if self._closing:
+            return  # 记录库即将关闭，不再读取
+        if self._index_adds is not None:
+            self._rebuild_again = True  # 已在建立，完成后再建一次
+            return
+        self._index_adds = []
+        self._rebuild_again = False
+
+        def work():
+            with instrument.timer("query.build"):
+                records = store_table(self.store)
+            with instrument.timer("gui.search_index"):
+                index = SearchIndex(records)
+            self.master.after(0, lambda: self._install_indexes(index, records))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _install_indexes(self, index, records):
+        for name, id_num in self._index_adds:
+            if id_num not in records:
+                records.add(name, id_num)
+            index.add(name, id_num)
+        self._index_adds = None
+        self.search_index = index
+        if records is not self.records:
+            self.records = records
+            self.record_filter = RecordFilter(records)
+            if self.browsing_all:
+                self._browse_all()
+        if self._rebuild_again:
+            self._build_indexes()
+        if self.name_entry.get().strip():
+            self._live_search()
+
+    def _index_record(self, name, id_num):
+        """新增记录同步进搜索索引（其他后端时还有界面自己的记录表）"""
+        if self._index_adds is not None:
+            self._index_adds.append((name, id_num))
+        if self.search_index is not None:
+            if id_num not in self.records:
+                self.records.add(name, id_num)
+            self.search_index.add(name, id_num)
+            if self.search_index.needs_rebuild:
+                self._build_indexes()
+
+    def _schedule_search(self, event):
+        """输入停顿SEARCH_DELAY_MS毫秒后再搜索，连续输入时只搜最后一次"""
+        if event.keysym in ("Return", "KP_Enter"):
+            return
+        if self._search_job is not None:
+            self.master.after_cancel(self._search_job)
+        self._search_job = self.master.after(self.SEARCH_DELAY_MS, self._live_search)
+
+    def _live_search(self):
+        """按输入的姓名片段、拼音首字母或身份证号前缀列出匹配的记录"""
+        self._search_job = None
+        query = self.name_entry.get().strip()
+        index = self.search_index
+        if not self.ready or index is None or not query:
+            return
+
+        with instrument.timer("gui.live_search"):
+            if is_id_query(query):
+                ids = index.search_ids(query, self.LIVE_IDS)
+                rows = [(self.store.name_of(id_num) or "", id_num) for id_num in ids]
+                text = f"身份证号以“{query}”开头：{len(rows)} 条"
+            else:
+                names = index.search(query, self.LIVE_NAMES)
+                rows = []
+                for name in names:
+                    remaining = self.LIVE_ROWS - len(rows)
+                    if remaining <= 0:
+                        break
+                    rows.extend(
+                        (name, id_num)
+                        for id_num in self.store.ids_for_name(name, limit=remaining)
+                    )
+                text = f"“{query}”匹配 {len(names)} 个姓名，{len(rows)} 条记录"
+            self.browsing_all = False
+            self.result_name = None
+            self.result_label.config(text=text)
+            self.add_same_button.pack_forget()
+            self.table.set_source(RowSource.from_rows(rows))
+
+    def _importing(self):
+        return self._import_thread is not None and self._import_thread.is_alive()
+
+    def _on_close(self):
+        """关闭窗口：批量导入进行中时确认后中止，等后台线程结束再关闭记录库"""
+        if self._closing:
+            return
+        if self._importing():
+            if not messagebox.askyesno(
+                "正在导入",
+                "批量导入尚未完成，是否中止导入并退出？\n"
+                "已导入的记录会保留，下次导入同一文件时可从中断处继续。",
+            ):
+                return
+            self._importer.cancel()
+        self._closing = True
+        self.status_bar.config(text="正在保存记录库...")
+        self._close_when_idle()
+
+    def _close_when_idle(self):
+        """在界面线程等待导入与加载线程结束（不能join：它们会回调界面线程）"""
+        if self._importing() or not self._loaded.is_set():
+            self.master.after(self.LOAD_POLL_MS, self._close_when_idle)
+            return
+        try:
+            if not self._load_errors:  # 加载失败时记录库状态不完整，不写回
+                self.store.close()
+        finally:
+            self.master.destroy()
 
     def _search_record(self):
         """处理查询/录入"""
+        if not self.ready:
+            return
+        if self._search_job is not None:
+            self.master.after_cancel(self._search_job)
+            self._search_job = None
         name = self.name_entry.get().strip()
         if not name:
             messagebox.showwarning("输入错误", "请输入有效姓名")
             return
 
-        if name in self.existing_records:
-            self._show_result(name, self.existing_records[name])
+        if self.store.count_name(name):
+            self._show_matches(name)
         else:
             self._add_new_record(name)
 
-    def _show_result(self, name, id_num):
-        """显示查询结果"""
-        for widget in self.result_frame.winfo_children():
-            widget.destroy()
-
-        info = parse_id_info(id_num, self.area_codes)
-        labels = [
-            ("姓　　名：", name),
-            ("身份证号：", id_num),
-            ("户 籍 地：", info["户籍地"]),
-            ("出生日期：", info["出生日期"]),
-            ("性　　别：", info["性别"]),
-        ]
+    def _row_values(self, name, id_num):
+        """列表中一行的显示内容"""
+        try:
+            info = self.parser.parse(id_num)
+        except (ValueError, IndexError):  # 早期手工编辑的记录可能不是18位
+            return name, id_num, "", "", ""
+        return name, id_num, info["户籍地"], info["出生日期"], info["性别"]
+
+    def _set_status(self, text=None):
+        """更新状态栏，text为None时显示记录总数"""
+        if text is None:
+            text = f"就绪 | 记录总数：{len(self.store)}"
+        self.status_bar.config(text=text)
+
+    def _show_matches(self, name, id_num=None):
+        """列出同名人员，id_num给出时选中该记录"""
+        with instrument.timer("gui.show_result"):
+            source = RowSource.from_rows(
+                (name, id_number) for id_number in self.store.ids_for_name(name)
+            )
+            selected = None if id_num is None else source.position_of(id_num)
+            self.browsing_all = False
+            self.result_name = name
+            self.result_label.config(text=f"“{name}” 共 {len(source)} 位同名人员")
+            self.add_same_button.pack(side="left", padx=10)
+            self.table.set_source(source, selected)
+            if instrument.enabled:
+                # 计入Tk的布局与绘制，而不只是更新控件
+                self.result_frame.update_idletasks()
+        self._set_status()
+
+    def _run_query(self):
+        """按户籍地、出生日期范围与性别筛选记录"""
+        if self.record_filter is None:
+            self._set_status("正在建立索引，请稍候……")
+            return
+        gender = self.gender_box.get()
+        try:
+            query = RecordQuery.parse(
+                self.area_entry.get(),
+                self.birth_from_entry.get(),
+                self.birth_to_entry.get(),
+                "" if gender == "不限" else gender,
+                self._load_area_map(),
+            )
+        except ValueError as e:
+            messagebox.showwarning("筛选条件错误", str(e))
+            return
 
-        for text, value in labels:
-            row = Frame(self.result_frame)
-            row.pack(fill="x", pady=4)
-            Label(row, text=text, width=10, bootstyle="primary").pack(side="left")
-            Label(row, text=value, bootstyle="info").pack(side="left", padx=5)
+        with instrument.timer("gui.query"):
+            rows = self.record_filter.select(query)
+            self.browsing_all = False
+            self.result_name = None
+            self.result_label.config(text=f"筛选结果：{len(rows):,} 条")
+            self.add_same_button.pack_forget()
+            self.table.set_source(self.record_filter.source(rows))
+        self._set_status()
+
+    def _load_area_map(self):
+        """按名称筛选户籍地时才读取area_code.json，只随程序分发索引时返回None"""
+        if self._area_map is None:
+            try:
+                self._area_map = AreaCodeLoader.parse_source(
+                    get_resource_path(AreaCodeLoader.SOURCE_PATH)
+                )
+            except (OSError, ValueError):
+                return None
+        return self._area_map
+
+    def _browse_all(self):
+        """显示全部记录：列表滚动时按需从记录表读取可见的行，不复制记录"""
+        if self.records is None:
+            self._set_status("正在建立索引，请稍候……")
+            return
+        with instrument.timer("gui.browse_all"):
+            self._show_all(RowSource(self.records))
 
-        self.status_bar.config(text=f"就绪 | 记录总数：{len(self.existing_records)}")
+    def _show_all(self, source):
+        self.browsing_all = True
+        self.result_name = None
+        self.result_label.config(text=f"全部记录（共 {len(source):,} 条）")
+        self.add_same_button.pack_forget()
+        self.table.set_source(source)
+        self._set_status()
 
     def _add_new_record(self, name):
         """添加新记录"""
@@ -223,36 +669,30 @@ class SFZApp:
             return
 
         # 验证身份证
-        error = None
-        if len(id_num) != 18:
-            error = "身份证号长度不正确"
-        elif not id_num[:17].isdigit():
-            error = "前17位必须为数字"
-        elif not validate_check_code(id_num):
-            error = "校验码不正确"
-
+        error = check_id_number(id_num)
         if error:
             messagebox.showerror("输入错误", error)
             return
 
         # 检查重复
-        if name in self.existing_records:
-            if self.existing_records[name] == id_num:
-                messagebox.showinfo("提示", "记录已存在")
-                self._show_result(name, id_num)
-                return
-            else:
-                messagebox.showwarning("冲突", "该姓名已存在不同身份证")
-                return
+        status = self.store.status(name, id_num)
+        if status == RECORD_EXISTS:
+            messagebox.showinfo("提示", "记录已存在")
+            self._show_matches(name, id_num)
+            return
+        if status != RECORD_NEW:
+            messagebox.showwarning(
+                "冲突", f"该身份证号已登记为：{self.store.name_of(id_num)}"
+            )
+            return
 
         # 保存记录
-        area = parse_id_info(id_num, self.area_codes)["户籍地"]
+        area = self.parser.location(id_num)
         try:
-            with open(self.database_path, "a", encoding="utf-8") as f:
-                f.write(f"{name},{id_num},{area}\n")
-            self.existing_records[name] = id_num
+            self.store.add(name, id_num, area)
+            self._index_record(name, id_num)
             messagebox.showinfo("成功", "记录已保存")
-            self._show_result(name, id_num)
+            self._show_matches(name, id_num)
         except Exception as e:
             messagebox.showerror("保存失败", f"无法写入数据库：\n{str(e)}")
 
@@ -260,70 +700,62 @@ class SFZApp:
         """启动批量导入"""
         filetypes = [("支持的文件", "*.txt *.csv *.sfzx"), ("所有文件", "*.*")]
         path = filedialog.askopenfilename(title="选择导入文件", filetypes=filetypes)
-        if path:
-            threading.Thread(
-                target=self._batch_import, args=(path,), daemon=True
-            ).start()
+        if not path:
+            return
+        if self._importing():
+            messagebox.showinfo("正在导入", "上一次批量导入尚未完成")
+            return
 
-    def _batch_import(self, filepath):
+        # 同一文件上次导入中断时可从断点继续
+        offset = self.checkpoint.load(path)
+        if offset and not messagebox.askyesno(
+            "继续导入", "该文件上次导入未完成，是否从中断处继续？"
+        ):
+            offset = 0
+        self._importer = BatchImporter(
+            self.store, self.area_codes, workers=self.workers, parser=self.parser
+        )
+        # 非守护线程：关闭窗口时等它关闭写入器后再退出
+        self._import_thread = threading.Thread(
+            target=self._batch_import, args=(self._importer, path, offset)
+        )
+        self._import_thread.start()
+
+    def _report_progress(self, snapshot):
+        """在界面线程更新导入进度（由ProgressReporter限频调用）"""
+        text = f"导入中... {snapshot.format()}"
+        self.master.after(0, lambda: self.status_bar.config(text=text))
+
+    def _batch_import(self, importer, filepath, start_offset=0):
         """执行批量导入"""
-        success = failed = 0
+        progress = ProgressReporter(self._report_progress, start_offset=start_offset)
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-
-                parts = line.split()
-                if len(parts) < 2:
-                    failed += 1
-                    continue
-
-                id_num, name = parts[0], " ".join(parts[1:])
-                if not validate_check_code(id_num):
-                    failed += 1
-                    continue
-
-                # 检查记录
-                if name in self.existing_records:
-                    if self.existing_records[name] == id_num:
-                        continue
-                    else:
-                        failed += 1
-                        continue
-
-                # 保存记录
-                area = parse_id_info(id_num, self.area_codes)["户籍地"]
-                with open(self.database_path, "a", encoding="utf-8") as f:
-                    f.write(f"{name},{id_num},{area}\n")
-                self.existing_records[name] = id_num
-                success += 1
-
-                # 更新状态
-                self.master.after(
-                    10,
-                    lambda s=success, f=failed: self.status_bar.config(
-                        text=f"导入中... 成功：{s} 失败：{f} 总数：{s+f}"
-                    ),
-                )
+            with instrument.profile_thread(), instrument.timer("gui.batch_import"):
+                try:
+                    result = importer.run(
+                        filepath,
+                        progress=progress,
+                        start_offset=start_offset,
+                        checkpoint=self.checkpoint,
+                    )
+                finally:
+                    progress.finish()  # 补发被限频合并掉的最后一次更新
 
             # 完成提示
             self.master.after(
                 0,
                 lambda: messagebox.showinfo(
-                    "导入完成", f"成功导入 {success} 条记录\n失败 {failed} 条"
-                ),
-            )
-            self.master.after(
-                0,
-                lambda: self.status_bar.config(
-                    text=f"就绪 | 记录总数：{len(self.existing_records)}"
+                    "导入完成",
+                    f"成功导入 {result.success} 条记录\n失败 {result.failed} 条",
                 ),
             )
+            self.master.after(0, self._set_status)
+            self.master.after(0, self._build_indexes)
+            if self.browsing_all:
+                self.master.after(0, self._browse_all)
 
+        except ImportCancelled:
+            pass  # 关闭窗口时中止，断点已保存
         except UnicodeDecodeError:
             self.master.after(
                 0,
@@ -346,6 +778,33 @@ class SFZApp:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后并行导入的子进程入口
+    parser = argparse.ArgumentParser(description="身份证信息管理系统")
+    parser.add_argument(
+        "--build-area-index",
+        action="store_true",
+        help="预编译按省分片的行政区划索引和历史版本索引后退出",
+    )
+    parser.add_argument(
+        "--store", choices=STORE_BACKENDS, default="csv", help="记录库后端"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="并行导入的进程数"
+    )
+    parser.add_argument(
+        "--profile", metavar="REPORT", help="开启计时埋点，退出时写出JSON报告"
+    )
+    parser.add_argument(
+        "--cprofile", metavar="PSTATS", help="用cProfile采样，退出时写出pstats文件"
+    )
+    args = parser.parse_args()
+    if args.profile or args.cprofile:
+        instrument.enable(args.profile, args.cprofile)
+    if args.build_area_index:
+        AreaCodeLoader.build_shards()
+        AreaCodeLoader.build_editions()
+        sys.exit(0)
+
     root = tk.Tk()
-    app = SFZApp(root)
+    app = SFZApp(root, backend=args.store, workers=args.workers)
     root.mainloop()
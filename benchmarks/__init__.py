@@ -0,0 +1 @@
+"""基准测试（在仓库根目录运行python -m benchmarks.bench）"""
@@ -0,0 +1,406 @@
+"""基准测试
+
+    python -m benchmarks.bench                       # 微基准 + 1万、100万行导入
+    python -m benchmarks.bench --sizes 10k,1m,10m    # 加上1000万行导入
+    python -m benchmarks.bench --only micro -o new.json
+    python -m benchmarks.bench --only search --sizes 1m
+    python -m benchmarks.compare old.json new.json
+
+合成数据按种子生成并缓存在benchmarks/data/，同一参数的两次运行使用
+完全相同的输入；结果以JSON写入benchmarks/results/（或-o指定的文件）。
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from idcard.area import AreaCodeLoader
+from idcard.generator import (
+    GENERATOR_VERSION,
+    DatasetSpec,
+    IdGenerator,
+    county_prefixes,
+    generate,
+)
+from idcard.importer import BatchImporter
+from idcard.parser import CachedParser, parse_id_info
+from idcard.paths import get_resource_path
+from idcard.search import SearchIndex, name_initials
+from idcard.table import RecordTable
+from idcard.validator import check_id_number, validate_batch, validate_check_code
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "data")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+SEED = 20240501
+INVALID_RATE = 0.02
+DUPLICATE_RATE = 0.01
+CONFLICT_RATE = 0.005
+BACKENDS = ("csv", "log", "sqlite")
+# 边输边搜单次查询的目标延迟
+SEARCH_LIMIT_MS = 10.0
+SEARCH_QUERIES = 200
+
+
+class Suite:
+    """收集测量结果"""
+
+    def __init__(self, repeats):
+        self.repeats = repeats
+        self.results = []
+
+    def run(self, group, name, func, ops, params=None, setup=None, repeats=None):
+        """重复执行func，记录最短与平均耗时；ops为每次执行处理的条数
+
+        返回的结果可再补充字段（如worst_ms与limit_ms），一并写入结果文件。
+        """
+        times = []
+        for _ in range(repeats or self.repeats):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - started)
+        best = min(times)
+        result = {
+            "group": group,
+            "name": name,
+            "params": params or {},
+            "ops": ops,
+            "repeats": len(times),
+            "best_s": best,
+            "mean_s": sum(times) / len(times),
+            "ops_per_sec": ops / best if best > 0 else None,
+        }
+        self.results.append(result)
+        label = f"{group}/{name}" + "".join(
+            f" {k}={v}" for k, v in result["params"].items()
+        )
+        print(
+            f"{label:<50} {best * 1e3:10.2f} ms  {result['ops_per_sec'] or 0:14,.0f} 条/秒"
+        )
+        return result
+
+
+def dataset(size, area_map):
+    """按行数返回缓存的导入文件，不存在时生成"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"import-{size}-{SEED}-v{GENERATOR_VERSION}.sfzx")
+    if not os.path.exists(path):
+        print(f"生成 {size} 行测试数据……", file=sys.stderr)
+        spec = DatasetSpec(
+            area_map,
+            SEED,
+            invalid_rate=INVALID_RATE,
+            duplicate_rate=DUPLICATE_RATE,
+            conflict_rate=CONFLICT_RATE,
+        )
+        with open(f"{path}.tmp", "wb") as f:
+            generate(spec, size, f, workers=os.cpu_count() or 1)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def open_store(backend, directory):
+    """在directory下新建指定后端的空记录库（不迁移config中的数据）"""
+    if backend == "csv":
+        from idcard.store import RecordStore
+
+        return RecordStore(os.path.join(directory, "database.sfz"))
+    if backend == "log":
+        from idcard.logstore import LogStore
+
+        return LogStore(os.path.join(directory, "records"))
+    from idcard.sqlitestore import SqliteStore
+
+    return SqliteStore(os.path.join(directory, "database.db"))
+
+
+def bench_micro(suite, area_codes, area_map):
+    generator = IdGenerator(county_prefixes(area_map), SEED, INVALID_RATE)
+    ids = list(generator.ids(100_000))
+    valid = [id_number for id_number in ids if check_id_number(id_number) is None]
+
+    suite.run(
+        "validate",
+        "validate_check_code",
+        lambda: [validate_check_code(i) for i in ids],
+        len(ids),
+    )
+    suite.run(
+        "validate",
+        "check_id_number",
+        lambda: [check_id_number(i) for i in ids],
+        len(ids),
+    )
+    suite.run(
+        "validate",
+        "validate_batch",
+        lambda: validate_batch(ids),
+        len(ids),
+        _numpy_params(),
+    )
+
+    suite.run(
+        "parse",
+        "parse_id_info",
+        lambda: [parse_id_info(i, area_codes) for i in valid],
+        len(valid),
+        {"area": "index"},
+    )
+    suite.run(
+        "parse",
+        "parse_id_info",
+        lambda: [parse_id_info(i, area_map) for i in valid],
+        len(valid),
+        {"area": "dict"},
+    )
+    state = {}
+    suite.run(
+        "parse",
+        "CachedParser.location",
+        lambda: [state["parser"].location(i) for i in valid],
+        len(valid),
+        setup=lambda: state.update(parser=CachedParser(area_codes)),
+    )
+    suite.run(
+        "parse",
+        "resolve",
+        lambda: [area_codes.resolve(i[:6]) for i in valid],
+        len(valid),
+    )
+
+
+def _numpy_params():
+    try:
+        import numpy
+    except ImportError:
+        return {"numpy": None}
+    return {"numpy": numpy.__version__}
+
+
+def bench_load(suite, area_map, sizes):
+    source = get_resource_path(AreaCodeLoader.SOURCE_PATH)
+    suite.run("load", "parse_source", lambda: AreaCodeLoader.parse_source(source), 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        suite.run(
+            "load",
+            "build_shards",
+            lambda: AreaCodeLoader.build_shards(directory=os.path.join(tmp, "shards")),
+            1,
+        )
+    AreaCodeLoader.load().close()  # 确保分片已编译
+    suite.run(
+        "load",
+        "AreaCodeLoader.load",
+        lambda: AreaCodeLoader.load().resolve("110101"),
+        1,
+    )
+
+    # 记录库加载（对应界面的_load_records）
+    for label in sizes:
+        if SIZES[label] > 1_000_000:
+            continue
+        path = dataset(SIZES[label], area_map)
+        area_codes = AreaCodeLoader.load()
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = open_store(backend, tmp)
+                store.load()
+                BatchImporter(store, area_codes).run(path)
+                store.close()
+                rows = len(store)
+
+                def load():
+                    fresh = open_store(backend, tmp)
+                    fresh.load()
+                    fresh.close()
+
+                suite.run(
+                    "load",
+                    "store.load",
+                    load,
+                    rows,
+                    {"backend": backend, "rows": label},
+                )
+
+
+def bench_import(suite, area_map, sizes, workers):
+    area_codes = AreaCodeLoader.load()
+    for label in sizes:
+        path = dataset(SIZES[label], area_map)
+        configs = [(backend, 1) for backend in BACKENDS]
+        if workers > 1:
+            configs.append(("csv", workers))
+        for backend, count in configs:
+            tmp = tempfile.mkdtemp()
+            state = {}
+
+            def setup():
+                shutil.rmtree(tmp)
+                os.makedirs(tmp)
+                state["store"] = open_store(backend, tmp)
+                state["store"].load()
+
+            def run():
+                BatchImporter(state["store"], area_codes, workers=count).run(path)
+                state["store"].close()
+
+            repeats = 1 if SIZES[label] >= 1_000_000 else None
+            try:
+                suite.run(
+                    "import",
+                    "BatchImporter.run",
+                    run,
+                    SIZES[label],
+                    {"backend": backend, "workers": count, "rows": label},
+                    setup,
+                    repeats,
+                )
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+
+def search_queries(rows, rng):
+    """从已有记录抽取各类查询：姓名前缀、拼音首字母、改动一字的姓名、号码前缀"""
+    sample = rng.sample(rows, min(SEARCH_QUERIES, len(rows)))
+    fuzzy = []
+    for _, name in sample:
+        i = rng.randrange(len(name))
+        fuzzy.append(name[:i] + "某" + name[i + 1 :])
+    return {
+        "prefix": [name[: rng.choice((1, 2))] for _, name in sample],
+        "initials": [name_initials(name)[:2] for _, name in sample],
+        "fuzzy": fuzzy,
+        "ids": [id_number[: rng.choice((4, 6, 10))] for id_number, _ in sample],
+    }
+
+
+def bench_search(suite, area_map, sizes):
+    import random
+
+    generator = IdGenerator(county_prefixes(area_map), SEED)
+    for label in sizes:
+        rows = list(generator.rows(SIZES[label]))
+        table = RecordTable.from_rows((name, id_number) for id_number, name in rows)
+        state = {}
+        suite.run(
+            "search",
+            "SearchIndex.build",
+            lambda: state.update(index=SearchIndex(table)),
+            len(table),
+            {"rows": label},
+            repeats=1,
+        )
+        index = state["index"]
+        searches = {
+            "prefix": index.search,
+            "initials": index.search,
+            "fuzzy": index.search,
+            "ids": index.search_ids,
+        }
+        queries = search_queries(rows, random.Random(SEED))
+        for kind, texts in queries.items():
+            search = searches[kind]
+            result = suite.run(
+                "search",
+                "SearchIndex.search",
+                lambda: [search(text) for text in texts],
+                len(texts),
+                {"kind": kind, "rows": label},
+            )
+            worst = 0.0
+            for text in texts:
+                started = time.perf_counter()
+                search(text)
+                worst = max(worst, time.perf_counter() - started)
+            result["worst_ms"] = worst * 1e3
+            result["limit_ms"] = SEARCH_LIMIT_MS
+            if result["worst_ms"] > SEARCH_LIMIT_MS:
+                print(
+                    f"  最慢一次查询 {result['worst_ms']:.2f} ms，"
+                    f"超过目标 {SEARCH_LIMIT_MS:.0f} ms"
+                )
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=HERE
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": _numpy_params()["numpy"],
+        "seed": SEED,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="身份证信息系统基准测试")
+    parser.add_argument(
+        "--sizes", default="10k,1m", help=f"导入规模，可选{','.join(SIZES)}"
+    )
+    parser.add_argument(
+        "--only", choices=("micro", "load", "import", "search"), help="只运行一组"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="每项重复次数，取最短耗时"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="并行导入的进程数"
+    )
+    parser.add_argument("-o", "--output", help="结果文件，默认写入benchmarks/results/")
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"未知的规模：{', '.join(unknown)}")
+
+    area_codes = AreaCodeLoader.load()
+    area_map = AreaCodeLoader.parse_source(
+        get_resource_path(AreaCodeLoader.SOURCE_PATH)
+    )
+    suite = Suite(args.repeats)
+    if args.only in (None, "micro"):
+        bench_micro(suite, area_codes, area_map)
+    if args.only in (None, "load"):
+        bench_load(suite, area_map, sizes)
+    if args.only in (None, "import"):
+        bench_import(suite, area_map, sizes, args.workers)
+    if args.only in (None, "search"):
+        bench_search(suite, area_map, sizes)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {"meta": metadata(), "results": suite.results},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
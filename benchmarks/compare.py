@@ -0,0 +1,62 @@
+"""比较两次基准测试结果
+
+    python -m benchmarks.compare old.json new.json --threshold 10
+
+按(分组, 名称, 参数)匹配两次结果的吞吐量，吞吐量下降超过阈值（百分比）
+的项标记为退化；带延迟目标（limit_ms）的项最慢一次超过目标时同样计为退化。
+存在退化时退出码为1。
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        (r["group"], r["name"], json.dumps(r["params"], sort_keys=True)): r
+        for r in data["results"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较两次基准测试结果")
+    parser.add_argument("baseline", help="基准结果")
+    parser.add_argument("current", help="本次结果")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="判定为退化的降幅（百分比）"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = load(args.baseline)
+    current = load(args.current)
+    regressions = 0
+    for key in sorted(baseline.keys() & current.keys()):
+        old = baseline[key]["ops_per_sec"]
+        new = current[key]["ops_per_sec"]
+        if not old or not new:
+            continue
+        change = (new - old) / old * 100
+        mark = ""
+        if change < -args.threshold:
+            mark = "  退化"
+        worst, limit = current[key].get("worst_ms"), current[key].get("limit_ms")
+        if worst is not None and limit is not None and worst > limit:
+            mark += f"  最慢 {worst:.2f} ms 超过 {limit:.0f} ms"
+        if mark:
+            regressions += 1
+        group, name, params = key
+        label = f"{group}/{name}" + "".join(
+            f" {k}={v}" for k, v in json.loads(params).items()
+        )
+        print(f"{label:<60} {old:14,.0f} → {new:14,.0f} {change:+7.1f}%{mark}")
+    for key in sorted(baseline.keys() ^ current.keys()):
+        side = "仅基准" if key in baseline else "仅本次"
+        print(f"{key[0]}/{key[1]} {key[2]}  （{side}）")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""身份证信息核心库（不依赖图形界面）
+
+子模块按需导入，服务器进程只加载实际用到的部分。
+"""
+
+_EXPORTS = {
+    "get_resource_path": "paths",
+    "validate_check_code": "validator",
+    "check_id_number": "validator",
+    "AreaIndex": "area",
+    "AreaDataError": "area",
+    "AreaCodeLoader": "area",
+    "ShardedAreaIndex": "area",
+    "AreaEditions": "editions",
+    "DatedAreaIndex": "editions",
+    "parse_id_info": "parser",
+    "CachedParser": "parser",
+    "RecordStore": "store",
+    "RecordTable": "table",
+    "BatchImporter": "importer",
+    "ImportResult": "importer",
+    "ProgressReporter": "progress",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,603 @@
+"""行政区划数据加载与预编译索引"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from . import instrument
+from .paths import get_resource_path
+
+
+class AreaDataError(Exception):
+    """行政区划数据无法加载"""
+
+
+AREA_INDEX_MAGIC = b"SFZA"
+AREA_INDEX_VERSION = 2
+# 魔数、版本、保留位、源文件mtime(ns)、源文件大小、源文件SHA1、记录数、解析表起点、解析表长度
+AREA_INDEX_HEADER = struct.Struct("<4sHHqq20sIII")
+
+# 户籍地解析命中的层级
+TIER_UNKNOWN = 0
+TIER_EXACT = 1  # 6位区划码
+TIER_HISTORY = 2  # 已撤销区划，映射到继任区划
+TIER_CITY = 3  # 4位+"00"
+TIER_PROVINCE = 4  # 2位+"0000"
+UNKNOWN_AREA = "未知地区"
+
+
+def resolve_code(code, area_map, history=None):
+    """逐级解析6位区划码，返回(命中的区划码, 层级)，未命中时区划码为None"""
+    if area_map.get(code):
+        return code, TIER_EXACT
+    if history:
+        seen = set()
+        target = history.get(code)
+        while target and target not in seen:
+            if area_map.get(target):
+                return target, TIER_HISTORY
+            seen.add(target)
+            target = history.get(target)
+    for candidate, tier in (
+        (code[:4] + "00", TIER_CITY),
+        (code[:2] + "0000", TIER_PROVINCE),
+    ):
+        if area_map.get(candidate):
+            return candidate, tier
+    return None, TIER_UNKNOWN
+
+
+class AreaIndex:
+    """预编译行政区划索引（只读，可内存映射，不构建Python字典）
+
+    文件布局（小端序）：
+        头部 | 排序后的6位区划码 uint32[n] | 名称偏移表 uint32[n+1]
+        | 解析表 uint32[m] | UTF-8名称数据
+
+    解析表覆盖[起点, 起点+m)内的每个6位前缀，元素为(层级 << 24) | (名称序号 + 1)，
+    0表示未知地区，户籍地解析只需一次数组访问。
+    """
+
+    def __init__(self, buffer, mapped=None):
+        self._mapped = mapped
+        self.path = None  # 由open()映射文件时为文件路径
+        # 先检查版本再建立视图，旧版本文件的内存映射才能正常关闭
+        magic, version = struct.unpack_from("<4sH", buffer, 0)
+        if magic != AREA_INDEX_MAGIC or version != AREA_INDEX_VERSION:
+            raise ValueError("行政区划索引格式不兼容")
+        self._view = memoryview(buffer)
+        header = AREA_INDEX_HEADER.unpack_from(self._view, 0)
+        _, _, _, mtime, size, digest, count, base, length = header
+        self.source_mtime = mtime
+        self.source_size = size
+        self.source_hash = digest
+
+        codes_start = AREA_INDEX_HEADER.size
+        offsets_start = codes_start + 4 * count
+        table_start = offsets_start + 4 * (count + 1)
+        blob_start = table_start + 4 * length
+        self._count = count
+        self._codes = self._uint32_view(codes_start, count)
+        self._offsets = self._uint32_view(offsets_start, count + 1)
+        self._table_base = base
+        self._table_len = length
+        self._table = self._uint32_view(table_start, length)
+        self._blob = self._view[blob_start:]
+
+    def _uint32_view(self, start, count):
+        raw = self._view[start : start + 4 * count]
+        if sys.byteorder == "little":
+            return raw.cast("I")
+        values = array("I", raw.tobytes())
+        values.byteswap()
+        return values
+
+    @classmethod
+    def build(
+        cls,
+        area_map,
+        source_mtime=0,
+        source_size=0,
+        source_hash=b"",
+        table_base=0,
+        resolution=None,
+    ):
+        """由{区划码: 名称}生成索引文件内容
+
+        resolution为[(命中的区划码, 层级)]，依次对应table_base起的每个6位前缀，
+        命中的区划码须在area_map中。
+        """
+        ordered = sorted(area_map, key=int)
+        position = {code: i for i, code in enumerate(ordered)}
+        codes = array("I")
+        offsets = array("I", [0])
+        blob = bytearray()
+        for code in ordered:
+            codes.append(int(code))
+            blob += area_map[code].encode("utf-8")
+            offsets.append(len(blob))
+
+        table = array("I")
+        for target, tier in resolution or ():
+            table.append((tier << 24) | (position[target] + 1) if target else 0)
+
+        if sys.byteorder != "little":
+            codes.byteswap()
+            offsets.byteswap()
+            table.byteswap()
+
+        header = AREA_INDEX_HEADER.pack(
+            AREA_INDEX_MAGIC,
+            AREA_INDEX_VERSION,
+            0,
+            source_mtime,
+            source_size,
+            source_hash.ljust(20, b"\0"),
+            len(codes),
+            table_base,
+            len(table),
+        )
+        return (
+            header + codes.tobytes() + offsets.tobytes() + table.tobytes() + bytes(blob)
+        )
+
+    @classmethod
+    def open(cls, path):
+        """以内存映射方式打开索引文件"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = cls(mapped, mapped)
+        except Exception:
+            mapped.close()
+            raise
+        index.path = path
+        return index
+
+    def __reduce__(self):
+        # 传给子进程时按路径重新映射，未写入文件的索引复制其内容
+        if self._mapped is not None and self.path is not None:
+            return type(self).open, (self.path,)
+        return type(self), (bytes(self._view),)
+
+    def close(self):
+        """释放内存映射"""
+        for view in (self._codes, self._offsets, self._table, self._blob, self._view):
+            if isinstance(view, memoryview):
+                view.release()
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def _find(self, code):
+        if len(code) != 6 or not code.isdigit():
+            return -1
+        key = int(code)
+        i = bisect_left(self._codes, key, 0, self._count)
+        if i < self._count and self._codes[i] == key:
+            return i
+        return -1
+
+    def _name(self, i):
+        return str(self._blob[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def get(self, code, default=None):
+        i = self._find(code)
+        if i < 0:
+            return default
+        return self._name(i)
+
+    def resolve(self, code):
+        """解析6位前缀，返回(户籍地, 命中层级)
+
+        前缀在解析表范围内时只需一次查表，否则逐级二分查找。
+        """
+        if len(code) == 6 and code.isdigit():
+            i = int(code) - self._table_base
+            if 0 <= i < self._table_len:
+                entry = self._table[i]
+                if not entry:
+                    return UNKNOWN_AREA, TIER_UNKNOWN
+                return self._name((entry & 0xFFFFFF) - 1), entry >> 24
+        target, tier = resolve_code(code, self)
+        if target is None:
+            return UNKNOWN_AREA, TIER_UNKNOWN
+        return self.get(target), tier
+
+    def __getitem__(self, code):
+        value = self.get(code)
+        if value is None:
+            raise KeyError(code)
+        return value
+
+    def __contains__(self, code):
+        return self._find(code) >= 0
+
+    def __len__(self):
+        return self._count
+
+
+class ShardedAreaIndex:
+    """按省级代码（身份证前两位）分片的行政区划索引
+
+    分片在首次查询该省时才映射；给出max_shards时最多同时保留这么多个，
+    超出时关闭最久未使用的分片，为None时映射过的分片全部保留。
+    """
+
+    def __init__(self, directory, max_shards=None):
+        self.directory = directory
+        self.max_shards = max_shards
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _shard(self, prefix):
+        shards = self._shards
+        if prefix in shards:
+            shards.move_to_end(prefix)
+            return shards[prefix]
+
+        path = os.path.join(self.directory, f"{prefix}.idx")
+        shard = AreaIndex.open(path) if os.path.exists(path) else None
+        self.loads += 1
+        shards[prefix] = shard
+        if self.max_shards is not None and len(shards) > self.max_shards:
+            _, evicted = shards.popitem(last=False)
+            if evicted is not None:
+                evicted.close()
+        return shard
+
+    def __reduce__(self):
+        # 传给子进程时只传目录，子进程各自按需映射分片
+        return type(self), (self.directory, self.max_shards)
+
+    def get(self, code, default=None):
+        if len(code) != 6 or not code.isdigit():
+            return default
+        with self._lock:
+            shard = self._shard(code[:2])
+            if shard is None:
+                return default
+            return shard.get(code, default)
+
+    def resolve(self, code):
+        """解析6位前缀，返回(户籍地, 命中层级)"""
+        if len(code) != 6 or not code.isdigit():
+            return UNKNOWN_AREA, TIER_UNKNOWN
+        with self._lock:
+            shard = self._shard(code[:2])
+            if shard is None:
+                return UNKNOWN_AREA, TIER_UNKNOWN
+            return shard.resolve(code)
+
+    def __getitem__(self, code):
+        value = self.get(code)
+        if value is None:
+            raise KeyError(code)
+        return value
+
+    def __contains__(self, code):
+        return self.get(code) is not None
+
+    @property
+    def loaded_shards(self):
+        """当前已映射的分片（省级代码）"""
+        return [prefix for prefix, shard in self._shards.items() if shard]
+
+    def close(self):
+        with self._lock:
+            for shard in self._shards.values():
+                if shard is not None:
+                    shard.close()
+            self._shards.clear()
+
+
+class AreaCodeLoader:
+    """行政区划数据加载器
+
+    可选的config/area_code_history.json记录已撤销区划的继任关系
+    （{"撤销的区划码": "继任区划码"}），编译时并入解析表。
+    可选的config/area_editions/存放按生效日期命名的历史版本，见editions模块。
+    """
+
+    SOURCE_PATH = "config/area_code.json"
+    HISTORY_PATH = "config/area_code_history.json"
+    SHARD_DIR = "config/area_shards"
+    # 分片目录中记录各分片文件大小的清单，分片被删除或截断时重新编译
+    SHARD_LIST = "shards"
+    EDITIONS_DIR = "config/area_editions"
+    EDITIONS_INDEX_PATH = "config/area_editions.idx"
+    # 各省分片合计只有几MB，默认全部保留，全国混合的号码也不会反复映射分片
+    MAX_SHARDS = None
+
+    @classmethod
+    @instrument.timed("area.load")
+    def load(cls, max_shards=MAX_SHARDS):
+        """加载按省分片的行政区划索引，失败时抛出AreaDataError
+
+        存在历史版本时返回DatedAreaIndex，可按出生日期解析户籍地。
+        """
+        try:
+            index = cls.load_shards(max_shards)
+            editions = cls.load_editions()
+        except Exception as e:
+            raise AreaDataError(str(e)) from e
+        if editions is None:
+            return index
+        from .editions import DatedAreaIndex
+
+        return DatedAreaIndex(index, editions)
+
+    @classmethod
+    def load_shards(cls, max_shards=MAX_SHARDS):
+        """打开分片索引，源文件变化或分片文件缺失、被截断时自动重新生成"""
+        directory = get_resource_path(cls.SHARD_DIR)
+        if not os.path.exists(get_resource_path(cls.SOURCE_PATH)):
+            # 仅随程序分发了分片文件
+            return ShardedAreaIndex(directory, max_shards)
+
+        manifest = os.path.join(directory, "manifest")
+        if cls._inputs_changed(manifest, cls._inputs()) or not cls._shards_intact(
+            directory
+        ):
+            data = cls.build_shards(directory=directory)
+            if data is not None:
+                return AreaIndex(data)
+        return ShardedAreaIndex(directory, max_shards)
+
+    @classmethod
+    def _inputs_changed(cls, manifest, inputs):
+        """源文件与清单不一致时返回True"""
+        saved = cls._read_manifest(manifest)
+        current = {
+            os.path.basename(path): (stat.st_mtime_ns, stat.st_size)
+            for path, stat in ((path, os.stat(path)) for path in inputs)
+        }
+        if (
+            saved is not None
+            and {name: entry[:2] for name, entry in saved.items()} == current
+        ):
+            return False
+        digests = {os.path.basename(path): cls._file_hash(path) for path in inputs}
+        if (
+            saved is not None
+            and {name: entry[2] for name, entry in saved.items()} == digests
+        ):
+            # mtime变化但内容未变（如重新检出），只更新清单
+            cls._write_manifest(manifest, inputs, digests)
+            return False
+        return True
+
+    @classmethod
+    def _shards_intact(cls, directory):
+        """分片清单中的每个分片文件都存在且大小与编译时一致"""
+        try:
+            with open(os.path.join(directory, cls.SHARD_LIST), "r") as f:
+                for line in f:
+                    name, size = line.split()
+                    if os.path.getsize(os.path.join(directory, name)) != int(size):
+                        return False
+        except (OSError, ValueError):
+            return False
+        return True
+
+    @classmethod
+    def _edition_inputs(cls):
+        """各版区划数据文件，按生效日期排序"""
+        from .editions import edition_date
+
+        directory = get_resource_path(cls.EDITIONS_DIR)
+        if not os.path.isdir(directory):
+            return []
+        paths = [
+            os.path.join(directory, name)
+            for name in os.listdir(directory)
+            if name.endswith(".json")
+        ]
+        return sorted(paths, key=edition_date)
+
+    @classmethod
+    def load_editions(cls):
+        """打开多版区划索引，没有历史版本数据时返回None"""
+        from .editions import AreaEditions
+
+        index_path = get_resource_path(cls.EDITIONS_INDEX_PATH)
+        inputs = cls._edition_inputs()
+        if not inputs:
+            # 仅随程序分发了索引文件
+            if os.path.exists(index_path):
+                return AreaEditions.open(index_path)
+            return None
+
+        manifest = f"{index_path}.manifest"
+        if cls._inputs_changed(manifest, inputs) or not os.path.exists(index_path):
+            data = cls.build_editions(inputs, index_path)
+            if data is not None:
+                return AreaEditions(data)
+        return AreaEditions.open(index_path)
+
+    @classmethod
+    def build_editions(cls, inputs=None, index_path=None):
+        """编译多版区划索引，写入失败时返回索引内容供内存使用"""
+        from .editions import AreaEditions, edition_date
+
+        inputs = inputs if inputs is not None else cls._edition_inputs()
+        index_path = index_path or get_resource_path(cls.EDITIONS_INDEX_PATH)
+        if not inputs:
+            return None
+        digests = {os.path.basename(path): cls._file_hash(path) for path in inputs}
+        data = AreaEditions.build(
+            (edition_date(path), cls.parse_source(path)) for path in inputs
+        )
+        manifest = f"{index_path}.manifest"
+        try:
+            if os.path.exists(manifest):
+                os.remove(manifest)
+            with open(f"{index_path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{index_path}.tmp", index_path)
+            cls._write_manifest(manifest, inputs, digests)
+        except OSError:
+            return data
+        return None
+
+    @classmethod
+    def _inputs(cls):
+        """参与编译的源文件"""
+        paths = [get_resource_path(cls.SOURCE_PATH)]
+        history = get_resource_path(cls.HISTORY_PATH)
+        if os.path.exists(history):
+            paths.append(history)
+        return paths
+
+    @classmethod
+    def load_history(cls, path=None):
+        """读取撤销区划的继任关系，文件不存在时返回空字典"""
+        path = path or get_resource_path(cls.HISTORY_PATH)
+        if not os.path.exists(path):
+            return {}
+        import json
+
+        with open(path, "r", encoding="utf-8") as f:
+            return {str(k)[:6]: str(v)[:6] for k, v in json.load(f).items()}
+
+    @staticmethod
+    def resolution_table(area_map, history, first_prefix, last_prefix):
+        """为[first_prefix, last_prefix]内各省的每个6位前缀预先解析户籍地
+
+        返回(解析表起点, [(命中的区划码, 层级)])。
+        """
+        base = first_prefix * 10000
+        resolution = [
+            resolve_code(f"{code:06d}", area_map, history)
+            for code in range(base, (last_prefix + 1) * 10000)
+        ]
+        return base, resolution
+
+    @classmethod
+    def build_shards(cls, source=None, directory=None):
+        """按省编译分片索引，目录不可写时返回完整索引内容供内存使用"""
+        source = source or get_resource_path(cls.SOURCE_PATH)
+        directory = directory or get_resource_path(cls.SHARD_DIR)
+        inputs = [source] + cls._inputs()[1:]
+        stat = os.stat(source)
+        digests = {os.path.basename(path): cls._file_hash(path) for path in inputs}
+        digest = digests[os.path.basename(source)]
+        area_map = cls.parse_source(source)
+        history = cls.load_history()
+
+        provinces = {}
+        for code, name in area_map.items():
+            provinces.setdefault(code[:2], {})[code] = name
+        sizes = []
+        try:
+            os.makedirs(directory, exist_ok=True)
+            manifest = os.path.join(directory, "manifest")
+            if os.path.exists(manifest):
+                os.remove(manifest)  # 重建期间分片视为过期
+            for prefix, codes in provinces.items():
+                base, resolution = cls.resolution_table(
+                    area_map, history, int(prefix), int(prefix)
+                )
+                for target, _ in resolution:
+                    if target is not None and target not in codes:
+                        codes[target] = area_map[target]  # 跨省的继任区划
+                data = AreaIndex.build(
+                    codes, stat.st_mtime_ns, stat.st_size, digest, base, resolution
+                )
+                path = os.path.join(directory, f"{prefix}.idx")
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+                sizes.append(f"{prefix}.idx {len(data)}\n")
+            shard_list = os.path.join(directory, cls.SHARD_LIST)
+            with open(f"{shard_list}.tmp", "w") as f:
+                f.writelines(sizes)
+            os.replace(f"{shard_list}.tmp", shard_list)
+            cls._write_manifest(manifest, inputs, digests)
+        except OSError:
+            return cls._build_full(area_map, history, stat, digest)
+        return None
+
+    @classmethod
+    def _build_full(cls, area_map, history, stat, digest):
+        """编译包含所有省份的完整索引"""
+        prefixes = [int(code[:2]) for code in area_map]
+        base, resolution = cls.resolution_table(
+            area_map, history, min(prefixes), max(prefixes)
+        )
+        return AreaIndex.build(
+            area_map, stat.st_mtime_ns, stat.st_size, digest, base, resolution
+        )
+
+    @staticmethod
+    def _read_manifest(path):
+        """读取分片清单：{文件名: (mtime, 大小, SHA1)}"""
+        try:
+            entries = {}
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    name, mtime, size, digest = line.split()
+                    entries[name] = int(mtime), int(size), bytes.fromhex(digest)
+            return entries
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(path, inputs, digests):
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            for source in inputs:
+                stat = os.stat(source)
+                name = os.path.basename(source)
+                f.write(
+                    f"{name} {stat.st_mtime_ns} {stat.st_size} {digests[name].hex()}\n"
+                )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def parse_source(cls, path):
+        """解析area_code.json为{6位区划码: 全称}"""
+        area_map = {}
+
+        def process_node(node, parent_names=[]):
+            code = str(node["code"])[:6]
+            current_name = node["name"]
+            current_level = node["level"]
+
+            if current_level == 1 and current_name.endswith(("市", "省", "自治区")):
+                parent_names = [current_name]
+
+            full_name = "".join(parent_names) + current_name
+            area_map[code] = full_name.replace("市辖区", "")
+
+            if "children" in node:
+                new_parent = parent_names.copy()
+                if current_level == 1:
+                    new_parent = [current_name]
+                elif current_level == 2 and current_name != "市辖区":
+                    new_parent.append(current_name)
+                for child in node["children"]:
+                    process_node(child, new_parent)
+
+        import json
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            for province in data:
+                process_node(province)
+        return area_map
+
+    @staticmethod
+    def _file_hash(path):
+        import hashlib
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.digest()
@@ -0,0 +1,186 @@
+"""记录浏览：按需分页与排序（不依赖图形界面，供虚拟化列表使用）
+
+列表只按可见范围调用rows(start, stop)取数据，排序只重排行号，
+不会为每一行创建对象。全部记录与筛选结果直接从列式记录表分页读取，
+按出生日期与区划码排序使用表中的列；同名结果等小集合的身份证号按18字节
+定长打包在一个bytes中，排序取自身份证号。安装了NumPy时排序整列向量化。
+"""
+
+from array import array
+
+SORT_INSERT = "insert"  # 录入顺序
+SORT_NAME = "name"
+SORT_BIRTH = "birth"
+SORT_AREA = "area"  # 按区划码，同一省市相邻
+SORT_KEYS = (SORT_INSERT, SORT_NAME, SORT_BIRTH, SORT_AREA)
+
+ID_WIDTH = 18
+# 读取整个记录库时每攒够这么多身份证号打包一次
+SCAN_BATCH = 65536
+
+
+def pack_ids(ids):
+    """把身份证号打包为定长bytes，长度不是18位的号码补空格或截断"""
+    ids = list(ids)
+    blob = "".join(ids).encode("ascii", "replace")
+    if len(blob) == len(ids) * ID_WIDTH:
+        return blob
+    return b"".join(
+        id_number.encode("ascii", "replace").ljust(ID_WIDTH)[:ID_WIDTH]
+        for id_number in ids
+    )
+
+
+def sort_order(blob, names, key, rows=None):
+    """返回按key升序（稳定）排列的行号序列，rows给出时只排这些行"""
+    try:
+        import numpy as np
+    except ImportError:
+        return _sort_order_python(blob, names, key, rows)
+    return _sort_order_numpy(np, blob, names, key, rows)
+
+
+def _sort_order_python(blob, names, key, rows):
+    if rows is None:
+        rows = range(len(names))
+    if key == SORT_NAME:
+        sort_key = names.__getitem__
+    elif key == SORT_BIRTH:
+        sort_key = lambda i: blob[i * ID_WIDTH + 6 : i * ID_WIDTH + 14]
+    else:
+        sort_key = lambda i: blob[i * ID_WIDTH : i * ID_WIDTH + 6]
+    return array("L", sorted(rows, key=sort_key))
+
+
+def _sort_order_numpy(np, blob, names, key, rows):
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+    if key == SORT_NAME:
+        # 先对不重复的姓名排序得到名次，再按名次整列排序
+        if rows is not None:
+            names = [names[row] for row in rows]
+        ranks = {name: rank for rank, name in enumerate(sorted(set(names)))}
+        keys = np.fromiter(
+            map(ranks.__getitem__, names), dtype=np.int64, count=len(names)
+        )
+    else:
+        # 可变的bytearray先复制，避免排序期间其他线程追加时缓冲区被占用
+        data = blob if isinstance(blob, bytes) else bytes(blob)
+        count = len(data) // ID_WIDTH
+        digits = np.frombuffer(data, dtype=np.uint8)[: count * ID_WIDTH]
+        digits = digits.reshape(count, ID_WIDTH)
+        if rows is not None:
+            digits = digits[rows]
+        start, stop = (6, 14) if key == SORT_BIRTH else (0, 6)
+        weights = 10 ** np.arange(stop - start - 1, -1, -1, dtype=np.int64)
+        keys = (digits[:, start:stop].astype(np.int64) - 48) @ weights
+    order = np.argsort(keys, kind="stable")
+    return order if rows is None else rows[order]
+
+
+class RowList:
+    """(姓名, 身份证号)列表，供同名结果、边输边搜等小集合使用
+
+    与列式记录表（idcard.table.RecordTable）一样提供name_at()、id_at()与order_by()，
+    RowSource可以显示其中任意一种。
+    """
+
+    def __init__(self, names=(), blob=b""):
+        self.names = names if isinstance(names, list) else list(names)
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.names)
+
+    def name_at(self, row):
+        return self.names[row]
+
+    def id_at(self, row):
+        return self.blob[row * ID_WIDTH : (row + 1) * ID_WIDTH].decode("ascii").strip()
+
+    def order_by(self, key, count, rows=None):
+        return sort_order(self.blob, self.names, key, rows)
+
+
+class RowSource:
+    """可排序的(姓名, 身份证号)行集合
+
+    records为RowList或列式记录表，只包含其前count行；rows给出时只包含这些行号
+    （按录入顺序），用于显示筛选结果。行在显示时才从records中读取，不复制数据。
+    """
+
+    def __init__(self, records=None, rows=None, count=None):
+        self.records = RowList() if records is None else records
+        self.count = len(self.records) if count is None else count
+        self.subset = rows
+        self.sort_key = SORT_INSERT
+        self.descending = False
+        self._order = rows
+
+    @classmethod
+    def from_rows(cls, rows):
+        """由(姓名, 身份证号)序列创建"""
+        names = []
+        ids = []
+        for name, id_number in rows:
+            names.append(name)
+            ids.append(id_number)
+        return cls(RowList(names, pack_ids(ids)))
+
+    def __len__(self):
+        return self.count if self._order is None else len(self._order)
+
+    def ordered_by(self, key=SORT_INSERT, descending=False):
+        """返回按key排序的新视图（与原视图共享数据，原视图不变）
+
+        大量记录时耗时较长，界面应在后台线程调用；只切换升降序时不重新排序。
+        """
+        if key not in SORT_KEYS:
+            raise ValueError(f"未知的排序方式：{key}")
+        view = RowSource(self.records, self.subset, self.count)
+        view.sort_key = key
+        view.descending = descending
+        if key == self.sort_key:
+            view._order = self._order
+        elif key != SORT_INSERT:
+            view._order = self.records.order_by(key, self.count, self.subset)
+        return view
+
+    def row_number(self, position):
+        """第position个显示位置对应的行号"""
+        if self.descending:
+            position = len(self) - 1 - position
+        if self._order is None:
+            return position
+        return int(self._order[position])
+
+    def id_at(self, row):
+        return self.records.id_at(row)
+
+    def rows(self, start, stop):
+        """返回显示位置[start, stop)的(姓名, 身份证号)"""
+        start = max(start, 0)
+        stop = min(stop, len(self))
+        records = self.records
+        result = []
+        for position in range(start, stop):
+            row = self.row_number(position)
+            result.append((records.name_at(row), records.id_at(row)))
+        return result
+
+    def position_of(self, id_number):
+        """身份证号当前的显示位置，不存在时返回None（逐行查找，适合同名结果等小集合）"""
+        for position in range(len(self)):
+            if self.id_at(self.row_number(position)) == id_number:
+                return position
+        return None
+
+
+def store_source(store):
+    """全部记录按录入顺序的RowSource，不复制记录
+
+    文本记录库直接分页读取其列式记录表；其他后端先读取一遍建立列式记录表。
+    """
+    from .table import store_table
+
+    return RowSource(store_table(store))
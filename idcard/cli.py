@@ -0,0 +1,347 @@
+"""命令行入口（无图形界面，适合定时任务）
+
+    python -m idcard import sfz.sfzx --db config/database.sfz --workers 8
+    cat sfz.sfzx | python -m idcard import - --store sqlite
+    python -m idcard validate sfz.sfzx > valid.tsv
+    python -m idcard serve --port 8765
+    python -m idcard compact --db config/records
+    python -m idcard generate big.sfzx --rows 10000000 --invalid-rate 0.01
+    python -m idcard --profile report.json --cprofile run.pstats import sfz.sfzx
+
+汇总信息（吞吐量与按原因统计的失败数）写到标准错误，
+validate的合法行以“身份证号\\t姓名\\t户籍地”写到标准输出。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 退出码
+EXIT_OK = 0
+EXIT_REJECTED = 1  # 有行导入失败
+EXIT_USAGE = 2  # 参数错误（argparse的约定）
+EXIT_ERROR = 3  # 输入文件、记录库或行政区划数据无法使用
+EXIT_INTERRUPTED = 130
+
+
+def format_summary(result, elapsed, title):
+    """导入结果汇总：成功/失败数、吞吐量、按原因统计的失败数"""
+    from .importer import REJECT_MESSAGES
+
+    consumed = result.offset - result.start_offset
+    rows = result.total + result.existing
+    rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+    mb_per_sec = consumed / elapsed / (1 << 20) if elapsed > 0 else 0.0
+    lines = [
+        f"{title}：成功 {result.success} 条，"
+        + (f"已存在 {result.existing} 条，" if result.existing else "")
+        + f"失败 {result.failed} 条，共 {rows} 行",
+        f"耗时 {elapsed:.2f} 秒，{rows_per_sec:,.0f} 行/秒，{mb_per_sec:.1f} MB/秒",
+    ]
+    for reason, count in sorted(result.rejects.items()):
+        lines.append(f"  {REJECT_MESSAGES.get(reason, reason)}：{count}")
+    return "\n".join(lines)
+
+
+def open_input(path):
+    """打开输入文件，"-"表示标准输入"""
+    if path == "-":
+        return sys.stdin.buffer
+    return open(path, "rb")
+
+
+def command_import(args):
+    from .area import AreaCodeLoader
+    from .importer import BatchImporter, ImportCheckpoint
+    from .parser import CachedParser
+    from .progress import ProgressLine, ProgressReporter
+    from .store import create_store
+
+    area_codes = AreaCodeLoader.load()
+    store = create_store(args.store, args.db)
+    store.load()
+    importer = BatchImporter(
+        store,
+        area_codes,
+        durability=args.durability,
+        workers=args.workers,
+        parser=CachedParser(area_codes),
+    )
+    checkpoint = None
+    start_offset = 0
+    if args.input != "-":
+        checkpoint = ImportCheckpoint.for_store(store)
+        if args.resume:
+            start_offset = checkpoint.load(args.input)
+
+    line = ProgressLine() if args.progress else None
+    reporter = ProgressReporter(line, start_offset=start_offset) if line else None
+    started = time.perf_counter()
+    try:
+        if args.input == "-":
+            result = importer.run_stream(sys.stdin.buffer, reporter)
+        else:
+            result = importer.run(args.input, reporter, start_offset, checkpoint)
+    finally:
+        if reporter is not None:
+            reporter.finish()  # 补发被限频合并掉的最后一次更新
+        if line is not None:
+            line.close()
+        store.close()
+    print(
+        format_summary(result, time.perf_counter() - started, "导入完成"),
+        file=sys.stderr,
+    )
+    return EXIT_REJECTED if result.failed else EXIT_OK
+
+
+def command_validate(args):
+    from .area import AreaCodeLoader
+    from .importer import ImportResult, iter_chunks, split_rows, validate_rows
+    from .parser import CachedParser
+
+    parser = CachedParser(AreaCodeLoader.load())
+    result = ImportResult()
+    out = sys.stdout
+    started = time.perf_counter()
+    with open_input(args.input) as f:
+        chunks = validate_rows(split_rows(iter_chunks(f, offset=0)))
+        for offset, rows, rejects in chunks:
+            result.rejects.update(rejects)
+            result.success += len(rows)
+            result.offset = offset
+            out.write(
+                "".join(
+                    f"{id_num}\t{name}\t{parser.location(id_num)}\n"
+                    for id_num, name in rows
+                )
+            )
+    out.flush()
+    print(
+        format_summary(result, time.perf_counter() - started, "校验完成"),
+        file=sys.stderr,
+    )
+    return EXIT_REJECTED if result.failed else EXIT_OK
+
+
+def command_serve(args):
+    from .area import AreaCodeLoader
+    from .server import IdService, serve
+    from .store import create_store
+
+    store = create_store(args.store, args.db)
+    store.load()
+    service = IdService(AreaCodeLoader.load(), store)
+
+    def ready(server):
+        for sock in server.sockets:
+            host, port = sock.getsockname()[:2]
+            print(f"正在监听 http://{host}:{port}", file=sys.stderr)
+
+    try:
+        serve(service, args.host, args.port, ready)
+    finally:
+        store.close()
+    return EXIT_OK
+
+
+def command_compact(args):
+    from .logstore import LogStore
+    from .paths import get_resource_path
+    from .store import LOG_PATH
+
+    store = LogStore(args.db or get_resource_path(LOG_PATH))
+    if not os.path.exists(store.path):
+        raise FileNotFoundError(f"找不到日志记录库：{store.directory}")
+    store.load()
+    try:
+        size = os.path.getsize(store.path)
+        dead = store.dead_records()
+        store.compact()
+        compacted = os.path.getsize(store.path)
+    finally:
+        store.close()
+    print(
+        f"压缩完成：清理旧记录 {dead} 条，有效记录 {len(store)} 条，"
+        f"日志 {size / (1 << 20):,.1f} MB → {compacted / (1 << 20):,.1f} MB",
+        file=sys.stderr,
+    )
+    return EXIT_OK
+
+
+def command_generate(args):
+    import json
+
+    from .area import AreaCodeLoader
+    from .generator import DatasetSpec, generate
+    from .paths import get_resource_path
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "sfz" if args.output.endswith(".sfz") else "sfzx"
+    weights = None
+    if args.weights:
+        with open(args.weights, "r", encoding="utf-8") as f:
+            weights = json.load(f)
+    spec = DatasetSpec(
+        AreaCodeLoader.parse_source(get_resource_path(AreaCodeLoader.SOURCE_PATH)),
+        args.seed,
+        args.invalid_rate,
+        args.duplicate_rate,
+        args.conflict_rate,
+        fmt,
+        weights,
+    )
+
+    started = time.perf_counter()
+
+    def progress(rows, written):
+        elapsed = time.perf_counter() - started
+        sys.stderr.write(
+            f"\r{rows / args.rows:.0%} {rows:,} 行 {written / (1 << 20):,.0f} MB "
+            f"{written / (1 << 20) / elapsed if elapsed else 0:,.0f} MB/秒"
+        )
+
+    show = progress if args.progress else None
+    if args.output == "-":
+        written = generate(
+            spec, args.rows, sys.stdout.buffer, args.workers, progress=show
+        )
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, "wb") as f:
+            written = generate(spec, args.rows, f, args.workers, progress=show)
+    elapsed = time.perf_counter() - started
+    if show is not None:
+        sys.stderr.write("\n")
+    print(
+        f"已生成 {args.rows:,} 行，{written / (1 << 20):,.1f} MB，耗时 {elapsed:.2f} 秒，"
+        f"{written / (1 << 20) / elapsed if elapsed else 0:,.0f} MB/秒",
+        file=sys.stderr,
+    )
+    return EXIT_OK
+
+
+def build_parser():
+    from .importer import DEFAULT_WORKERS
+    from .store import (
+        DURABILITY_CLOSE,
+        DURABILITY_FLUSH,
+        DURABILITY_NONE,
+        STORE_BACKENDS,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python -m idcard", description="身份证信息批量校验与导入"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="开启计时埋点，退出时把JSON报告写入REPORT（也可用环境变量IDCARD_PROFILE）",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="PSTATS",
+        help="用cProfile采样，退出时写出pstats文件（也可用环境变量IDCARD_CPROFILE）",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="导入文件（每行：身份证号 姓名）")
+    importer.add_argument("input", help="导入文件，-表示标准输入")
+    importer.add_argument("--db", help="记录库路径，默认为所选后端的默认位置")
+    importer.add_argument(
+        "--store", choices=STORE_BACKENDS, default="csv", help="记录库后端"
+    )
+    importer.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="并行导入的进程数（标准输入只能单进程）",
+    )
+    importer.add_argument(
+        "--durability",
+        choices=(DURABILITY_NONE, DURABILITY_CLOSE, DURABILITY_FLUSH),
+        default=DURABILITY_CLOSE,
+        help="落盘策略",
+    )
+    importer.add_argument("--resume", action="store_true", help="从上次中断处继续")
+    importer.add_argument(
+        "--progress",
+        action=argparse.BooleanOptionalAction,
+        default=sys.stderr.isatty(),
+        help="在标准错误刷新进度（默认仅在终端中显示）",
+    )
+    importer.set_defaults(handler=command_import)
+
+    validate = commands.add_parser("validate", help="只校验不导入，合法行写到标准输出")
+    validate.add_argument(
+        "input", nargs="?", default="-", help="输入文件，默认标准输入"
+    )
+    validate.set_defaults(handler=command_validate)
+
+    generator = commands.add_parser("generate", help="生成合成测试数据")
+    generator.add_argument("output", help="输出文件（.sfzx或.sfz），-表示标准输出")
+    generator.add_argument("--rows", type=int, required=True, help="行数")
+    generator.add_argument(
+        "--format", choices=("sfzx", "sfz"), help="输出格式，默认按扩展名判断"
+    )
+    generator.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="生成进程数"
+    )
+    generator.add_argument("--seed", type=int, default=0, help="随机数种子")
+    generator.add_argument(
+        "--invalid-rate", type=float, default=0.0, help="错误号码的比例"
+    )
+    generator.add_argument(
+        "--duplicate-rate", type=float, default=0.0, help="完全重复行的比例"
+    )
+    generator.add_argument(
+        "--conflict-rate", type=float, default=0.0, help="同号不同名行的比例"
+    )
+    generator.add_argument(
+        "--weights",
+        help="区划权重JSON文件：{区划码前缀（2、4或6位）: 权重}，未列出的为1",
+    )
+    generator.add_argument(
+        "--progress",
+        action=argparse.BooleanOptionalAction,
+        default=sys.stderr.isatty(),
+        help="在标准错误刷新进度（默认仅在终端中显示）",
+    )
+    generator.set_defaults(handler=command_generate)
+
+    server = commands.add_parser("serve", help="启动本地HTTP校验/查询服务")
+    server.add_argument("--host", default="127.0.0.1", help="监听地址")
+    server.add_argument("--port", type=int, default=8765, help="监听端口")
+    server.add_argument("--db", help="记录库路径，默认为所选后端的默认位置")
+    server.add_argument(
+        "--store", choices=STORE_BACKENDS, default="csv", help="记录库后端"
+    )
+    server.set_defaults(handler=command_serve)
+
+    compact = commands.add_parser("compact", help="压缩日志记录库，清理旧记录")
+    compact.add_argument("--db", help="日志记录库目录，默认为config/records")
+    compact.set_defaults(handler=command_compact)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    from . import instrument
+    from .area import AreaDataError
+
+    if args.profile or args.cprofile:
+        instrument.enable(args.profile, args.cprofile)
+
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        # 下游（如head）提前关闭了管道，避免退出时再次写入标准输出报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_OK
+    except (OSError, AreaDataError, ValueError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return EXIT_ERROR
@@ -0,0 +1,242 @@
+"""多版行政区划的区间索引
+
+行政区划每年都有撤并，早年登记的身份证号应按当时的区划名称解析。
+config/area_editions/下每个文件是一版区划数据（格式同area_code.json），
+文件名为该版的生效日期，如19800101.json或1980.json。
+最新一版的生效日期起按当前数据（area_code.json）解析，
+因此最新一版文件应为当前数据的副本，按其生效日期命名。
+
+各版合并为按(区划码, 生效日期)排序的区间表，只记录名称发生变化的
+日期，查询为一次二分查找；编译结果可内存映射，不构建Python字典。
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+from .area import TIER_EXACT
+
+EDITIONS_MAGIC = b"SFZE"
+EDITIONS_VERSION = 1
+# 魔数、版本、保留位、版本数、区间数、名称数、保留位
+EDITIONS_HEADER = struct.Struct("<4sHHIIII")
+
+# 区间键 = 区划码 * DATE_SCALE + 生效日期(YYYYMMDD)
+DATE_SCALE = 10**8
+
+
+def edition_date(filename):
+    """从文件名取生效日期，返回YYYYMMDD整数"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    if not stem.isdigit() or len(stem) not in (4, 6, 8):
+        raise ValueError(f"区划版本文件名应为生效日期：{filename}")
+    year, month, day = int(stem[:4]), int(stem[4:6] or 1), int(stem[6:8] or 1)
+    return year * 10000 + month * 100 + day
+
+
+class AreaEditions:
+    """多版行政区划的只读区间索引
+
+    文件布局（小端序）：
+        头部 | 区间键 uint64[n] | 名称序号 uint32[n] | 各版生效日期 uint32[e]
+        | 名称偏移表 uint32[k+1] | UTF-8名称数据
+
+    名称序号为0的区间表示该区划码在此期间已撤销。
+    """
+
+    def __init__(self, buffer, mapped=None):
+        magic, version = struct.unpack_from("<4sH", buffer, 0)
+        if magic != EDITIONS_MAGIC or version != EDITIONS_VERSION:
+            raise ValueError("区划版本索引格式不兼容")
+        self._mapped = mapped
+        self.path = None  # 由open()映射文件时为文件路径
+        self._view = memoryview(buffer)
+        _, _, _, editions, count, names, _ = EDITIONS_HEADER.unpack_from(self._view)
+
+        keys_start = EDITIONS_HEADER.size
+        ids_start = keys_start + 8 * count
+        dates_start = ids_start + 4 * count
+        offsets_start = dates_start + 4 * editions
+        blob_start = offsets_start + 4 * (names + 1)
+        self._count = count
+        self._keys = self._array_view("Q", keys_start, count)
+        self._name_ids = self._array_view("I", ids_start, count)
+        self._dates = self._array_view("I", dates_start, editions)
+        self._offsets = self._array_view("I", offsets_start, names + 1)
+        self._blob = self._view[blob_start:]
+
+    def _array_view(self, typecode, start, count):
+        size = array(typecode).itemsize
+        raw = self._view[start : start + size * count]
+        if sys.byteorder == "little":
+            return raw.cast(typecode)
+        values = array(typecode, raw.tobytes())
+        values.byteswap()
+        return values
+
+    @classmethod
+    def build(cls, editions):
+        """编译索引，editions为[(生效日期, {6位区划码: 全称})]"""
+        editions = sorted(editions, key=lambda edition: edition[0])
+        name_ids = {}
+        intervals = {}
+        previous = {}
+        for date, area_map in editions:
+            for code, name in area_map.items():
+                if previous.get(code) != name:
+                    if name not in name_ids:
+                        name_ids[name] = len(name_ids) + 1
+                    intervals.setdefault(code, []).append((date, name_ids[name]))
+            for code in previous.keys() - area_map.keys():
+                intervals[code].append((date, 0))  # 本版已撤销
+            previous = area_map
+
+        keys = array("Q")
+        ids = array("I")
+        for code in sorted(intervals):
+            for date, name_id in intervals[code]:
+                keys.append(int(code) * DATE_SCALE + date)
+                ids.append(name_id)
+        dates = array("I", [date for date, _ in editions])
+
+        offsets = array("I", [0])
+        blob = bytearray()
+        for name in name_ids:  # 字典按插入顺序，与序号一致
+            blob += name.encode("utf-8")
+            offsets.append(len(blob))
+
+        if sys.byteorder != "little":
+            for values in (keys, ids, dates, offsets):
+                values.byteswap()
+
+        header = EDITIONS_HEADER.pack(
+            EDITIONS_MAGIC,
+            EDITIONS_VERSION,
+            0,
+            len(dates),
+            len(keys),
+            len(name_ids),
+            0,
+        )
+        return b"".join(
+            (
+                header,
+                keys.tobytes(),
+                ids.tobytes(),
+                dates.tobytes(),
+                offsets.tobytes(),
+                bytes(blob),
+            )
+        )
+
+    @classmethod
+    def open(cls, path):
+        """以内存映射方式打开索引文件"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = cls(mapped, mapped)
+        except Exception:
+            mapped.close()
+            raise
+        index.path = path
+        return index
+
+    def __reduce__(self):
+        # 传给子进程时按路径重新映射，未写入文件的索引复制其内容
+        if self._mapped is not None and self.path is not None:
+            return type(self).open, (self.path,)
+        return type(self), (bytes(self._view),)
+
+    def close(self):
+        """释放内存映射"""
+        for view in (
+            self._keys,
+            self._name_ids,
+            self._dates,
+            self._offsets,
+            self._blob,
+            self._view,
+        ):
+            if isinstance(view, memoryview):
+                view.release()
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    @property
+    def dates(self):
+        """各版生效日期（升序）"""
+        return list(self._dates)
+
+    def era(self, date):
+        """date所在的版本序号，早于第一版的日期按第一版计
+
+        第一版之前的区划数据通常没有收录，此时沿用第一版的名称。
+        """
+        return max(bisect_right(self._dates, date) - 1, 0)
+
+    def name_at(self, code, date):
+        """区划码在date时的名称，当时不存在时返回None
+
+        早于第一版的日期按第一版查询，与era()一致。
+        """
+        if len(code) != 6 or not code.isdigit() or not len(self._dates):
+            return None
+        key = int(code) * DATE_SCALE + max(date, self._dates[0])
+        i = bisect_right(self._keys, key, 0, self._count) - 1
+        if i < 0 or self._keys[i] // DATE_SCALE != int(code):
+            return None
+        name_id = self._name_ids[i]
+        if not name_id:
+            return None
+        start, end = self._offsets[name_id - 1], self._offsets[name_id]
+        return str(self._blob[start:end], "utf-8")
+
+    def __len__(self):
+        return self._count
+
+
+class DatedAreaIndex:
+    """当前行政区划索引加上历史版本，按出生日期解析户籍地
+
+    最新一版生效之后按当前索引解析；历史版本中查不到（或当时已撤销）的
+    区划码同样按当前索引逐级解析。其余接口直接转给当前索引。
+    """
+
+    def __init__(self, current, editions):
+        self.current = current
+        self.editions = editions
+        dates = editions.dates
+        self._current_since = dates[-1] if dates else 0
+
+    def get(self, code, default=None):
+        return self.current.get(code, default)
+
+    def resolve(self, code):
+        return self.current.resolve(code)
+
+    def resolve_at(self, code, date):
+        """按date（YYYYMMDD整数）时的区划解析6位前缀，返回(户籍地, 命中层级)"""
+        if date >= self._current_since:
+            return self.current.resolve(code)
+        name = self.editions.name_at(code, date)
+        if name:
+            return name, TIER_EXACT
+        return self.current.resolve(code)
+
+    def era(self, date):
+        return self.editions.era(date)
+
+    def __getitem__(self, code):
+        return self.current[code]
+
+    def __contains__(self, code):
+        return code in self.current
+
+    def close(self):
+        self.editions.close()
+        self.current.close()
@@ -0,0 +1,404 @@
+"""合成身份证数据（基准测试与压测用）
+
+身份证号的户籍地前缀取自area_code.json中的区县级代码（可按前缀加权），
+出生日期按年龄近似正态分布（AGE_MEAN±AGE_SD岁）、不晚于REFERENCE_DATE，校验码与
+validate_check_code使用同一算法；可按比例混入错误号码、完全重复的行
+以及身份证号相同但姓名不同的冲突行。
+
+大批量生成时按块切分，每块的随机数种子由(seed, 块序号)决定，
+输出与进程数无关；安装了NumPy时整块向量化生成。
+
+    python -m idcard generate big.sfzx --rows 50000000 --workers 8
+"""
+
+import random
+from datetime import date, timedelta
+
+from .validator import CHECK_CODES, COEFFS
+
+# 生成算法变化时递增，基准测试据此区分缓存的数据文件
+GENERATOR_VERSION = 2
+
+REFERENCE_DATE = date(2020, 12, 31)
+AGE_MEAN = 38
+AGE_SD = 20
+AGE_MAX = 95
+
+BLOCK_ROWS = 200_000
+FORMATS = ("sfzx", "sfz")
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏飞鑫波宇浩凯健俊帆帅旭宁琳晨雪婷倩颖佳欣怡子涵梓轩思雨博文嘉龙泉皓昭宸"
+
+
+def check_code(body):
+    """17位本体对应的校验码"""
+    return CHECK_CODES[sum(int(a) * b for a, b in zip(body, COEFFS)) % 11]
+
+
+def county_prefixes(area_map):
+    """区县级区划码（后两位不为00），按代码排序"""
+    return sorted(code for code in area_map if not code.endswith("00"))
+
+
+def prefix_weights(prefixes, weights=None):
+    """各区划码的相对权重
+
+    weights为{区划码前缀（2、4或6位）: 权重}，每个区划码取最长匹配前缀的
+    权重，未列出的为1。
+    """
+    weights = weights or {}
+    result = []
+    for code in prefixes:
+        for key in (code, code[:4], code[:2]):
+            if key in weights:
+                result.append(float(weights[key]))
+                break
+        else:
+            result.append(1.0)
+    return result
+
+
+def birth_date(rng):
+    """按年龄分布抽取出生日期"""
+    # 超出[0, AGE_MAX)的年龄折回区间内，避免堆积在边界日期
+    age = abs(rng.gauss(AGE_MEAN, AGE_SD)) % AGE_MAX
+    return REFERENCE_DATE - timedelta(days=int(age * 365.25))
+
+
+class IdGenerator:
+    """按种子生成可复现的身份证号与姓名（纯Python）"""
+
+    def __init__(self, prefixes, seed=0, invalid_rate=0.0, weights=None):
+        if not prefixes:
+            raise ValueError("没有可用的区划码")
+        self.prefixes = list(prefixes)
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self._cumulative = None
+        if weights is not None:
+            total = 0.0
+            self._cumulative = []
+            for weight in weights:
+                total += weight
+                self._cumulative.append(total)
+
+    def valid_id(self):
+        rng = self.random
+        if self._cumulative is None:
+            prefix = rng.choice(self.prefixes)
+        else:
+            prefix = rng.choices(self.prefixes, cum_weights=self._cumulative)[0]
+        body = f"{prefix}{birth_date(rng):%Y%m%d}{rng.randrange(1000):03d}"
+        return body + check_code(body)
+
+    def invalid_id(self):
+        """校验码错误、长度错误或含非数字字符的号码"""
+        rng = self.random
+        id_number = self.valid_id()
+        kind = rng.randrange(3)
+        if kind == 0:
+            wrong = CHECK_CODES.replace(id_number[-1], "")
+            return id_number[:17] + rng.choice(wrong)
+        if kind == 1:
+            return id_number[: rng.choice((15, 17))]
+        position = rng.randrange(17)
+        return id_number[:position] + "A" + id_number[position + 1 :]
+
+    def id_number(self):
+        if self.invalid_rate and self.random.random() < self.invalid_rate:
+            return self.invalid_id()
+        return self.valid_id()
+
+    def name(self):
+        rng = self.random
+        return rng.choice(SURNAMES) + "".join(
+            rng.choice(GIVEN) for _ in range(rng.choice((1, 2, 2)))
+        )
+
+    def ids(self, count):
+        for _ in range(count):
+            yield self.id_number()
+
+    def rows(self, count):
+        """产出(身份证号, 姓名)"""
+        for _ in range(count):
+            yield self.id_number(), self.name()
+
+
+class DatasetSpec:
+    """大批量生成的参数，传给各子进程"""
+
+    def __init__(
+        self,
+        area_map,
+        seed=0,
+        invalid_rate=0.0,
+        duplicate_rate=0.0,
+        conflict_rate=0.0,
+        fmt="sfzx",
+        weights=None,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"未知的输出格式：{fmt}")
+        if invalid_rate + duplicate_rate + conflict_rate > 1:
+            raise ValueError("错误、重复与冲突比例之和不能超过1")
+        self.prefixes = county_prefixes(area_map)
+        if not self.prefixes:
+            raise ValueError("没有可用的区划码")
+        self.areas = [area_map[code] for code in self.prefixes]
+        self.weights = prefix_weights(self.prefixes, weights)
+        self.seed = seed
+        self.invalid_rate = invalid_rate
+        self.duplicate_rate = duplicate_rate
+        self.conflict_rate = conflict_rate
+        self.fmt = fmt
+        self._tables = None
+
+    def __getstate__(self):
+        # 查找表由各子进程自行构建，不随参数传递
+        state = dict(self.__dict__)
+        state["_tables"] = None
+        return state
+
+
+def format_rows(spec, ids, names, areas):
+    """按输出格式拼接为bytes"""
+    if spec.fmt == "sfz":
+        lines = [f"{n},{i},{a}\n" for i, n, a in zip(ids, names, areas)]
+    else:
+        lines = [f"{i} {n}\n" for i, n in zip(ids, names)]
+    return "".join(lines).encode("utf-8")
+
+
+def generate_block(spec, index, count):
+    """生成第index块的count行，返回bytes"""
+    try:
+        import numpy as np
+    except ImportError:
+        return _generate_block_python(spec, index, count)
+    return _generate_block_numpy(np, spec, index, count)
+
+
+def _mix_rows(spec, rng, ids, names, areas):
+    """按比例把部分行替换为前面某个普通行的重复或冲突（同号不同名）"""
+    plain = []
+    for i in range(len(ids)):
+        roll = rng.random()
+        if roll >= spec.duplicate_rate + spec.conflict_rate or not plain:
+            plain.append(i)
+            continue
+        j = plain[rng.randrange(len(plain))]
+        ids[i], areas[i] = ids[j], areas[j]
+        if roll < spec.duplicate_rate:
+            names[i] = names[j]
+        elif names[i] == names[j]:
+            names[i] = (
+                SURNAMES[(SURNAMES.index(names[i][0]) + 1) % len(SURNAMES)]
+                + names[i][1:]
+            )
+
+
+def _generate_block_python(spec, index, count):
+    generator = IdGenerator(
+        spec.prefixes, f"{spec.seed}:{index}", spec.invalid_rate, spec.weights
+    )
+    lookup = dict(zip(spec.prefixes, spec.areas))
+    ids = []
+    names = []
+    areas = []
+    for _ in range(count):
+        id_number = generator.id_number()
+        ids.append(id_number)
+        names.append(generator.name())
+        areas.append(lookup.get(id_number[:6], ""))
+    _mix_rows(spec, generator.random, ids, names, areas)
+    return format_rows(spec, ids, names, areas)
+
+
+def _numpy_tables(np, spec):
+    """区划码、日期、姓名用字与户籍地的查找表，每个进程只构建一次"""
+    if spec._tables is None:
+
+        def byte_table(texts, width):
+            table = np.zeros((len(texts), width), dtype=np.uint8)
+            lengths = np.empty(len(texts), dtype=np.int64)
+            for i, text in enumerate(texts):
+                data = text.encode("utf-8")
+                table[i, : len(data)] = np.frombuffer(data, dtype=np.uint8)
+                lengths[i] = len(data)
+            return table, lengths
+
+        prefixes = np.frombuffer(
+            "".join(spec.prefixes).encode("ascii"), dtype=np.uint8
+        ).reshape(-1, 6) - np.uint8(48)
+        cumulative = np.cumsum(np.asarray(spec.weights, dtype=np.float64))
+        cumulative /= cumulative[-1]
+        dates = "".join(
+            f"{REFERENCE_DATE - timedelta(days=d):%Y%m%d}"
+            for d in range(AGE_MAX * 366 + 1)
+        )
+        dates = np.frombuffer(dates.encode("ascii"), dtype=np.uint8).reshape(-1, 8)
+        area_width = max(len(area.encode("utf-8")) for area in spec.areas)
+        spec._tables = {
+            "prefixes": prefixes,
+            "cumulative": cumulative,
+            "dates": dates - np.uint8(48),
+            "surnames": byte_table(SURNAMES, 3)[0],
+            "given": byte_table(GIVEN, 3)[0],
+            "areas": byte_table(spec.areas, area_width),
+        }
+    return spec._tables
+
+
+def _generate_block_numpy(np, spec, index, count):
+    """整块向量化生成
+
+    每行先写入定宽的字节槽并记录哪些字节有效，最后用布尔掩码
+    按行优先顺序取出有效字节，即为拼接好的各行。
+    """
+    rng = np.random.default_rng([spec.seed, index])
+    tables = _numpy_tables(np, spec)
+
+    # 按累积权重二分查找，比rng.choice(p=…)快得多
+    cumulative = tables["cumulative"]
+    prefix_index = np.minimum(
+        np.searchsorted(cumulative, rng.random(count), side="right"),
+        len(cumulative) - 1,
+    )
+    ages = np.abs(rng.normal(AGE_MEAN, AGE_SD, count)) % AGE_MAX
+    day_index = (ages * 365.25).astype(np.int64)
+    sequence = rng.integers(0, 1000, count)
+
+    body = np.empty((count, 17), dtype=np.uint8)
+    body[:, :6] = tables["prefixes"][prefix_index]
+    body[:, 6:14] = tables["dates"][day_index]
+    body[:, 14] = sequence // 100
+    body[:, 15] = sequence // 10 % 10
+    body[:, 16] = sequence % 10
+    totals = body.astype(np.uint16) @ np.asarray(COEFFS, dtype=np.uint16)
+    checks = np.frombuffer(CHECK_CODES.encode("ascii"), dtype=np.uint8)
+
+    ids = np.empty((count, 18), dtype=np.uint8)
+    ids[:, :17] = body + np.uint8(48)
+    ids[:, 17] = checks[totals % 11]
+    id_lengths = np.full(count, 18, dtype=np.int64)
+
+    # 错误号码：校验码错误、长度错误、含非数字字符各占三分之一
+    invalid = np.flatnonzero(rng.random(count) < spec.invalid_rate)
+    kinds = rng.integers(0, 3, len(invalid))
+    wrong = invalid[kinds == 0]
+    ids[wrong, 17] = checks[(totals[wrong] + rng.integers(1, 11, len(wrong))) % 11]
+    short = invalid[kinds == 1]
+    id_lengths[short] = rng.choice((15, 17), len(short))
+    letter = invalid[kinds == 2]
+    ids[letter, rng.integers(0, 17, len(letter))] = ord("A")
+
+    surname = rng.integers(0, len(SURNAMES), count)
+    given = rng.integers(0, len(GIVEN), (count, 2))
+    two_chars = rng.random(count) < 2 / 3
+
+    # 重复行与冲突行复制前面某个普通行的身份证号
+    roll = rng.random(count)
+    duplicate = roll < spec.duplicate_rate
+    conflict = ~duplicate & (roll < spec.duplicate_rate + spec.conflict_rate)
+    special = duplicate | conflict
+    plain = np.flatnonzero(~special)
+    targets = np.flatnonzero(special)
+    before = np.searchsorted(plain, targets)
+    targets, before = targets[before > 0], before[before > 0]
+    sources = plain[(rng.random(len(targets)) * before).astype(np.int64)]
+    for column in (ids, id_lengths, prefix_index):
+        column[targets] = column[sources]
+    copy_name = duplicate[targets]
+    surname[targets[copy_name]] = surname[sources[copy_name]]
+    given[targets[copy_name]] = given[sources[copy_name]]
+    two_chars[targets[copy_name]] = two_chars[sources[copy_name]]
+    renamed, original = targets[~copy_name], sources[~copy_name]
+    same = surname[renamed] == surname[original]
+    surname[renamed[same]] = (surname[renamed[same]] + 1) % len(SURNAMES)
+
+    name = np.empty((count, 9), dtype=np.uint8)
+    name[:, :3] = tables["surnames"][surname]
+    name[:, 3:6] = tables["given"][given[:, 0]]
+    name[:, 6:] = tables["given"][given[:, 1]]
+    name_mask = np.ones((count, 9), dtype=bool)
+    name_mask[:, 6:] = two_chars[:, None]
+    id_mask = np.arange(18) < id_lengths[:, None]
+
+    if spec.fmt == "sfz":
+        area_table, area_lengths = tables["areas"]
+        area = area_table[prefix_index]
+        area_mask = np.arange(area.shape[1]) < area_lengths[prefix_index][:, None]
+        fields = [
+            (name, name_mask),
+            (b",", None),
+            (ids, id_mask),
+            (b",", None),
+            (area, area_mask),
+        ]
+    else:
+        fields = [(ids, id_mask), (b" ", None), (name, name_mask)]
+    fields.append((b"\n", None))
+
+    width = sum(len(f) if m is None else f.shape[1] for f, m in fields)
+    slots = np.empty((count, width), dtype=np.uint8)
+    mask = np.ones((count, width), dtype=bool)
+    column = 0
+    for field, field_mask in fields:
+        if field_mask is None:
+            slots[:, column] = field[0]
+            column += 1
+            continue
+        end = column + field.shape[1]
+        slots[:, column:end] = field
+        mask[:, column:end] = field_mask
+        column = end
+    return slots[mask].tobytes()
+
+
+_worker_spec = None
+
+
+def _init_worker(spec):
+    global _worker_spec
+    _worker_spec = spec
+
+
+def _generate_worker(task):
+    index, count = task
+    return generate_block(_worker_spec, index, count)
+
+
+def generate(spec, rows, out, workers=1, block_rows=BLOCK_ROWS, progress=None):
+    """生成rows行写入二进制流out，返回写入的字节数
+
+    progress(已生成行数, 字节数)在每块写出后调用。
+    """
+    tasks = [
+        (index, min(block_rows, rows - start))
+        for index, start in enumerate(range(0, rows, block_rows))
+    ]
+    written = 0
+    done = 0
+
+    def emit(task, data):
+        nonlocal written, done
+        out.write(data)
+        written += len(data)
+        done += task[1]
+        if progress is not None:
+            progress(done, written)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            emit(task, generate_block(spec, *task))
+        return written
+
+    from multiprocessing import Pool
+
+    with Pool(workers, initializer=_init_worker, initargs=(spec,)) as pool:
+        # imap按块顺序返回，输出与单进程完全相同
+        for task, data in zip(tasks, pool.imap(_generate_worker, tasks)):
+            emit(task, data)
+    return written
@@ -0,0 +1,416 @@
+"""批量导入（每行：身份证号 姓名）
+
+导入按流水线进行：分块读取 → 拆分 → 校验 → 去重 → 写入。
+每次只处理一个有限大小的块，内存占用与文件大小无关；
+每个块写入完成后记录已消费的字节偏移，崩溃后可从该偏移继续。
+
+并行模式下按字节范围把文件切成分片，子进程负责拆分、校验、解析户籍地
+并格式化好记录库的文本行，父进程按分片顺序整批去重写入，与已有记录的
+冲突判定结果和单进程导入完全一致。
+"""
+
+import io
+import os
+import threading
+from collections import Counter, deque
+
+from . import instrument
+from .parser import CachedParser
+from .store import (
+    DURABILITY_CLOSE,
+    RECORD_CONFLICT,
+    RECORD_EXISTS,
+    RECORD_NEW,
+    RecordStore,
+)
+from .validator import REASON_MESSAGES, REASON_OK, validate_batch
+
+CHUNK_SIZE = 1 << 20
+SHARD_SIZE = 8 << 20
+# 并行导入的默认进程数（命令行与图形界面的--workers）
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# 导入失败原因，身份证号本身的问题沿用validator的原因码
+REJECT_FORMAT = 10
+REJECT_CONFLICT = 11
+
+REJECT_MESSAGES = {
+    **{code: text for code, text in REASON_MESSAGES.items() if code != REASON_OK},
+    REJECT_FORMAT: "缺少姓名",
+    REJECT_CONFLICT: "身份证号已登记为其他姓名",
+}
+
+
+class ImportCancelled(Exception):
+    """导入被cancel()中止，已写入的记录与断点保留"""
+
+
+class ImportResult:
+    """批量导入统计，rejects按失败原因计数"""
+
+    def __init__(self, offset=0, bytes_total=0):
+        self.success = 0
+        self.existing = 0  # 已登记过的相同记录，跳过
+        self.rejects = Counter()
+        self.start_offset = offset
+        self.offset = offset
+        self.bytes_total = bytes_total
+
+    @property
+    def failed(self):
+        return sum(self.rejects.values())
+
+    @property
+    def total(self):
+        return self.success + self.failed
+
+    @property
+    def fraction(self):
+        """已消费字节占文件大小的比例"""
+        if not self.bytes_total:
+            return 1.0
+        return min(self.offset / self.bytes_total, 1.0)
+
+
+class RowBatch:
+    """一块合法的行，按列存放
+
+    areas为None时由父进程解析户籍地；lines为子进程按文本记录库格式
+    生成的“姓名,身份证号,户籍地”行，其他后端为None。
+    """
+
+    __slots__ = ("ids", "names", "areas", "lines")
+
+    def __init__(self, ids, names, areas=None, lines=None):
+        self.ids = ids
+        self.names = names
+        self.areas = areas
+        self.lines = lines
+
+    @classmethod
+    def from_rows(cls, rows):
+        """由validate_rows()产出的(身份证号, 姓名)列表创建"""
+        return cls([id_num for id_num, _ in rows], [name for _, name in rows])
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def iter_chunks(f, chunk_size=CHUNK_SIZE, offset=None):
+    """从二进制文件当前位置按块读取，只在换行处切分
+
+    产出(块结束处的文件偏移, 行列表)。管道等不可定位的流需给出起始offset。
+    """
+    if offset is None:
+        offset = f.tell()
+    pending = b""
+    while True:
+        with instrument.timer("import.read"):
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = pending + block
+            cut = block.rfind(b"\n") + 1
+            if not cut:
+                pending = block
+                continue
+            pending = block[cut:]
+            offset += cut
+            lines = block[:cut].decode("utf-8").split("\n")
+        yield offset, lines
+    if pending:
+        offset += len(pending)
+        yield offset, pending.decode("utf-8").split("\n")
+
+
+def split_rows(chunks):
+    """拆分出(身份证号, 姓名)，产出(偏移, 行, 失败原因计数)"""
+    for offset, lines in chunks:
+        rows = []
+        rejects = Counter()
+        with instrument.timer("import.split"):
+            for line in lines:
+                parts = line.split()
+                if not parts:
+                    continue
+                if len(parts) < 2:
+                    rejects[REJECT_FORMAT] += 1
+                    continue
+                rows.append((parts[0], " ".join(parts[1:])))
+        yield offset, rows, rejects
+
+
+def validate_rows(chunks):
+    """整块校验身份证号，产出(偏移, 合法行, 失败原因计数)"""
+    for offset, rows, rejects in chunks:
+        with instrument.timer("import.validate"):
+            valid, reasons = validate_batch([id_num for id_num, _ in rows])
+            accepted = []
+            for row, ok, reason in zip(rows, valid, reasons):
+                if ok:
+                    accepted.append(row)
+                else:
+                    rejects[int(reason)] += 1
+        yield offset, accepted, rejects
+
+
+def plan_shards(filepath, start_offset=0, shard_size=SHARD_SIZE):
+    """按字节范围切分文件，分片边界对齐到行首，产出(起始偏移, 结束偏移)"""
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        start = start_offset
+        while start < size:
+            end = start + shard_size
+            if end >= size:
+                end = size
+            else:
+                f.seek(end - 1)
+                f.readline()
+                end = f.tell()
+            yield start, end
+            start = end
+
+
+_worker_parser = None
+
+
+def _init_worker(area_codes):
+    """子进程使用父进程已加载的行政区划索引（按文件路径重新映射，不会重新编译）"""
+    global _worker_parser
+    _worker_parser = CachedParser(area_codes)
+
+
+def _import_shard(filepath, start, end, chunk_size, with_lines):
+    """子进程：读取[start, end)范围内的行，校验、解析户籍地，with_lines为真时格式化文本行"""
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    ids = []
+    names = []
+    areas = []
+    rejects = Counter()
+    location = _worker_parser.location
+    chunks = validate_rows(split_rows(iter_chunks(io.BytesIO(data), chunk_size)))
+    for _, accepted, rejected in chunks:
+        rejects.update(rejected)
+        for id_num, name in accepted:
+            ids.append(id_num)
+            names.append(name)
+            areas.append(location(id_num))
+    lines = None
+    if with_lines:
+        lines = [
+            f"{name},{id_num},{area}\n" for id_num, name, area in zip(ids, names, areas)
+        ]
+    return end, RowBatch(ids, names, areas, lines), rejects
+
+
+class ImportCheckpoint:
+    """导入断点文件，记录输入文件路径、大小与已完成的字节偏移
+
+    断点只对写入的那个记录库有效，应通过for_store()取得。
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_store(cls, store):
+        """记录库对应的断点文件，与记录库文件放在一起（如database.sfz.ckpt）"""
+        return cls(f"{store.path}.ckpt")
+
+    def load(self, filepath):
+        """返回filepath对应的断点偏移，没有匹配的断点时返回0"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                offset, size, saved_path = f.read().split("\t", 2)
+        except (OSError, ValueError):
+            return 0
+        if saved_path != os.path.abspath(filepath):
+            return 0
+        if int(size) != os.path.getsize(filepath):
+            return 0
+        return int(offset)
+
+    def save(self, filepath, offset):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            size = os.path.getsize(filepath)
+            f.write(f"{offset}\t{size}\t{os.path.abspath(filepath)}")
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BatchImporter:
+    """将导入文件写入记录库"""
+
+    def __init__(
+        self,
+        store,
+        area_codes,
+        chunk_size=CHUNK_SIZE,
+        flush_rows=10000,
+        flush_ms=500,
+        durability=DURABILITY_CLOSE,
+        workers=1,
+        shard_size=SHARD_SIZE,
+        parser=None,
+    ):
+        self.store = store
+        self.area_codes = area_codes
+        self.parser = parser or CachedParser(area_codes)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.shard_size = shard_size
+        self.writer_options = {
+            "flush_rows": flush_rows,
+            "flush_ms": flush_ms,
+            "durability": durability,
+        }
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """请求中止导入（可从其他线程调用）
+
+        当前块写入并保存断点后，run()关闭写入器并抛出ImportCancelled。
+        """
+        self._cancelled.set()
+
+    def run(self, filepath, progress=None, start_offset=0, checkpoint=None):
+        """执行批量导入
+
+        progress(result)在每个块处理完成后调用；start_offset为开始读取的
+        字节偏移；checkpoint为ImportCheckpoint时，每个块完成后保存断点，
+        导入结束后清除。
+
+        workers大于1且剩余数据超过一个分片时使用多进程并行导入，
+        子进程按文件路径重新打开本进程的行政区划索引（area_codes）。
+        """
+        bytes_total = os.path.getsize(filepath)
+        result = ImportResult(start_offset, bytes_total)
+        if self.workers > 1 and bytes_total - start_offset > self.shard_size:
+            chunks = self._read_parallel(filepath, start_offset)
+        else:
+            chunks = self._read_sequential(filepath, start_offset)
+        try:
+            self._consume(chunks, result, progress, filepath, checkpoint)
+        finally:
+            chunks.close()  # 中止时立即取消尚未开始的分片并等待子进程退出
+        if checkpoint is not None:
+            checkpoint.clear()
+        return result
+
+    def run_stream(self, f, progress=None):
+        """从二进制流（如标准输入）导入，单进程且不记录断点"""
+        result = ImportResult()
+        chunks = validate_rows(split_rows(iter_chunks(f, self.chunk_size, 0)))
+        chunks = (
+            (offset, RowBatch.from_rows(rows), rejects)
+            for offset, rows, rejects in chunks
+        )
+        self._consume(chunks, result, progress)
+        return result
+
+    def _consume(self, chunks, result, progress, filepath=None, checkpoint=None):
+        """逐块写入记录库并汇报进度"""
+        with self.store.open_writer(**self.writer_options) as writer:
+            for offset, rows, rejects in chunks:
+                result.rejects.update(rejects)
+                with instrument.timer("import.write"):
+                    self._write_rows(rows, result, writer)
+                instrument.count("import.rows", len(rows))
+                result.offset = offset
+                if checkpoint is not None:
+                    # 断点之前的记录必须先落盘，否则断电后断点可能越过未写入的行；
+                    # DURABILITY_NONE时只交给操作系统，断点只在进程崩溃后可靠
+                    with instrument.timer("import.checkpoint"):
+                        writer.sync()
+                        checkpoint.save(filepath, offset)
+                if progress is not None:
+                    progress(result)
+                if self._cancelled.is_set():
+                    raise ImportCancelled(result.offset)
+
+    def _read_sequential(self, filepath, start_offset):
+        """单进程读取，产出(偏移, RowBatch, 失败原因计数)"""
+        with open(filepath, "rb") as f:
+            f.seek(start_offset)
+            chunks = validate_rows(split_rows(iter_chunks(f, self.chunk_size)))
+            for offset, rows, rejects in chunks:
+                yield offset, RowBatch.from_rows(rows), rejects
+
+    def _read_parallel(self, filepath, start_offset):
+        """多进程读取，按分片顺序产出(偏移, RowBatch, 失败原因计数)"""
+        from concurrent.futures import ProcessPoolExecutor
+
+        shards = plan_shards(filepath, start_offset, self.shard_size)
+        # 文本记录库可直接写入子进程格式化好的行
+        with_lines = isinstance(self.store, RecordStore)
+        with ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(self.area_codes,)
+        ) as pool:
+            pending = deque()
+            try:
+                # 在途分片数有上限，内存占用不随文件大小增长
+                for start, end in shards:
+                    pending.append(
+                        pool.submit(
+                            _import_shard,
+                            filepath,
+                            start,
+                            end,
+                            self.chunk_size,
+                            with_lines,
+                        )
+                    )
+                    if len(pending) >= self.workers * 2:
+                        yield self._wait_shard(pending.popleft())
+                while pending:
+                    yield self._wait_shard(pending.popleft())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _wait_shard(future):
+        """等待子进程完成分片（子进程内各阶段的耗时不计入本进程的计时）"""
+        with instrument.timer("import.wait_shard"):
+            return future.result()
+
+    def _write_rows(self, batch, result, writer):
+        """按文件顺序去重后写入记录库，同名冲突时先出现者为准
+
+        写入器提供add_batch()时（文本记录库）整批去重写入，否则逐行判断。
+        """
+        add_batch = getattr(writer, "add_batch", None)
+        if add_batch is not None:
+            areas = batch.areas
+            if areas is None:
+                location = self.parser.location
+                areas = [location(id_num) for id_num in batch.ids]
+            counts = Counter(add_batch(batch.names, batch.ids, areas, batch.lines))
+            result.success += counts[RECORD_NEW]
+            result.existing += counts[RECORD_EXISTS]
+            if counts[RECORD_CONFLICT]:
+                result.rejects[REJECT_CONFLICT] += counts[RECORD_CONFLICT]
+            return
+
+        areas = batch.areas
+        for i, (id_num, name) in enumerate(zip(batch.ids, batch.names)):
+            status = self.store.status(name, id_num)
+            if status != RECORD_NEW:
+                if status == RECORD_CONFLICT:
+                    result.rejects[REJECT_CONFLICT] += 1
+                else:
+                    result.existing += 1
+                continue
+
+            area = areas[i] if areas is not None else self.parser.location(id_num)
+            writer.add(name, id_num, area)
+            result.success += 1
@@ -0,0 +1,241 @@
+"""性能计数与计时（默认关闭）
+
+开启方式：
+    环境变量  IDCARD_PROFILE=report.json     计时报告（值为1时写入idcard-profile.json）
+              IDCARD_CPROFILE=run.pstats     同时用cProfile采样，退出时写出pstats文件
+    命令行    --profile report.json --cprofile run.pstats
+
+关闭时每个埋点只多一次布尔判断。计时按名称汇总次数、总耗时、最短与最长耗时，
+程序退出时写出JSON报告；cProfile结果可用python -m pstats run.pstats查看。
+子进程（并行导入的工作进程）中的计时不计入报告：以spawn方式启动的子进程
+（Windows、macOS）会重新导入本模块，环境变量在子进程中不生效，也不写出报告。
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+ENV_REPORT = "IDCARD_PROFILE"
+ENV_CPROFILE = "IDCARD_CPROFILE"
+DEFAULT_REPORT = "idcard-profile.json"
+
+enabled = False
+
+_stats = {}
+_counters = {}
+_lock = threading.Lock()
+_profiles = []
+_profiling = False
+_outputs = {"report": None, "cprofile": None}
+_started = time.perf_counter()
+_owner = None  # 调用enable()的进程，只有它在退出时写出报告
+
+
+class Stat:
+    """一个埋点的累计耗时"""
+
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds, count=1):
+        self.count += count
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "min_us": self.min * 1e6 if self.count else 0.0,
+            "max_us": self.max * 1e6,
+        }
+
+
+def record(name, seconds, count=1):
+    """累加一段耗时，count为这段时间处理的条数"""
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = Stat()
+        stat.add(seconds, count)
+
+
+def count(name, n=1):
+    """累加计数器"""
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.started)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """计时上下文：with timer("import.write"): ..."""
+    if enabled:
+        return _Timer(name)
+    return _NULL_TIMER
+
+
+def timed(name):
+    """计时装饰器"""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorate
+
+
+class profile_thread:
+    """在当前线程启用cProfile（仅在开启cProfile时生效），用于后台线程"""
+
+    def __enter__(self):
+        self.profile = None
+        if _profiling:
+            import cProfile
+
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is not None:
+            self.profile.disable()
+            with _lock:
+                _profiles.append(self.profile)
+
+
+def report():
+    """当前的计时与计数汇总"""
+    with _lock:
+        stats = {name: stat.to_dict() for name, stat in sorted(_stats.items())}
+        counters = dict(sorted(_counters.items()))
+    return {
+        "pid": os.getpid(),
+        "uptime_s": time.perf_counter() - _started,
+        "timers": stats,
+        "counters": counters,
+    }
+
+
+def write_report(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, ensure_ascii=False, indent=2)
+
+
+def write_profile(path):
+    """合并各线程的cProfile结果写为pstats文件"""
+    import pstats
+
+    with _lock:
+        profiles = list(_profiles)
+    if profiles:
+        pstats.Stats(*profiles).dump_stats(path)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+
+
+def enable(report_path=None, cprofile_path=None):
+    """开启计时；给出路径时在程序退出时写出报告与pstats文件"""
+    global enabled, _profiling, _owner
+    enabled = True
+    _owner = os.getpid()
+    if report_path:
+        _outputs["report"] = report_path
+    if cprofile_path and not _profiling:
+        import cProfile
+
+        _outputs["cprofile"] = cprofile_path
+        _profiling = True
+        main_profile = cProfile.Profile()
+        main_profile.enable()
+        _profiles.append(main_profile)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def _write_outputs():
+    if _owner != os.getpid():
+        return  # 从开启计时的进程fork出的子进程
+    if _profiling:
+        for profile in _profiles:
+            profile.disable()
+    if _outputs["report"]:
+        write_report(_outputs["report"])
+    if _outputs["cprofile"]:
+        write_profile(_outputs["cprofile"])
+
+
+atexit.register(_write_outputs)
+
+
+def _in_child_process():
+    import multiprocessing
+
+    return multiprocessing.parent_process() is not None
+
+
+def enable_from_env():
+    """按环境变量开启计时，子进程中不开启"""
+    report_path = os.environ.get(ENV_REPORT)
+    cprofile_path = os.environ.get(ENV_CPROFILE)
+    if (report_path or cprofile_path) and not _in_child_process():
+        if report_path in (None, "", "1"):
+            report_path = DEFAULT_REPORT
+        enable(report_path, cprofile_path)
+
+
+enable_from_env()
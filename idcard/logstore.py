@@ -0,0 +1,697 @@
+"""追加式日志记录库（以身份证号为主键，姓名索引允许一名多人）
+
+目录结构：
+    records.log  追加写入的记录日志，每条记录带CRC32，尾部残缺的记录在加载时截断
+    rejected.sfz 从database.sfz迁移时身份证号格式错误、未导入的行
+    id.idx       身份证号 → 记录偏移 的持久化哈希表
+    name.idx     姓名哈希 → 记录偏移 的持久化哈希表（允许重复键）
+
+索引文件以内存映射方式打开，头部记录所覆盖的日志长度（检查点），
+启动时只需重放检查点之后追加的日志，耗时与索引大小而非记录总数成正比。
+某偏移处的记录当且仅当id索引指向它时才有效，更新与删除都只需追加新记录，
+compact()会重写日志，只保留有效记录；关闭时无效记录占比超过compact_ratio
+会自动压缩，也可用 python -m idcard compact 手动压缩。
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from hashlib import blake2b
+
+from .store import (
+    DURABILITY_CLOSE,
+    DURABILITY_FLUSH,
+    DURABILITY_NONE,
+    RECORD_CONFLICT,
+    RECORD_EXISTS,
+    RECORD_NEW,
+)
+
+LOG_MAGIC = b"SFZL"
+INDEX_MAGIC = b"SFZI"
+FORMAT_VERSION = 1
+
+# 日志头：魔数、版本、保留位、日志标识
+LOG_HEADER = struct.Struct("<4sHH8s")
+# 记录头：CRC32、载荷长度、记录类型
+RECORD_HEADER = struct.Struct("<IHB")
+# 索引头：魔数、版本、字节序、日志标识、覆盖的日志长度、有效记录数、已用槽位数、槽位数
+INDEX_HEADER = struct.Struct("<4sHH8sQQQQ")
+
+RECORD_PUT = 1
+RECORD_DELETE = 2
+
+FIELD_SEPARATOR = "\x1f"
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+EMPTY_LOG_SIZE = LOG_HEADER.size
+
+# 迁移时身份证号格式错误的行原样保存在此文件中
+REJECTED_FILE = "rejected.sfz"
+
+# 关闭时被更新或删除的旧记录占全部记录的比例超过COMPACT_RATIO、
+# 且至少有COMPACT_MIN_DEAD条时自动压缩
+COMPACT_RATIO = 0.5
+COMPACT_MIN_DEAD = 10000
+
+
+def id_key(id_number):
+    """身份证号映射为非零的64位整数键，不是18位身份证号格式时返回None"""
+    if len(id_number) == 18 and id_number.isascii() and id_number[:17].isdigit():
+        check = "0123456789X".find(id_number[17].upper())
+        if check >= 0:
+            return int(id_number[:17]) * 11 + check + 1
+    return None
+
+
+def name_key(name):
+    """姓名映射为稳定的非零64位哈希（不使用受随机化影响的hash()）"""
+    key = int.from_bytes(
+        blake2b(name.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+    return key or 1
+
+
+class HashTable:
+    """开放寻址哈希表，每个槽位为(键, 值)两个uint64，键为0表示空槽
+
+    同一个键可以出现多次，查找时返回所有值。
+    """
+
+    def __init__(self, slots, capacity, used=0):
+        self.slots = slots
+        self.capacity = capacity
+        self.used = used
+        self._shift = 64 - (capacity.bit_length() - 1)
+
+    @staticmethod
+    def capacity_for(count):
+        capacity = 16
+        while capacity < count * 2:
+            capacity *= 2
+        return capacity
+
+    @classmethod
+    def empty(cls, capacity):
+        slots = array("Q")
+        slots.frombytes(bytes(capacity * 16))
+        return cls(slots, capacity)
+
+    def _home(self, key):
+        return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def find(self, key):
+        """返回键对应的所有值"""
+        slots = self.slots
+        mask = self.capacity - 1
+        i = self._home(key)
+        values = []
+        while True:
+            stored = slots[2 * i]
+            if not stored:
+                return values
+            if stored == key:
+                values.append(slots[2 * i + 1])
+            i = (i + 1) & mask
+
+    def insert(self, key, value, unique=False):
+        """插入键值；unique为True时覆盖已有的同键槽位"""
+        slots = self.slots
+        mask = self.capacity - 1
+        i = self._home(key)
+        while True:
+            stored = slots[2 * i]
+            if not stored:
+                self.used += 1
+                break
+            if unique and stored == key:
+                break
+            i = (i + 1) & mask
+        slots[2 * i] = key
+        slots[2 * i + 1] = value
+
+    def items(self):
+        slots = self.slots
+        for i in range(self.capacity):
+            if slots[2 * i]:
+                yield slots[2 * i], slots[2 * i + 1]
+
+
+class IndexFile:
+    """持久化的哈希表索引文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self.log_id = b""
+        self.covered = EMPTY_LOG_SIZE
+        self.count = 0
+        self.table = None
+        self._mapped = None
+
+    def open(self, log_id):
+        """映射索引文件；文件缺失、损坏或不属于当前日志时返回False"""
+        self.close()
+        try:
+            with open(self.path, "r+b") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE)
+        except (OSError, ValueError):
+            return False
+        magic, version, order, saved_id, covered, count, used, capacity = (
+            INDEX_HEADER.unpack_from(mapped, 0)
+            if len(mapped) >= INDEX_HEADER.size
+            else (b"", 0, 0, b"", 0, 0, 0, 0)
+        )
+        if (
+            magic != INDEX_MAGIC
+            or version != FORMAT_VERSION
+            or order != BYTE_ORDER
+            or saved_id != log_id
+            or covered < EMPTY_LOG_SIZE  # 原地合并时中断
+            or len(mapped) != INDEX_HEADER.size + capacity * 16
+        ):
+            mapped.close()
+            return False
+        self._mapped = mapped
+        self.log_id = saved_id
+        self.covered = covered
+        self.count = count
+        slots = memoryview(mapped)[INDEX_HEADER.size :].cast("Q")
+        self.table = HashTable(slots, capacity, used)
+        return True
+
+    def reset(self, log_id, capacity=16):
+        self.close()
+        self.log_id = log_id
+        self.covered = EMPTY_LOG_SIZE
+        self.count = 0
+        self.table = HashTable.empty(capacity)
+
+    def write(self, table, covered, count):
+        """原子地写入新的索引内容并重新映射"""
+        header = INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            FORMAT_VERSION,
+            BYTE_ORDER,
+            self.log_id,
+            covered,
+            count,
+            table.used,
+            table.capacity,
+        )
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.write(memoryview(table.slots).cast("B"))
+            f.flush()
+            os.fsync(f.fileno())
+        log_id = self.log_id
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.open(log_id)
+
+    def merge(self, entries, covered, count, unique=False):
+        """把(键, 值)并入索引：容量足够时原地写入映射，否则扩容后重写整个文件
+
+        原地写入前先把头部的覆盖长度置0，中途崩溃时下次打开会判为无效并从日志重建。
+        """
+        current = self.table
+        if self._mapped is None or (current.used + len(entries)) * 2 > current.capacity:
+            # 装载因子过高（或尚无索引文件）时扩容重建，容量翻倍以均摊重建开销
+            table = HashTable.empty(
+                HashTable.capacity_for(2 * (current.used + len(entries)))
+            )
+            for key, value in current.items():
+                table.insert(key, value)
+            for key, value in entries:
+                table.insert(key, value, unique)
+            self.write(table, covered, count)
+            return
+        self._write_header(0, self.count, current.used)
+        self._mapped.flush()
+        for key, value in entries:
+            current.insert(key, value, unique)
+        self._write_header(covered, count, current.used)
+        self._mapped.flush()
+        self.covered = covered
+        self.count = count
+
+    def _write_header(self, covered, count, used):
+        INDEX_HEADER.pack_into(
+            self._mapped,
+            0,
+            INDEX_MAGIC,
+            FORMAT_VERSION,
+            BYTE_ORDER,
+            self.log_id,
+            covered,
+            count,
+            used,
+            self.table.capacity,
+        )
+
+    def close(self):
+        if self.table is not None and isinstance(self.table.slots, memoryview):
+            self.table.slots.release()
+        self.table = None
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+
+class LogStore:
+    """追加式日志记录库，接口与RecordStore一致"""
+
+    def __init__(
+        self,
+        directory,
+        checkpoint_every=100000,
+        migrate_from=None,
+        compact_ratio=COMPACT_RATIO,
+    ):
+        self.directory = directory
+        self.migrate_from = migrate_from
+        self.path = os.path.join(directory, "records.log")
+        self.checkpoint_every = checkpoint_every
+        self.compact_ratio = compact_ratio
+        self._ids = IndexFile(os.path.join(directory, "id.idx"))
+        self._names = IndexFile(os.path.join(directory, "name.idx"))
+        self._id_delta = {}
+        self._name_delta = {}
+        self._pending = {}  # 尚未写入文件的记录：偏移 → 记录
+        self._buffer = []
+        self._count = 0
+        self._size = EMPTY_LOG_SIZE
+        self._log_id = b""
+        self._reader = None
+        self._appender = None
+        self._lock = threading.RLock()
+
+    # ---------- 加载与恢复 ----------
+
+    def load(self):
+        """打开日志与索引，重放检查点之后的日志"""
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        migrate = not os.path.exists(self.path)
+        if migrate:
+            self._create_log(self.path)
+
+        self._reader = open(self.path, "rb", buffering=0)
+        magic, version, _, self._log_id = LOG_HEADER.unpack(
+            self._reader.read(LOG_HEADER.size)
+        )
+        if magic != LOG_MAGIC or version != FORMAT_VERSION:
+            raise ValueError("记录日志格式不兼容")
+
+        log_size = os.path.getsize(self.path)
+        for index in (self._ids, self._names):
+            if not index.open(self._log_id) or index.covered > log_size:
+                index.reset(self._log_id)
+        self._id_delta = {}
+        self._name_delta = {}
+        self._pending = {}
+        self._buffer = []
+        self._count = self._ids.count
+        self._size = self._replay(min(self._ids.covered, self._names.covered))
+        self._appender = open(self.path, "ab")
+
+        # 首次创建日志时导入原有的database.sfz
+        if migrate and self.migrate_from and os.path.exists(self.migrate_from):
+            self._import_csv(self.migrate_from)
+        return self
+
+    @staticmethod
+    def _create_log(path, log_id=None):
+        with open(path, "wb") as f:
+            f.write(
+                LOG_HEADER.pack(LOG_MAGIC, FORMAT_VERSION, 0, log_id or os.urandom(8))
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self, start):
+        """重放start之后的日志，截断尾部残缺的记录，返回日志有效长度"""
+        offset = start
+        for offset, kind, fields in self._scan(start):
+            id_number, name = fields[0], fields[1]
+            if id_key(id_number) is None:
+                continue  # 早期版本迁移时可能写入了格式错误的身份证号
+            if offset >= self._ids.covered:
+                self._apply_id(kind, id_number, offset)
+            if offset >= self._names.covered and kind == RECORD_PUT:
+                self._name_delta.setdefault(name_key(name), []).append(offset)
+
+        end = self._scan_end
+        if end < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        return end
+
+    def _scan(self, start):
+        """顺序读取日志，产出(偏移, 类型, 字段)，遇到残缺记录即停止"""
+        self._scan_end = start
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                crc, length, kind = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(header[6:] + payload) != crc:
+                    return
+                yield offset, kind, payload.decode("utf-8").split(FIELD_SEPARATOR)
+                offset += RECORD_HEADER.size + length
+                self._scan_end = offset
+
+    def _apply_id(self, kind, id_number, offset):
+        was_live = self._live_offset(id_number) is not None
+        self._id_delta[id_key(id_number)] = offset
+        if kind == RECORD_PUT and not was_live:
+            self._count += 1
+        elif kind == RECORD_DELETE and was_live:
+            self._count -= 1
+
+    # ---------- 读取 ----------
+
+    def _latest_offset(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            # 检查点会原地改写映射中的哈希表，查找须与之互斥
+            offset = self._id_delta.get(key)
+            if offset is None:
+                values = self._ids.table.find(key)
+                offset = values[0] if values else None
+        return offset
+
+    def _live_offset(self, id_number):
+        offset = self._latest_offset(id_key(id_number))
+        if offset is None:
+            return None
+        kind, _ = self._read(offset)
+        return offset if kind == RECORD_PUT else None
+
+    def _read(self, offset):
+        record = self._pending.get(offset)
+        if record is not None:
+            return record
+        with self._lock:
+            self._reader.seek(offset)
+            header = self._reader.read(RECORD_HEADER.size)
+            _, length, kind = RECORD_HEADER.unpack(header)
+            payload = self._reader.read(length)
+        return kind, payload.decode("utf-8").split(FIELD_SEPARATOR)
+
+    def find(self, id_number):
+        """按身份证号查找，返回(姓名, 身份证号, 户籍地)或None"""
+        offset = self._live_offset(id_number)
+        if offset is None:
+            return None
+        id_number, name, area = self._read(offset)[1]
+        return name, id_number, area
+
+    def name_of(self, id_number):
+        """返回身份证号登记的姓名，未登记时返回None"""
+        found = self.find(id_number)
+        return found[0] if found else None
+
+    def ids_for_name(self, name, offset=0, limit=None):
+        """按录入顺序返回同名的有效身份证号，可分页"""
+        key = name_key(name)
+        with self._lock:
+            offsets = self._names.table.find(key) + self._name_delta.get(key, [])
+        end = None if limit is None else offset + limit
+        ids = []
+        for record_offset in sorted(offsets):
+            if end is not None and len(ids) >= end:
+                break
+            kind, fields = self._read(record_offset)
+            if fields[1] != name:
+                continue  # 哈希碰撞
+            if self._latest_offset(id_key(fields[0])) == record_offset:
+                ids.append(fields[0])
+        return ids[offset:end]
+
+    def count_name(self, name):
+        return len(self.ids_for_name(name))
+
+    def scan(self):
+        """按日志顺序产出全部有效的(姓名, 身份证号)"""
+        self._flush()
+        for offset, kind, fields in self._scan(EMPTY_LOG_SIZE):
+            if kind == RECORD_PUT and self._latest_offset(id_key(fields[0])) == offset:
+                yield fields[1], fields[0]
+
+    def status(self, name, id_number):
+        """判断记录是新增、已存在，还是身份证号已登记为其他姓名"""
+        existing = self.name_of(id_number)
+        if existing is None:
+            return RECORD_NEW
+        if existing == name:
+            return RECORD_EXISTS
+        return RECORD_CONFLICT
+
+    def __contains__(self, id_number):
+        return self._live_offset(id_number) is not None
+
+    def __len__(self):
+        return self._count
+
+    # ---------- 写入 ----------
+
+    def _encode(self, kind, id_number, name, area):
+        payload = FIELD_SEPARATOR.join((id_number, name, area)).encode("utf-8")
+        header = RECORD_HEADER.pack(
+            zlib.crc32(bytes((kind,)) + payload), len(payload), kind
+        )
+        return header + payload
+
+    def _append(self, kind, id_number, name, area):
+        """追加到共享缓冲区并更新内存索引，偏移按追加顺序分配
+
+        身份证号格式错误时抛出ValueError，不会写入日志。
+        """
+        if id_key(id_number) is None:
+            raise ValueError(f"身份证号格式错误：{id_number}")
+        data = self._encode(kind, id_number, name, area)
+        with self._lock:
+            offset = self._size
+            self._pending[offset] = (kind, [id_number, name, area])
+            self._buffer.append(data)
+            self._size += len(data)
+            self._apply_id(kind, id_number, offset)
+            if kind == RECORD_PUT:
+                self._name_delta.setdefault(name_key(name), []).append(offset)
+
+    def _flush(self, sync=False):
+        """把共享缓冲区按偏移顺序写入日志"""
+        with self._lock:
+            if self._buffer:
+                self._appender.write(b"".join(self._buffer))
+                self._buffer.clear()
+            self._appender.flush()
+            if sync:
+                os.fsync(self._appender.fileno())
+            self._pending.clear()
+        if len(self._id_delta) >= self.checkpoint_every:
+            self.checkpoint()
+
+    def add(self, name, id_number, area):
+        """追加一条记录"""
+        self._append(RECORD_PUT, id_number, name, area)
+        self._flush()
+
+    def delete(self, id_number):
+        """删除身份证号对应的记录（追加删除标记）"""
+        found = self.find(id_number)
+        if found is None:
+            return False
+        self._append(RECORD_DELETE, id_number, found[0], "")
+        self._flush()
+        return True
+
+    def open_writer(self, **options):
+        """打开批量写入器，参数见LogWriter"""
+        return LogWriter(self, **options)
+
+    # ---------- 检查点与压缩 ----------
+
+    def checkpoint(self):
+        """把内存中的增量合并进索引文件（缓冲区须已写入日志）
+
+        只写入增量中的条目，耗时与增量大小成正比；索引需要扩容时才整体重写。
+        """
+        with self._lock:
+            if self._buffer or (not self._id_delta and not self._name_delta):
+                return
+            self._ids.merge(
+                list(self._id_delta.items()), self._size, self._count, unique=True
+            )
+            self._id_delta = {}
+
+            entries = [
+                (key, offset)
+                for key, offsets in self._name_delta.items()
+                for offset in offsets
+            ]
+            self._names.merge(entries, self._size, 0)
+            self._name_delta = {}
+
+    def dead_records(self):
+        """日志中已被更新或删除的旧记录数（不含删除标记本身）
+
+        姓名索引为每条写入记录保留一个槽位，减去有效记录数即为旧记录数。
+        """
+        with self._lock:
+            written = self._names.table.used + sum(
+                len(offsets) for offsets in self._name_delta.values()
+            )
+            return written - self._count
+
+    def needs_compaction(self):
+        """旧记录的数量与占比是否都已超过自动压缩的阈值"""
+        dead = self.dead_records()
+        return (
+            self.compact_ratio is not None
+            and dead >= COMPACT_MIN_DEAD
+            and dead > self.compact_ratio * (dead + self._count)
+        )
+
+    def compact(self):
+        """重写日志，只保留有效记录，并重建索引"""
+        self._flush(sync=True)
+        live = []
+        for offset, kind, fields in self._scan(EMPTY_LOG_SIZE):
+            if kind == RECORD_PUT and self._latest_offset(id_key(fields[0])) == offset:
+                live.append(fields)
+
+        log_id = os.urandom(8)
+        tmp_path = f"{self.path}.compact"
+        self._create_log(tmp_path, log_id)
+        ids = HashTable.empty(HashTable.capacity_for(len(live)))
+        names = HashTable.empty(HashTable.capacity_for(len(live)))
+        offset = EMPTY_LOG_SIZE
+        with open(tmp_path, "ab") as f:
+            for id_number, name, area in live:
+                data = self._encode(RECORD_PUT, id_number, name, area)
+                f.write(data)
+                ids.insert(id_key(id_number), offset, unique=True)
+                names.insert(name_key(name), offset)
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 先替换日志：此后旧索引的日志标识不再匹配，崩溃后会从日志重建
+        self._reader.close()
+        self._appender.close()
+        self._reader = self._appender = None
+        os.replace(tmp_path, self.path)
+        for index, table in ((self._ids, ids), (self._names, names)):
+            index.log_id = log_id
+            index.write(table, offset, len(live))
+        self.load()
+
+    def close(self):
+        """写入检查点并关闭文件，旧记录过多时先压缩"""
+        if self._reader is not None:
+            self._flush(sync=True)
+            self.checkpoint()
+            if self.needs_compaction():
+                self.compact()  # 压缩后会重新打开，随后照常关闭
+            self._appender.close()
+            self._reader.close()
+            self._reader = None
+        self._ids.close()
+        self._names.close()
+
+    def _import_csv(self, csv_path):
+        """导入database.sfz，返回跳过的格式错误行数
+
+        与RecordStore一致，身份证号重复的行只保留第一条；身份证号格式错误的行
+        原样写入日志目录下的rejected.sfz，不进入日志。
+        """
+        rejected = []
+        with open(csv_path, "r", encoding="utf-8") as f, self.open_writer() as writer:
+            for line in f:
+                parts = line.strip().split(",", 2)
+                if len(parts) < 2:
+                    continue
+                key = id_key(parts[1])
+                if key is None:
+                    rejected.append(line if line.endswith("\n") else line + "\n")
+                elif self._latest_offset(key) is None:
+                    area = parts[2] if len(parts) > 2 else ""
+                    writer.add(parts[0], parts[1], area)
+        if rejected:
+            with open(
+                os.path.join(self.directory, REJECTED_FILE), "a", encoding="utf-8"
+            ) as f:
+                f.writelines(rejected)
+        self.checkpoint()
+        return len(rejected)
+
+    @classmethod
+    def migrate_from_csv(cls, csv_path, directory):
+        """把database.sfz中的记录导入新的日志库"""
+        store = cls(directory).load()
+        store._import_csv(csv_path)
+        return store
+
+
+class LogWriter:
+    """日志批量写入器，参数含义与RecordWriter相同
+
+    所有写入器共用LogStore的缓冲区，记录的物理顺序始终与分配的偏移一致。
+    """
+
+    def __init__(
+        self, store, flush_rows=10000, flush_ms=500, durability=DURABILITY_CLOSE
+    ):
+        if durability not in (DURABILITY_NONE, DURABILITY_CLOSE, DURABILITY_FLUSH):
+            raise ValueError(f"未知的持久性级别：{durability}")
+        self.store = store
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000
+        self.durability = durability
+        self._rows = 0
+        self._last_flush = time.monotonic()
+        self._closed = False
+
+    def add(self, name, id_number, area):
+        """缓冲一条记录，内存索引立即更新"""
+        self.store._append(RECORD_PUT, id_number, name, area)
+        self._rows += 1
+        if self._rows >= self.flush_rows or (
+            time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """把缓冲区写入操作系统"""
+        self.store._flush(sync=self.durability == DURABILITY_FLUSH)
+        self._rows = 0
+        self._last_flush = time.monotonic()
+
+    def sync(self):
+        """写入缓冲区并落盘（DURABILITY_NONE时只交给操作系统），用于保存导入断点之前"""
+        self.store._flush(sync=self.durability != DURABILITY_NONE)
+        self._rows = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.store._flush(sync=self.durability != DURABILITY_NONE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
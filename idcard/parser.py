@@ -0,0 +1,83 @@
+"""身份证信息解析"""
+
+from . import instrument
+from .cache import LRUCache
+
+
+def resolve_location(id_number, area_codes):
+    """按6位、4位、2位区划码逐级查找户籍地
+
+    预编译索引提供resolve()时直接查解析表，只需一次查找；
+    带历史版本的索引（resolve_at）按出生日期时的区划解析。
+    """
+    resolve_at = getattr(area_codes, "resolve_at", None)
+    if resolve_at is not None:
+        return resolve_at(id_number[:6], int(id_number[6:14]))[0]
+    resolve = getattr(area_codes, "resolve", None)
+    if resolve is not None:
+        return resolve(id_number[:6])[0]
+
+    code = id_number[:6]
+    location = area_codes.get(code)
+    if not location:  # 分级查询
+        code_4 = id_number[:4] + "00"
+        location = area_codes.get(code_4)
+        if not location:
+            code_2 = id_number[:2] + "0000"
+            location = area_codes.get(code_2, "未知地区")
+    return location
+
+
+@instrument.timed("parse.id_info")
+def parse_id_info(id_number, area_codes):
+    """解析身份证信息"""
+    location = resolve_location(id_number, area_codes)
+    birth_date = f"{id_number[6:10]}-{id_number[10:12]}-{id_number[12:14]}"
+    gender = "男" if int(id_number[16]) % 2 else "女"
+    return {"户籍地": location, "出生日期": birth_date, "性别": gender}
+
+
+class CachedParser:
+    """带缓存的身份证信息解析器
+
+    户籍地按6位前缀缓存（导入数据中同一前缀会重复成千上万次），
+    带历史版本时按(前缀, 出生日期所在版本)缓存；
+    result_cache_size大于0时另外按完整身份证号缓存解析结果。
+    """
+
+    def __init__(self, area_codes, location_cache_size=4096, result_cache_size=0):
+        self.area_codes = area_codes
+        self.locations = LRUCache(location_cache_size)
+        self.results = LRUCache(result_cache_size)
+        self._era = getattr(area_codes, "era", None)
+
+    def location(self, id_number):
+        key = id_number[:6]
+        if self._era is not None:
+            key = key, self._era(int(id_number[6:14]))
+        location = self.locations.get(key)
+        if location is None:
+            location = resolve_location(id_number, self.area_codes)
+            self.locations.put(key, location)
+        return location
+
+    @instrument.timed("parse.cached")
+    def parse(self, id_number):
+        """与parse_id_info结果相同"""
+        if self.results.maxsize > 0:
+            cached = self.results.get(id_number)
+            if cached is not None:
+                return dict(cached)
+
+        info = {
+            "户籍地": self.location(id_number),
+            "出生日期": f"{id_number[6:10]}-{id_number[10:12]}-{id_number[12:14]}",
+            "性别": "男" if int(id_number[16]) % 2 else "女",
+        }
+        if self.results.maxsize > 0:
+            self.results.put(id_number, dict(info))
+        return info
+
+    def stats(self):
+        """缓存命中统计"""
+        return {"location": self.locations.stats(), "result": self.results.stats()}
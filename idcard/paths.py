@@ -0,0 +1,20 @@
+"""资源路径处理"""
+
+import os
+import sys
+
+
+def get_resource_path(relative_path):
+    """获取资源的绝对路径（支持开发模式和打包模式）"""
+    try:
+        base_path = sys._MEIPASS  # PyInstaller创建的临时文件夹
+    except AttributeError:
+        base_path = os.path.abspath(".")
+
+    # 如果目标路径不存在则自动创建（用于database.sfz）
+    full_path = os.path.join(base_path, relative_path)
+    dir_path = os.path.dirname(full_path)
+    if not os.path.exists(dir_path):
+        os.makedirs(dir_path)
+
+    return full_path
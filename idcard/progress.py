@@ -0,0 +1,152 @@
+"""导入进度汇报
+
+导入线程每处理完一个块就会汇报一次进度，ProgressReporter只保留最新值，
+并把通知频率限制在每秒max_rate次以内，图形界面和命令行共用同一套统计。
+"""
+
+import sys
+import time
+
+
+def format_duration(seconds):
+    """格式化为[时:]分:秒"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class ProgressSnapshot:
+    """某一时刻的导入进度"""
+
+    __slots__ = (
+        "success",
+        "failed",
+        "bytes_done",
+        "bytes_total",
+        "start_offset",
+        "elapsed",
+        "existing",
+    )
+
+    def __init__(
+        self,
+        success,
+        failed,
+        bytes_done,
+        bytes_total,
+        start_offset,
+        elapsed,
+        existing=0,
+    ):
+        self.success = success
+        self.failed = failed
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.start_offset = start_offset
+        self.elapsed = elapsed
+        self.existing = existing  # 已登记过而跳过的行
+
+    @property
+    def rows(self):
+        """已处理的行数，含跳过的已存在记录"""
+        return self.success + self.failed + self.existing
+
+    @property
+    def fraction(self):
+        if not self.bytes_total:
+            return 1.0
+        return min(self.bytes_done / self.bytes_total, 1.0)
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_sec(self):
+        consumed = self.bytes_done - self.start_offset
+        return consumed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """预计剩余秒数，尚无法估计（或输入为流）时为None"""
+        rate = self.bytes_per_sec
+        if not rate or not self.bytes_total:
+            return None
+        return max(self.bytes_total - self.bytes_done, 0) / rate
+
+    def format(self):
+        text = f"成功：{self.success} "
+        if self.existing:
+            text += f"已存在：{self.existing} "
+        text += f"失败：{self.failed} 总数：{self.rows} {self.rows_per_sec:,.0f}行/秒"
+        if self.bytes_total:
+            text = f"{self.fraction:.0%} {text}"
+        eta = self.eta
+        if eta is not None:
+            text += f" 剩余{format_duration(eta)}"
+        return text
+
+
+class ProgressReporter:
+    """合并进度更新：后到的值覆盖先到的值，通知频率不超过max_rate次/秒
+
+    实例可直接作为BatchImporter.run的progress参数，callback收到ProgressSnapshot。
+    """
+
+    def __init__(self, callback, max_rate=20, start_offset=0, clock=time.monotonic):
+        self.callback = callback
+        self.interval = 1 / max_rate
+        self.start_offset = start_offset
+        self.clock = clock
+        self._started = clock()
+        self._last_emit = None
+        self._latest = None
+
+    def __call__(self, result):
+        self._latest = ProgressSnapshot(
+            result.success,
+            result.failed,
+            result.offset,
+            result.bytes_total,
+            self.start_offset,
+            self.clock() - self._started,
+            result.existing,
+        )
+        now = self.clock()
+        if self._last_emit is None or now - self._last_emit >= self.interval:
+            self._last_emit = now
+            self.callback(self._latest)
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def finish(self):
+        """导入结束时补发最后一次被合并掉的更新"""
+        if self._latest is not None:
+            self.callback(self._latest)
+        return self._latest
+
+
+class ProgressLine:
+    """在终端同一行刷新进度"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._width = 0
+
+    def __call__(self, snapshot):
+        text = snapshot.format()
+        padding = " " * max(self._width - len(text), 0)
+        self._width = len(text)
+        self.stream.write(f"\r{text}{padding}")
+        self.stream.flush()
+
+    def close(self):
+        if self._width:
+            self.stream.write("\n")
+            self.stream.flush()
+            self._width = 0
@@ -0,0 +1,278 @@
+"""按户籍地、出生日期范围与性别筛选记录（列式记录表）
+
+    records = RecordFilter(store.table)
+    query = RecordQuery.parse("江苏省苏州市", "2009", "2010", "女", area_map)
+    rows = records.select(query)          # 满足条件的行号，按录入顺序
+    source = records.source(rows)         # 交给界面列表显示
+
+身份证号本身含有区划码、出生日期与性别，记录表写入列时一次性拆成uint32列
+与性别标志列，查询不再逐条解析，也不另建副本。安装了NumPy时整列向量化比较；
+否则按区划码与出生日期维护排序后的行号索引，二分定位范围后再逐行检查其余条件。
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from . import instrument
+from .browse import ID_WIDTH, RowSource
+
+GENDER_MALE = "男"
+GENDER_FEMALE = "女"
+# 未进入排序索引的新增行超过这么多时重建索引（仅在没有NumPy时使用）
+MAX_DELTA = 50000
+
+_DATE_PATTERN = re.compile(r"^(\d{4})(?:[-/.]?(\d{1,2})(?:[-/.]?(\d{1,2}))?)?$")
+
+
+def parse_date(text, end=False):
+    """把YYYY、YYYY-MM或YYYY-MM-DD（分隔符可为-/.或省略）转为YYYYMMDD整数
+
+    end为真时省略的月、日取该范围的最后一天，用作区间上界。
+    """
+    match = _DATE_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError(f"出生日期格式不正确：{text}，应为YYYY、YYYY-MM或YYYY-MM-DD")
+    year, month, day = match.groups()
+    month = int(month) if month else (12 if end else 1)
+    day = int(day) if day else (31 if end else 1)
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        raise ValueError(f"出生日期不正确：{text}")
+    return int(year) * 10000 + month * 100 + day
+
+
+def area_prefix(code):
+    """6位区划码对应的前缀：省级取2位，地级取4位，县级取6位"""
+    if code.endswith("0000"):
+        return code[:2]
+    if code.endswith("00"):
+        return code[:4]
+    return code
+
+
+def area_prefixes(text, area_map=None):
+    """户籍地条件转为区划码前缀：数字直接作为前缀，否则在全称中查找"""
+    text = text.strip()
+    if not text:
+        return ()
+    if text.isdigit():
+        if len(text) > 6:
+            raise ValueError(f"区划码最多6位：{text}")
+        return (text,)
+    if area_map is None:
+        raise ValueError("缺少行政区划数据，请输入区划码")
+    prefixes = sorted(
+        {area_prefix(code) for code, name in area_map.items() if text in name},
+        key=len,
+    )
+    if not prefixes:
+        raise ValueError(f"未找到户籍地：{text}")
+    # 去掉已被更短前缀覆盖的
+    kept = []
+    for prefix in prefixes:
+        if not any(prefix.startswith(shorter) for shorter in kept):
+            kept.append(prefix)
+    return tuple(sorted(kept))
+
+
+class RecordQuery:
+    """筛选条件，各条件同时满足；区划码前缀满足任意一个即可
+
+    birth_from与birth_to为YYYYMMDD整数，包含两端；gender为"男"、"女"或None。
+    """
+
+    def __init__(self, area_prefixes=(), birth_from=None, birth_to=None, gender=None):
+        if gender not in (None, GENDER_MALE, GENDER_FEMALE):
+            raise ValueError(f"未知的性别：{gender}")
+        self.area_prefixes = tuple(area_prefixes)
+        self.birth_from = birth_from
+        self.birth_to = birth_to
+        self.gender = gender
+
+    @classmethod
+    def parse(cls, area="", birth_from="", birth_to="", gender="", area_map=None):
+        """由界面输入的文本创建，格式错误时抛出ValueError"""
+        return cls(
+            area_prefixes(area, area_map),
+            parse_date(birth_from) if birth_from.strip() else None,
+            parse_date(birth_to, end=True) if birth_to.strip() else None,
+            gender or None,
+        )
+
+    def area_ranges(self):
+        """区划码前缀对应的整数区间[lo, hi]"""
+        return [
+            (int(prefix.ljust(6, "0")), int(prefix.ljust(6, "9")))
+            for prefix in self.area_prefixes
+        ]
+
+    def birth_range(self):
+        low = 0 if self.birth_from is None else self.birth_from
+        high = 99999999 if self.birth_to is None else self.birth_to
+        return low, high
+
+    def has_birth(self):
+        return self.birth_from is not None or self.birth_to is not None
+
+    def matches(self, area, birth, male):
+        if self.area_prefixes and not any(
+            low <= area <= high for low, high in self.area_ranges()
+        ):
+            return False
+        if self.has_birth():
+            low, high = self.birth_range()
+            if not low <= birth <= high:
+                return False
+        if self.gender is not None and male != (self.gender == GENDER_MALE):
+            return False
+        return True
+
+
+def split_ids(blob):
+    """从定长打包的身份证号中拆出(区划码列, 出生日期列, 性别标志列)"""
+    try:
+        import numpy as np
+    except ImportError:
+        return _split_ids_python(blob)
+    return _split_ids_numpy(np, blob)
+
+
+def split_id(id_number):
+    """单个定长打包的身份证号拆为(区划码, 出生日期, 性别标志)，格式不符时均为0"""
+    if id_number[:17].isdigit() and id_number[17:] not in (b"", b" "):
+        return int(id_number[:6]), int(id_number[6:14]), id_number[16] & 1
+    return 0, 0, 0  # 早期手工编辑的记录可能不是18位数字
+
+
+def _split_ids_python(blob):
+    area = array("I")
+    birth = array("I")
+    male = bytearray()
+    for offset in range(0, len(blob), ID_WIDTH):
+        row_area, row_birth, row_male = split_id(blob[offset : offset + ID_WIDTH])
+        area.append(row_area)
+        birth.append(row_birth)
+        male.append(row_male)
+    return area, birth, male
+
+
+def _split_ids_numpy(np, blob):
+    digits = np.frombuffer(blob, dtype=np.uint8).reshape(-1, ID_WIDTH)
+    digits = digits.astype(np.int64) - 48
+    valid = ((digits[:, :17] >= 0) & (digits[:, :17] <= 9)).all(axis=1)
+    valid &= digits[:, 17] != ord(" ") - 48  # 不足18位时以空格补齐
+    area = digits[:, :6] @ (10 ** np.arange(5, -1, -1, dtype=np.int64))
+    birth = digits[:, 6:14] @ (10 ** np.arange(7, -1, -1, dtype=np.int64))
+    male = digits[:, 16] & 1
+    area_column = array("I")
+    area_column.frombytes(np.where(valid, area, 0).astype(np.uint32).tobytes())
+    birth_column = array("I")
+    birth_column.frombytes(np.where(valid, birth, 0).astype(np.uint32).tobytes())
+    return (
+        area_column,
+        birth_column,
+        bytearray(np.where(valid, male, 0).astype(np.uint8).tobytes()),
+    )
+
+
+class RecordFilter:
+    """在列式记录表（idcard.table.RecordTable）上按条件筛选，不复制记录
+
+    安装了NumPy时直接对表中的区划码、出生日期与性别列整列比较；否则按区划码
+    与出生日期维护排序后的行号索引，二分定位范围后再逐行检查其余条件。
+    索引之后新增的行逐行检查，超过MAX_DELTA行时在下次筛选前重建索引。
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._sorted = {}  # 列名 → (按该列排序的行号, 对应的键)
+        self._indexed = 0  # 排序索引覆盖的行数
+
+    def select(self, query):
+        """返回满足query的行号（按录入顺序）"""
+        with instrument.timer("query.select"):
+            try:
+                import numpy as np
+            except ImportError:
+                return self._select_python(query)
+            return self._select_numpy(np, query)
+
+    def _select_numpy(self, np, query):
+        table = self.table
+        # 持锁期间导入线程不会写入列，可以直接映射各列的缓冲区
+        with table.locked() as count:
+            mask = np.ones(count, dtype=bool)
+            if query.area_prefixes:
+                area = np.frombuffer(table.area, dtype=np.uint32, count=count)
+                in_area = np.zeros(count, dtype=bool)
+                for low, high in query.area_ranges():
+                    in_area |= (area >= low) & (area <= high)
+                mask &= in_area
+                del area
+            if query.has_birth():
+                birth = np.frombuffer(table.birth, dtype=np.uint32, count=count)
+                low, high = query.birth_range()
+                mask &= (birth >= low) & (birth <= high)
+                del birth
+            if query.gender is not None:
+                male = np.frombuffer(table.male, dtype=np.uint8, count=count)
+                mask &= male == (1 if query.gender == GENDER_MALE else 0)
+                del male
+            rows = np.flatnonzero(mask)
+            # 尚未写入列的新增行逐行检查
+            new = [
+                row
+                for row in range(count, len(table))
+                if query.matches(*table.fields_at(row))
+            ]
+        if new:
+            rows = np.concatenate((rows, np.asarray(new, dtype=rows.dtype)))
+        return rows
+
+    def reindex(self):
+        """重建按区划码与出生日期排序的行号索引（仅在没有NumPy时使用）"""
+        count = self.table.written()
+        for name in ("area", "birth"):
+            column = getattr(self.table, name)[:count]
+            order = array("I", sorted(range(count), key=column.__getitem__))
+            self._sorted[name] = order, array("I", (column[i] for i in order))
+        self._indexed = count
+
+    def _select_python(self, query):
+        table = self.table
+        if not self._sorted or len(table) - self._indexed > MAX_DELTA:
+            self.reindex()
+        # 用排序索引中最窄的范围作为候选，再逐行检查其余条件
+        candidates = None
+        if query.area_prefixes:
+            order, keys = self._sorted["area"]
+            candidates = []
+            for low, high in query.area_ranges():
+                start = bisect_left(keys, low)
+                candidates.extend(order[start : bisect_right(keys, high, start)])
+        if query.has_birth():
+            order, keys = self._sorted["birth"]
+            low, high = query.birth_range()
+            start = bisect_left(keys, low)
+            rows = order[start : bisect_right(keys, high, start)]
+            if candidates is None or len(rows) < len(candidates):
+                candidates = rows
+        if candidates is None:
+            candidates = range(self._indexed)
+
+        area, birth, male = table.area, table.birth, table.male
+        matches = query.matches
+        result = [
+            row for row in candidates if matches(area[row], birth[row], male[row])
+        ]
+        result.sort()
+        result.extend(
+            row
+            for row in range(self._indexed, len(table))
+            if matches(*table.fields_at(row))
+        )
+        return array("I", result)
+
+    def source(self, rows):
+        """用select()的结果创建界面列表的数据源（不复制记录）"""
+        return RowSource(self.table, rows)
@@ -0,0 +1,196 @@
+"""姓名与身份证号的增量搜索（前缀、拼音首字母与模糊匹配）
+
+    index = SearchIndex.from_store(store)
+    index.search("张")        # 姓名前缀
+    index.search("zs")        # 拼音首字母，如张三、赵爽
+    index.search("张卫明")    # 模糊：与“张伟明”等共享字对的姓名
+    index.search_ids("3205")  # 身份证号前缀
+
+不重复的姓名按字典序存放，前缀对应其中连续的一段，二分查找即可定位
+（相当于展平的字典树）；身份证号前缀直接在记录表的有序整数键中二分。
+模糊匹配用相邻字对与隔一字的字对建立倒排表。新增记录的新姓名先进入
+增量表，增量过多时由调用方重建索引。
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from .table import RecordTable, store_table
+
+# GB2312一级汉字按拼音排序，以下为各声母首字的区位码
+_GB2312_INITIAL_CODES = (
+    45217, 45253, 45761, 46318, 46826, 47010, 47297, 47614, 48119, 49062, 49324,
+    49896, 50371, 50614, 50622, 50906, 51387, 51446, 52218, 52698, 52980, 53689,
+    54481,
+)  # fmt: skip
+_GB2312_LEVEL1_END = 55290
+_INITIALS = "abcdefghjklmnopqrstwxyz"
+
+ID_CHARS = frozenset("0123456789Xx")
+# 增量表超过这么多个姓名时needs_rebuild为真
+MAX_DELTA = 50000
+
+
+def char_initial(char):
+    """汉字的拼音首字母（GB2312一级汉字），其他字符原样返回小写"""
+    try:
+        encoded = char.encode("gb2312")
+    except UnicodeEncodeError:
+        return char.lower()
+    if len(encoded) != 2:
+        return char.lower()
+    code = encoded[0] << 8 | encoded[1]
+    if not _GB2312_INITIAL_CODES[0] <= code < _GB2312_LEVEL1_END:
+        return char  # 二级汉字按部首排序，无法由编码得出拼音
+    return _INITIALS[bisect_right(_GB2312_INITIAL_CODES, code) - 1]
+
+
+def name_initials(name):
+    return "".join(char_initial(char) for char in name)
+
+
+def name_grams(name):
+    """模糊匹配用的字对：相邻两字，以及隔一字的两字（容忍中间一字不同）"""
+    if len(name) < 2:
+        return {name}
+    grams = {name[i : i + 2] for i in range(len(name) - 1)}
+    grams.update(name[i] + "\x00" + name[i + 2] for i in range(len(name) - 2))
+    return grams
+
+
+def gram_count(name):
+    """name_grams(name)的大小（不计重复的字对）"""
+    return max(2 * len(name) - 3, 1)
+
+
+def is_id_query(text):
+    return bool(text) and text[0].isdigit() and set(text) <= ID_CHARS
+
+
+class SearchIndex:
+    """不重复姓名的只读索引，外加新增姓名的增量表
+
+    记录数与身份证号直接取自列式记录表（idcard.table.RecordTable），不另存副本。
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.names = sorted(name for name in table.names() if table.count_name(name))
+
+        # 拼音首字母按字典序排序，与姓名序号一一对应
+        initials = sorted((name_initials(name), i) for i, name in enumerate(self.names))
+        self.initial_keys = [key for key, _ in initials]
+        self.initial_names = array("L", (i for _, i in initials))
+
+        grams = {}
+        for i, name in enumerate(self.names):
+            for gram in name_grams(name):
+                grams.setdefault(gram, []).append(i)
+        self.grams = {gram: array("L", ids) for gram, ids in grams.items()}
+
+        self.delta_names = set()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """由(姓名, 身份证号)序列建立索引"""
+        return cls(RecordTable.from_rows(rows))
+
+    @classmethod
+    def from_store(cls, store):
+        """为记录库建立索引，文本记录库直接使用其记录表，其他后端读取期间不应写入"""
+        return cls(store_table(store))
+
+    # ---------- 增量 ----------
+
+    def add(self, name, id_number):
+        """记录新增的记录，无需重建即可被搜索到（记录本身须已写入记录表）"""
+        i = bisect_left(self.names, name)
+        if i == len(self.names) or self.names[i] != name:
+            self.delta_names.add(name)
+
+    def has_id(self, id_number):
+        """身份证号是否已在记录表中"""
+        return id_number.upper() in self.table
+
+    @property
+    def needs_rebuild(self):
+        return len(self.delta_names) > MAX_DELTA
+
+    def count(self, name):
+        """姓名对应的记录数"""
+        return self.table.count_name(name)
+
+    # ---------- 查询 ----------
+
+    def search(self, query, limit=50):
+        """按姓名搜索，依次返回前缀、拼音首字母、模糊匹配的姓名（去重），至多limit个"""
+        query = query.strip()
+        if not query:
+            return []
+        found = []
+        seen = set()
+        for matches in (self.prefix, self.initials, self.fuzzy):
+            if len(found) >= limit:
+                break
+            for name in matches(query, limit):
+                if name not in seen:
+                    seen.add(name)
+                    found.append(name)
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def prefix(self, text, limit=50):
+        """以text开头的姓名，按字典序"""
+        start = bisect_left(self.names, text)
+        found = []
+        for name in self.names[start : start + limit]:
+            if not name.startswith(text):
+                break
+            found.append(name)
+        found.extend(
+            name
+            for name in self.delta_names
+            if name.startswith(text) and name not in found
+        )
+        return sorted(found)[:limit]
+
+    def initials(self, text, limit=50):
+        """拼音首字母以text开头的姓名（text须为至少两个字母），按记录数从多到少"""
+        text = text.lower()
+        if len(text) < 2 or not text.isascii() or not text.isalpha():
+            return []  # 单个字母匹配的姓名太多，没有意义
+        start = bisect_left(self.initial_keys, text)
+        stop = bisect_left(self.initial_keys, text + "\x7f", start)
+        candidates = [self.names[i] for i in self.initial_names[start:stop]]
+        candidates.extend(
+            name
+            for name in self.delta_names
+            if name_initials(name).startswith(text) and name not in candidates
+        )
+        return heapq.nlargest(limit, candidates, key=self.count)
+
+    def fuzzy(self, text, limit=50):
+        """与text共享字对最多的姓名，相似度相同时记录多者在前"""
+        query = name_grams(text)
+        shared = Counter()
+        for gram in query:
+            for i in self.grams.get(gram, ()):
+                shared[i] += 1
+        scores = {}
+        for i, hits in shared.items():
+            name = self.names[i]
+            scores[name] = hits / (len(query) + gram_count(name) - hits)
+        for name in self.delta_names:
+            if name not in scores:
+                hits = len(query & name_grams(name))
+                if hits:
+                    scores[name] = hits / (len(query) + gram_count(name) - hits)
+        ranked = sorted(scores, key=lambda name: (-scores[name], -self.count(name)))
+        return ranked[:limit]
+
+    def search_ids(self, prefix, limit=50):
+        """以prefix开头的身份证号，按号码排序（在记录表的有序键中二分）"""
+        return self.table.ids_with_prefix(prefix.strip(), limit)
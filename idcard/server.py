@@ -0,0 +1,313 @@
+"""本地HTTP校验/查询服务（asyncio，仅依赖标准库）
+
+    python -m idcard serve --port 8765
+
+接口（响应均为UTF-8 JSON）：
+    GET  /check?id=身份证号          校验并解析单个身份证号
+    GET  /lookup?name=姓名&offset=0&limit=20
+                                     按姓名查询已登记的身份证号
+    POST /batch                      请求体为NDJSON，每行一个身份证号（"…"或{"id": "…"}，
+                                     也可为不带引号的纯文本），按行流式返回NDJSON结果
+
+连接默认保持（HTTP/1.1 keep-alive），请求体支持Content-Length与chunked编码。
+行政区划索引与记录库在启动时加载一次，由所有连接共享。
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from .parser import CachedParser
+from .validator import REASON_MESSAGES, REASON_OK, check_reason, validate_batch
+
+READ_SIZE = 1 << 16
+# 批量接口每攒够这么多行校验一次并输出一个响应块
+BATCH_LINES = 4096
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    """请求格式错误"""
+
+
+class IdService:
+    """服务端共享的校验、解析与查询逻辑（与网络无关）"""
+
+    def __init__(self, area_codes, store=None, result_cache_size=65536):
+        self.parser = CachedParser(area_codes, result_cache_size=result_cache_size)
+        self.store = store
+        self._area_json = {}  # 户籍地 → JSON字符串，种类有限
+
+    def check(self, id_number):
+        """校验单个身份证号，合法时附带解析结果"""
+        reason = check_reason(id_number)
+        if reason != REASON_OK:
+            return {"id": id_number, "valid": False, "reason": REASON_MESSAGES[reason]}
+        return {"id": id_number, "valid": True, "info": self.parser.parse(id_number)}
+
+    def lookup(self, name, offset=0, limit=20):
+        """按姓名分页查询已登记的身份证号"""
+        return {
+            "name": name,
+            "total": self.store.count_name(name),
+            "ids": self.store.ids_for_name(name, offset, limit),
+        }
+
+    def batch_lines(self, lines):
+        """把一批NDJSON行转换为NDJSON结果"""
+        ids = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line[:1] in (b'"', b"{"):
+                try:
+                    value = json.loads(line)
+                except ValueError:
+                    value = None
+                if isinstance(value, dict):
+                    value = value.get("id")
+                ids.append(value if isinstance(value, str) else "")
+            else:
+                ids.append(line.decode("utf-8", "replace"))
+        return self.encode_many(ids)
+
+    def encode_many(self, ids):
+        """整批校验并直接编码为NDJSON，每行与json.dumps(check(id))相同
+
+        合法身份证号只含数字与X，无需转义；户籍地的JSON编码按名称缓存。
+        批量结果不经过结果缓存，避免大批量时缓存反复淘汰。
+        """
+        valid, reasons = validate_batch(ids)
+        location = self.parser.location
+        area_json = self._area_json
+        out = []
+        for id_number, ok, reason in zip(ids, valid, reasons):
+            if not ok:
+                result = {
+                    "id": id_number,
+                    "valid": False,
+                    "reason": REASON_MESSAGES[int(reason)],
+                }
+                out.append(json.dumps(result, ensure_ascii=False))
+                continue
+            area = location(id_number)
+            encoded = area_json.get(area)
+            if encoded is None:
+                encoded = area_json[area] = json.dumps(area, ensure_ascii=False)
+            gender = "男" if int(id_number[16]) % 2 else "女"
+            out.append(
+                f'{{"id": "{id_number}", "valid": true, "info": {{"户籍地": {encoded}, '
+                f'"出生日期": "{id_number[6:10]}-{id_number[10:12]}-{id_number[12:14]}", '
+                f'"性别": "{gender}"}}}}'
+            )
+        out.append("")
+        return "\n".join(out).encode("utf-8")
+
+
+async def read_headers(reader):
+    """读取请求行与首部，连接已关闭时返回None"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise BadRequest("请求行格式错误")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def content_length(headers):
+    """Content-Length首部的值，格式错误时抛出BadRequest"""
+    value = headers.get("content-length", "") or "0"
+    if not (value.isascii() and value.isdigit()):
+        raise BadRequest("Content-Length格式错误")
+    return int(value)
+
+
+async def iter_body(reader, headers):
+    """按块产出请求体，支持Content-Length与chunked编码"""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise BadRequest("chunked编码格式错误")
+            if size == 0:
+                # 跳过尾部首部
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    else:
+        remaining = content_length(headers)
+        while remaining > 0:
+            block = await reader.read(min(remaining, READ_SIZE))
+            if not block:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(block)
+            yield block
+
+
+class Connection:
+    """一个HTTP连接，可顺序处理多个请求"""
+
+    def __init__(self, service, reader, writer):
+        self.service = service
+        self.reader = reader
+        self.writer = writer
+        self.streaming = False  # 已开始输出分块响应，出错时只能断开连接
+
+    async def serve(self):
+        try:
+            while True:
+                try:
+                    request = await read_headers(self.reader)
+                except BadRequest as e:
+                    await self.send_json(400, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.0":
+                    keep_alive = connection == "keep-alive"
+                else:
+                    keep_alive = connection != "close"
+                self.streaming = False
+                try:
+                    if "chunked" not in headers.get("transfer-encoding", "").lower():
+                        content_length(headers)  # 在开始响应之前检查
+                    body = iter_body(self.reader, headers)
+                    await self.dispatch(method, target, body, keep_alive)
+                    async for _ in body:  # 丢弃未读完的请求体
+                        pass
+                except BadRequest as e:
+                    if not self.streaming:
+                        await self.send_json(400, {"error": str(e)}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # ValueError：首部行或chunk大小行超过READ_SIZE
+            pass
+        finally:
+            self.writer.close()
+
+    async def dispatch(self, method, target, body, keep_alive):
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/check":
+            if method != "GET":
+                return await self.send_json(405, {"error": "仅支持GET"}, keep_alive)
+            if "id" not in query:
+                return await self.send_json(400, {"error": "缺少参数id"}, keep_alive)
+            result = self.service.check(query["id"].strip())
+            return await self.send_json(200, result, keep_alive)
+
+        if url.path == "/lookup":
+            if method != "GET":
+                return await self.send_json(405, {"error": "仅支持GET"}, keep_alive)
+            if self.service.store is None:
+                return await self.send_json(503, {"error": "未加载记录库"}, keep_alive)
+            if not query.get("name"):
+                return await self.send_json(400, {"error": "缺少参数name"}, keep_alive)
+            try:
+                offset = max(int(query.get("offset", 0)), 0)
+                limit = max(int(query.get("limit", 20)), 0)
+            except ValueError:
+                raise BadRequest("offset与limit必须为整数")
+            result = self.service.lookup(query["name"], offset, limit)
+            return await self.send_json(200, result, keep_alive)
+
+        if url.path == "/batch":
+            if method != "POST":
+                return await self.send_json(405, {"error": "仅支持POST"}, keep_alive)
+            return await self.stream_batch(body, keep_alive)
+
+        return await self.send_json(404, {"error": "未知的接口"}, keep_alive)
+
+    def _head(self, status, content_type, keep_alive, length=None):
+        lines = [
+            f"HTTP/1.1 {status} {REASONS[status]}",
+            f"Content-Type: {content_type}; charset=utf-8",
+            "Connection: keep-alive" if keep_alive else "Connection: close",
+        ]
+        if length is None:
+            lines.append("Transfer-Encoding: chunked")
+        else:
+            lines.append(f"Content-Length: {length}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.writer.write(
+            self._head(status, "application/json", keep_alive, len(data)) + data
+        )
+        await self.writer.drain()
+
+    async def stream_batch(self, body, keep_alive):
+        """边读请求边输出结果，内存占用只与BATCH_LINES有关"""
+        self.writer.write(self._head(200, "application/x-ndjson", keep_alive))
+        self.streaming = True
+        pending = b""
+        lines = []
+        async for block in body:
+            pending += block
+            cut = pending.rfind(b"\n") + 1
+            if not cut:
+                continue
+            lines.extend(pending[:cut].split(b"\n"))
+            pending = pending[cut:]
+            if len(lines) >= BATCH_LINES:
+                await self._send_chunk(self.service.batch_lines(lines))
+                lines = []
+        if pending:
+            lines.append(pending)
+        if lines:
+            await self._send_chunk(self.service.batch_lines(lines))
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+    async def _send_chunk(self, data):
+        if data:
+            self.writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await self.writer.drain()
+
+
+async def start_server(service, host="127.0.0.1", port=8765):
+    """启动服务并返回asyncio.Server"""
+
+    async def handle(reader, writer):
+        await Connection(service, reader, writer).serve()
+
+    return await asyncio.start_server(handle, host, port, limit=READ_SIZE)
+
+
+def serve(service, host="127.0.0.1", port=8765, ready=None):
+    """运行服务直到被中断，ready(server)在开始监听后调用"""
+
+    async def main():
+        server = await start_server(service, host, port)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+"""SQLite记录库
+
+使用WAL日志模式，其他进程可以在导入期间并发读取；批量导入按事务
+executemany写入。接口与RecordStore一致。
+
+迁移已有的文本记录库：
+    python -m idcard.sqlitestore config/database.sfz config/database.db
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .store import (
+    DURABILITY_CLOSE,
+    DURABILITY_FLUSH,
+    DURABILITY_NONE,
+    RECORD_CONFLICT,
+    RECORD_EXISTS,
+    RECORD_NEW,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id_number  TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    area       TEXT NOT NULL,
+    area_code  TEXT NOT NULL,
+    birth_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_name ON records (name);
+CREATE INDEX IF NOT EXISTS idx_records_area_code ON records (area_code);
+CREATE INDEX IF NOT EXISTS idx_records_birth_date ON records (birth_date);
+"""
+
+# 版本1：身份证号改为唯一键，重复的身份证号只保留最早录入的一条
+MIGRATE_V1 = """
+DROP INDEX IF EXISTS idx_records_id_number;
+DELETE FROM records
+WHERE rowid NOT IN (SELECT MIN(rowid) FROM records GROUP BY id_number);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_records_id_number ON records (id_number);
+PRAGMA user_version = 1;
+"""
+
+INSERT_SQL = (
+    "INSERT OR IGNORE INTO records (id_number, name, area, area_code, birth_date) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# 持久性级别对应的synchronous设置
+SYNCHRONOUS = {
+    DURABILITY_NONE: "OFF",
+    DURABILITY_CLOSE: "NORMAL",
+    DURABILITY_FLUSH: "FULL",
+}
+
+
+def record_row(name, id_number, area):
+    """生成一行数据库记录"""
+    birth_date = f"{id_number[6:10]}-{id_number[10:12]}-{id_number[12:14]}"
+    return id_number, name, area, id_number[:6], birth_date
+
+
+class SqliteStore:
+    """基于SQLite的记录库"""
+
+    def __init__(self, path, migrate_from=None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self.conn = None
+        self._count = 0
+        # 已缓冲但尚未提交的记录
+        self._pending = {}  # 身份证号 → 姓名
+        self._pending_names = {}  # 姓名 → [身份证号]
+        self._lock = threading.RLock()
+
+    def load(self):
+        """打开数据库，首次创建时导入migrate_from指定的文本记录库"""
+        self.close()
+        created = not os.path.exists(self.path)
+        self.conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self.conn.executescript(MIGRATE_V1)
+        self._count = self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+        if created and self.migrate_from and os.path.exists(self.migrate_from):
+            self.import_csv(self.migrate_from)
+        return self
+
+    def import_csv(self, csv_path):
+        """导入database.sfz格式的文本记录"""
+        with open(csv_path, "r", encoding="utf-8") as f, self.open_writer(
+            flush_rows=100000, flush_ms=60000
+        ) as writer:
+            for line in f:
+                parts = line.strip().split(",", 2)
+                if len(parts) >= 2:
+                    area = parts[2] if len(parts) > 2 else ""
+                    writer.add(parts[0], parts[1], area)
+
+    def name_of(self, id_number):
+        """返回身份证号登记的姓名，未登记时返回None"""
+        with self._lock:
+            pending = self._pending.get(id_number)
+            if pending is not None:
+                return pending
+            row = self.conn.execute(
+                "SELECT name FROM records WHERE id_number = ?", (id_number,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find(self, id_number):
+        """按身份证号查找，返回(姓名, 身份证号, 户籍地)或None"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT name, id_number, area FROM records WHERE id_number = ?",
+                (id_number,),
+            ).fetchone()
+
+    def ids_for_name(self, name, offset=0, limit=None):
+        """按录入顺序返回同名的身份证号，可分页（走姓名索引）"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id_number FROM records WHERE name = ? "
+                "ORDER BY rowid LIMIT ? OFFSET ?",
+                (name, -1 if limit is None else limit, offset),
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            pending = self._pending_names.get(name)
+            if pending and (limit is None or len(ids) < limit):
+                skip = max(offset - self._count_committed(name), 0)
+                end = None if limit is None else skip + limit - len(ids)
+                ids.extend(pending[skip:end])
+        return ids
+
+    def _count_committed(self, name):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM records WHERE name = ?", (name,)
+        ).fetchone()[0]
+
+    def count_name(self, name):
+        with self._lock:
+            return self._count_committed(name) + len(self._pending_names.get(name, ()))
+
+    def scan(self, batch_rows=65536):
+        """按录入顺序产出全部(姓名, 身份证号)，包括尚未提交的记录"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, name, id_number FROM records WHERE rowid > ? "
+                    "ORDER BY rowid LIMIT ?",
+                    (last, batch_rows),
+                ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            for _, name, id_number in rows:
+                yield name, id_number
+        with self._lock:
+            pending = list(self._pending.items())
+        for id_number, name in pending:
+            yield name, id_number
+
+    def status(self, name, id_number):
+        """判断记录是新增、已存在，还是身份证号已登记为其他姓名"""
+        existing = self.name_of(id_number)
+        if existing is None:
+            return RECORD_NEW
+        if existing == name:
+            return RECORD_EXISTS
+        return RECORD_CONFLICT
+
+    def add(self, name, id_number, area):
+        """写入一条记录"""
+        with self._lock:
+            cursor = self.conn.execute(INSERT_SQL, record_row(name, id_number, area))
+            self._count += cursor.rowcount
+
+    def open_writer(self, **options):
+        """打开批量写入器，参数见SqliteWriter"""
+        return SqliteWriter(self, **options)
+
+    def close(self):
+        if self.conn is not None:
+            with self._lock:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.close()
+                self.conn = None
+
+    def __contains__(self, id_number):
+        return self.name_of(id_number) is not None
+
+    def __len__(self):
+        return self._count
+
+
+class SqliteWriter:
+    """批量写入器：缓冲记录，每flush_rows条或flush_ms毫秒用一个事务executemany提交"""
+
+    def __init__(
+        self, store, flush_rows=50000, flush_ms=1000, durability=DURABILITY_CLOSE
+    ):
+        if durability not in SYNCHRONOUS:
+            raise ValueError(f"未知的持久性级别：{durability}")
+        self.store = store
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000
+        self.durability = durability
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+        with store._lock:
+            store.conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[durability]}")
+
+    def add(self, name, id_number, area):
+        """缓冲一条记录，查询立即可见"""
+        self._rows.append(record_row(name, id_number, area))
+        if id_number not in self.store._pending:
+            self.store._pending[id_number] = name
+            self.store._pending_names.setdefault(name, []).append(id_number)
+        if len(self._rows) >= self.flush_rows or (
+            time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """在一个事务内提交缓冲的记录"""
+        store = self.store
+        with store._lock:
+            if self._rows:
+                before = store.conn.total_changes
+                store.conn.execute("BEGIN")
+                try:
+                    store.conn.executemany(INSERT_SQL, self._rows)
+                    store.conn.execute("COMMIT")
+                except BaseException:
+                    store.conn.execute("ROLLBACK")
+                    raise
+                store._count += store.conn.total_changes - before
+                self._rows.clear()
+            store._pending.clear()
+            store._pending_names.clear()
+        self._last_flush = time.monotonic()
+
+    def sync(self):
+        """提交缓冲的记录并落盘（DURABILITY_NONE时只提交），用于保存导入断点之前
+
+        WAL模式下synchronous=NORMAL的提交在检查点之前不保证落盘，需写一次检查点。
+        """
+        self.flush()
+        if self.durability == DURABILITY_CLOSE:
+            with self.store._lock:
+                self.store.conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        with self.store._lock:
+            if self.durability == DURABILITY_CLOSE:
+                self.store.conn.execute("PRAGMA wal_checkpoint(FULL)")
+            self.store.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main(argv=None):
+    """把文本记录库迁移到SQLite"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把database.sfz迁移到SQLite记录库")
+    parser.add_argument("source", help="文本记录库，如config/database.sfz")
+    parser.add_argument("target", help="SQLite数据库文件，如config/database.db")
+    args = parser.parse_args(argv)
+
+    store = SqliteStore(args.target).load()
+    before = len(store)
+    store.import_csv(args.source)
+    print(f"已导入 {len(store) - before} 条记录，共 {len(store)} 条")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
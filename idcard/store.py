@@ -0,0 +1,345 @@
+"""记录存储（config/database.sfz，每行：姓名,身份证号,户籍地）
+
+加载后的记录表定期并在关闭时写为快照（database.sfz.snap），快照头部记录
+所覆盖的文件长度与该部分内容的哈希；启动时恢复快照后只需解析其后追加的行，
+耗时与新增记录数而非记录总数成正比。文件被改写时哈希不符，回退为完整加载。
+"""
+
+import io
+import os
+import struct
+import threading
+import time
+from hashlib import blake2b
+
+from . import instrument
+from .paths import get_resource_path
+from .table import RecordTable
+
+RECORD_NEW = "new"
+RECORD_EXISTS = "exists"
+RECORD_CONFLICT = "conflict"
+
+# 记录库后端及默认位置
+STORE_BACKENDS = ("csv", "log", "sqlite")
+CSV_PATH = "config/database.sfz"
+LOG_PATH = "config/records"
+SQLITE_PATH = "config/database.db"
+
+# 写入持久性级别
+DURABILITY_NONE = "none"  # 不主动fsync，由操作系统决定落盘时机
+DURABILITY_CLOSE = "close"  # 关闭时fsync一次
+DURABILITY_FLUSH = "flush"  # 每次刷新缓冲后都fsync
+
+# 加载时每次读取约这么多字节的行
+LOAD_BATCH_BYTES = 1 << 21
+
+SNAPSHOT_SUFFIX = ".snap"
+SNAPSHOT_MAGIC = b"SFZS"
+SNAPSHOT_VERSION = 2
+# 快照头：魔数、版本、保留位、覆盖的文件长度、所覆盖内容的哈希
+SNAPSHOT_HEADER = struct.Struct("<4sHHQ16s")
+# 计算文件指纹时每次读取的字节数
+FINGERPRINT_CHUNK = 1 << 20
+
+
+def create_store(backend="csv", path=None):
+    """创建指定后端的记录库（尚未加载）"""
+    if backend == "csv":
+        return RecordStore(path or get_resource_path(CSV_PATH))
+    if backend == "log":
+        from .logstore import LogStore
+
+        return LogStore(
+            path or get_resource_path(LOG_PATH),
+            migrate_from=get_resource_path(CSV_PATH),
+        )
+    if backend == "sqlite":
+        from .sqlitestore import SqliteStore
+
+        return SqliteStore(
+            path or get_resource_path(SQLITE_PATH),
+            migrate_from=get_resource_path(CSV_PATH),
+        )
+    raise ValueError(f"未知的记录库后端：{backend}")
+
+
+class RecordStore:
+    """基于CSV文本文件的记录库
+
+    记录以身份证号为主键，姓名允许一名多人；内存中以列式记录表（table）存放，
+    身份证号重复的行只保留第一条。snapshot为真时使用快照加速启动，新增记录
+    达到快照中记录数的1/4（至少snapshot_every条）时重写快照。
+    """
+
+    def __init__(self, path, snapshot=True, snapshot_every=100000):
+        self.path = path
+        self.snapshot_path = path + SNAPSHOT_SUFFIX if snapshot else None
+        self.snapshot_every = snapshot_every
+        self.table = RecordTable()
+        self._snapshot_rows = 0  # 最近一次快照中的记录数
+        self._writers = []
+        self._lock = threading.Lock()
+
+    def load(self):
+        """加载已有记录，读取失败时抛出OSError或UnicodeDecodeError"""
+        table = RecordTable()
+        self._snapshot_rows = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                table, covered = self._read_snapshot(f)
+                f.seek(covered)
+                lines = io.TextIOWrapper(f, encoding="utf-8")
+                if table is None:
+                    table = RecordTable.from_batches(_csv_batches(lines))
+                else:
+                    # 快照之后追加的行逐条并入，重复的身份证号同样只保留第一条
+                    with instrument.timer("store.replay"):
+                        for names, ids in _csv_batches(lines):
+                            for name, id_number in zip(names, ids):
+                                table.add(name, id_number)
+        self.table = table
+        self._maybe_snapshot()
+        return self
+
+    # ---------- 快照 ----------
+
+    def _read_snapshot(self, f):
+        """读取与记录文件f相符的快照，返回(记录表, 覆盖的文件长度)，无可用快照时为(None, 0)"""
+        if self.snapshot_path is None:
+            return None, 0
+        try:
+            with open(self.snapshot_path, "rb") as snapshot:
+                magic, version, _, covered, fingerprint = SNAPSHOT_HEADER.unpack(
+                    snapshot.read(SNAPSHOT_HEADER.size)
+                )
+                if (
+                    magic != SNAPSHOT_MAGIC
+                    or version != SNAPSHOT_VERSION
+                    or covered > os.fstat(f.fileno()).st_size
+                    or fingerprint != _fingerprint(f, covered)
+                ):
+                    return None, 0
+                table = RecordTable.read_snapshot(snapshot)
+        except (OSError, ValueError, struct.error):
+            # 快照缺失、损坏或不属于当前文件时完整加载
+            return None, 0
+        self._snapshot_rows = len(table)
+        return table, covered
+
+    def save_snapshot(self):
+        """把内存中的记录表写为快照（原子替换）；批量写入器有未写出的记录时跳过，返回False"""
+        if self.snapshot_path is None or not os.path.exists(self.path):
+            return False
+        with self._lock:
+            # 快照中的记录必须都已写入文件
+            if any(writer._buffer for writer in self._writers):
+                return False
+            with open(self.path, "rb") as f:
+                covered = os.fstat(f.fileno()).st_size
+                f.seek(max(covered - 1, 0))
+                if f.read(1) not in (b"", b"\n"):
+                    return False  # 末行不完整，之后追加的内容会接在这一行上
+                header = SNAPSHOT_HEADER.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    0,
+                    covered,
+                    _fingerprint(f, covered),
+                )
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as snapshot:
+                snapshot.write(header)
+                rows = self.table.write_snapshot(snapshot)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot_rows = rows
+        return True
+
+    def _maybe_snapshot(self):
+        added = len(self.table) - self._snapshot_rows
+        if self.snapshot_path is not None and added >= max(
+            self.snapshot_every, self._snapshot_rows // 4
+        ):
+            self.save_snapshot()
+
+    def name_of(self, id_number):
+        """返回身份证号登记的姓名，未登记时返回None"""
+        return self.table.name_of(id_number)
+
+    def record(self, id_number):
+        """返回身份证号对应的Record（含区划码、出生日期与性别），未登记时返回None"""
+        return self.table.find(id_number)
+
+    def ids_for_name(self, name, offset=0, limit=None):
+        """按录入顺序返回同名的身份证号，可分页"""
+        return self.table.ids_for_name(name, offset, limit)
+
+    def count_name(self, name):
+        return self.table.count_name(name)
+
+    def scan(self):
+        """按录入顺序产出全部(姓名, 身份证号)
+
+        以开始时的记录数为准，其他线程同时写入时不会中断遍历（记录只增不删）。
+        """
+        return self.table.scan()
+
+    def status(self, name, id_number):
+        """判断记录是新增、已存在，还是身份证号已登记为其他姓名"""
+        existing = self.table.name_of(id_number)
+        if existing is None:
+            return RECORD_NEW
+        if existing == name:
+            return RECORD_EXISTS
+        return RECORD_CONFLICT
+
+    def _remember(self, name, id_number):
+        self.table.add(name, id_number)
+
+    def add(self, name, id_number, area):
+        """追加一条记录"""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"{name},{id_number},{area}\n")
+            self._remember(name, id_number)
+        self._maybe_snapshot()
+
+    def open_writer(self, **options):
+        """打开批量写入器，参数见RecordWriter"""
+        writer = RecordWriter(self, **options)
+        self._writers.append(writer)
+        return writer
+
+    def close(self):
+        """有新增记录时写入快照（文本记录库每次写入后即关闭文件）"""
+        if len(self.table) != self._snapshot_rows:
+            self.save_snapshot()
+
+    def __contains__(self, id_number):
+        return id_number in self.table
+
+    def __len__(self):
+        return len(self.table)
+
+
+def _fingerprint(f, size):
+    """文件前size字节的指纹：长度与全部内容的哈希，中间的改动同样能发现"""
+    digest = blake2b(size.to_bytes(8, "little"), digest_size=16)
+    f.seek(0)
+    remaining = size
+    while remaining:
+        chunk = f.read(min(remaining, FINGERPRINT_CHUNK))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.digest()
+
+
+def _csv_batches(f):
+    """按批产出(姓名列表, 身份证号列表)，跳过字段不足的行"""
+    while True:
+        lines = f.readlines(LOAD_BATCH_BYTES)
+        if not lines:
+            return
+        names = []
+        ids = []
+        for line in lines:
+            parts = line.strip().split(",", 2)
+            if len(parts) >= 2:
+                names.append(parts[0])
+                ids.append(parts[1])
+        yield names, ids
+
+
+class RecordWriter:
+    """批量写入器：保持文件打开，缓冲记录，每flush_rows条或flush_ms毫秒刷新一次"""
+
+    def __init__(
+        self, store, flush_rows=10000, flush_ms=500, durability=DURABILITY_CLOSE
+    ):
+        if durability not in (DURABILITY_NONE, DURABILITY_CLOSE, DURABILITY_FLUSH):
+            raise ValueError(f"未知的持久性级别：{durability}")
+        self.store = store
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000
+        self.durability = durability
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._file = open(store.path, "a", encoding="utf-8")
+
+    def add(self, name, id_number, area):
+        """缓冲一条记录，内存索引立即更新"""
+        # 与save_snapshot互斥：快照要么看到缓冲区中的这条记录而跳过，要么不含这条记录
+        with self.store._lock:
+            self._buffer.append(f"{name},{id_number},{area}\n")
+            self.store._remember(name, id_number)
+        if len(self._buffer) >= self.flush_rows or (
+            time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def add_batch(self, names, ids, areas, lines=None):
+        """按顺序缓冲一批记录，返回各行的状态（RECORD_NEW等）
+
+        已登记的行跳过；lines给出时为各行已格式化好的文本行（并行导入的子进程生成）。
+        """
+        with self.store._lock:
+            existing = self.store.table.add_many(names, ids)
+            statuses = []
+            buffer = self._buffer
+            for i, found in enumerate(existing):
+                if found is None:
+                    buffer.append(
+                        lines[i]
+                        if lines is not None
+                        else f"{names[i]},{ids[i]},{areas[i]}\n"
+                    )
+                    statuses.append(RECORD_NEW)
+                else:
+                    statuses.append(
+                        RECORD_EXISTS if found == names[i] else RECORD_CONFLICT
+                    )
+        if len(self._buffer) >= self.flush_rows or (
+            time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+        return statuses
+
+    def flush(self):
+        """把缓冲区写入操作系统"""
+        with self.store._lock:
+            if self._buffer:
+                self._file.write("".join(self._buffer))
+                self._buffer.clear()
+            self._file.flush()
+        if self.durability == DURABILITY_FLUSH:
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+        self.store._maybe_snapshot()
+
+    def sync(self):
+        """写入缓冲区并落盘（DURABILITY_NONE时只交给操作系统），用于保存导入断点之前"""
+        self.flush()
+        if self.durability == DURABILITY_CLOSE:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+            if self.durability == DURABILITY_CLOSE:
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            if self in self.store._writers:
+                self.store._writers.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,908 @@
+"""列式记录表：记录按列存放，没有逐条的Python对象
+
+    ids         身份证号，18字节定长打包（录入顺序）
+    name_index  每行姓名在姓名池pool中的序号（uint32），同名只存一个字符串
+    area        区划码（uint32）
+    birth       出生日期（YYYYMMDD，uint32）
+    male        性别标志，每行一字节（1为男）
+
+按身份证号查找时把号码转为64位整数键（前17位×11+校验码），在有序键数组中
+二分；查找前先查每条记录约占一字节的位图过滤器，导入时绝大多数新号码无需二分。
+按姓名查找用按姓名序号排好的行号及各姓名的起始位置。新增的记录先进入缓冲区
+（字典），攒够一批后整批追加到列尾并归并进有序索引。连同索引每条记录约
+60字节，1000万条记录约600 MB（含姓名池）。
+"""
+
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import islice
+
+from . import instrument
+from .browse import ID_WIDTH, SCAN_BATCH, SORT_BIRTH, SORT_NAME, pack_ids
+from .query import GENDER_FEMALE, GENDER_MALE, split_id, split_ids
+
+CHECK_CHARS = "0123456789X"
+_CHECK_VALUES = {char: value for value, char in enumerate(CHECK_CHARS, 1)}
+# 新增记录缓冲至少这么多条（且不少于已有记录的1/32）才写入列
+MIN_PENDING = 65536
+# 过滤器每条记录约占的位数（每个键置两位，误判率约5%）
+FILTER_BITS = 8
+_MIX = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+SNAPSHOT_MAGIC = b"SFZT"
+SNAPSHOT_VERSION = 1
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+# 快照头：魔数、版本、字节序、行数、有序键数、姓名数、姓名池字节数、
+# 格式不符的行数、其号码的字节数、过滤器容量
+SNAPSHOT_HEADER = struct.Struct("<4sHH7Q")
+
+
+def record_key(id_number):
+    """18位身份证号对应的非零64位整数键，格式不符时返回None"""
+    if len(id_number) == ID_WIDTH and id_number.isascii():
+        head = id_number[:17]
+        check = _CHECK_VALUES.get(id_number[17])
+        if check and head.isdigit():
+            return int(head) * 11 + check
+    return None
+
+
+def record_keys(blob):
+    """定长打包的身份证号批量转为整数键（array('Q')），格式不符的为0"""
+    try:
+        import numpy as np
+    except ImportError:
+        return array(
+            "Q",
+            (
+                record_key(blob[offset : offset + ID_WIDTH].decode("ascii", "replace"))
+                or 0
+                for offset in range(0, len(blob), ID_WIDTH)
+            ),
+        )
+    digits = np.frombuffer(bytes(blob), dtype=np.uint8).reshape(-1, ID_WIDTH)
+    values = digits - np.uint8(48)  # 非数字字符回绕为大于9的值
+    check = values[:, 17].astype(np.int64)
+    check[digits[:, 17] == ord("X")] = 10
+    valid = (values[:, :17] <= 9).all(axis=1) & (check <= 10)
+    keys = np.zeros(len(digits), dtype=np.int64)
+    for column in range(17):
+        keys *= 10
+        keys += values[:, column]
+    keys = keys * 11 + check + 1
+    return array("Q", np.where(valid, keys, 0).astype(np.uint64).tobytes())
+
+
+class Record:
+    """记录表中一行的只读视图，字段在访问时才从列中取出"""
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def name(self):
+        return self.table.name_at(self.row)
+
+    @property
+    def id_number(self):
+        return self.table.id_at(self.row)
+
+    @property
+    def area_code(self):
+        """6位区划码，身份证号格式不符时为0"""
+        return self.table.fields_at(self.row)[0]
+
+    @property
+    def birth(self):
+        """出生日期（YYYYMMDD整数），身份证号格式不符时为0"""
+        return self.table.fields_at(self.row)[1]
+
+    @property
+    def gender(self):
+        return GENDER_MALE if self.table.fields_at(self.row)[2] else GENDER_FEMALE
+
+    def __repr__(self):
+        return f"Record({self.name!r}, {self.id_number!r})"
+
+
+class _Filter:
+    """整数键的位图过滤器，每个键置两位；may_contain()为False时键一定未登记"""
+
+    __slots__ = ("bits", "shift", "low_mask", "capacity")
+
+    def __init__(self, capacity):
+        size = (FILTER_BITS * capacity - 1).bit_length()
+        self.bits = bytearray(1 << (size - 3))
+        self.shift = 64 - size
+        self.low_mask = (1 << size) - 1
+        self.capacity = capacity
+
+    def add(self, np, keys):
+        """登记一批键（array('Q')）"""
+        if np is None:
+            bits = self.bits
+            for key in keys:
+                mixed = key * _MIX & _MASK64
+                for position in (mixed >> self.shift, mixed & self.low_mask):
+                    bits[position >> 3] |= 1 << (position & 7)
+            return
+        mixed = np.frombuffer(keys, dtype=np.uint64) * np.uint64(_MIX)
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        low = np.uint64(self.low_mask)
+        for positions in (mixed >> np.uint64(self.shift), mixed & low):
+            masks = np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8))
+            np.bitwise_or.at(bits, positions >> np.uint64(3), masks.astype(np.uint8))
+
+    def may_contain(self, key):
+        mixed = key * _MIX & _MASK64
+        high = mixed >> self.shift
+        low = mixed & self.low_mask
+        bits = self.bits
+        return bool(bits[high >> 3] >> (high & 7) & bits[low >> 3] >> (low & 7) & 1)
+
+
+class _Index:
+    """前rows行的有序键、同名行号区段与过滤器
+
+    写入列后整体替换，查询先取得当前的_Index再读取，无需加锁。
+    """
+
+    __slots__ = ("rows", "keys", "key_rows", "name_rows", "name_starts", "filter")
+
+    def __init__(self, rows, keys, key_rows, name_rows, name_starts, filter):
+        self.rows = rows
+        self.keys = keys
+        self.key_rows = key_rows
+        self.name_rows = name_rows
+        self.name_starts = name_starts
+        self.filter = filter
+
+    def find(self, key):
+        """键对应的行号，不存在时返回None"""
+        if not self.filter.may_contain(key):
+            return None
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self.key_rows[i]
+        return None
+
+    def name_range(self, index):
+        """姓名序号在同名行号中的区段"""
+        if index + 1 < len(self.name_starts):
+            return self.name_starts[index], self.name_starts[index + 1]
+        return 0, 0
+
+
+class _Pending:
+    """尚未写入列的新增记录，行号从base开始；写入列后整体替换"""
+
+    __slots__ = ("base", "limit", "names", "ids", "rows", "by_name")
+
+    def __init__(self, base):
+        self.base = base
+        self.limit = max(MIN_PENDING, base // 32)  # 达到这么多条时写入列
+        self.names = []
+        self.ids = []
+        self.rows = {}  # 身份证号 → 行号
+        self.by_name = {}  # 姓名 → 行号列表
+
+
+class RecordTable:
+    """以身份证号为主键的列式记录表，姓名允许一名多人
+
+    add()由内部锁串行化，查询不加锁，可在导入线程写入的同时在界面线程查询。
+    """
+
+    def __init__(self):
+        self.pool = []
+        self.name_index = array("I")
+        self.ids = bytearray()
+        self.area = array("I")
+        self.birth = array("I")
+        self.male = bytearray()
+        self._pool_index = {}  # 姓名 → 姓名池序号
+        self._odd_rows = {}  # 身份证号格式不符的行 → 原样的号码（不进入有序索引）
+        self._odd_ids = {}
+        self._index = _Index(
+            0, array("Q"), array("I"), array("I"), array("I", [0]), _Filter(MIN_PENDING)
+        )
+        self._pending = _Pending(0)
+        self._missed = (None, None)  # 最近一次未找到的(身份证号, 当时的索引)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """由(姓名, 身份证号)序列建立，身份证号重复时只保留第一条"""
+        return cls.from_batches(_batches(rows))
+
+    @classmethod
+    def from_batches(cls, batches):
+        """由(姓名列表, 身份证号列表)批次建立，身份证号重复时只保留第一条"""
+        with instrument.timer("table.build"):
+            table = cls()
+            keys = array("Q")
+            for names, ids in batches:
+                keys += table._append(names, ids)
+            table._build_index(keys)
+            return table
+
+    def __len__(self):
+        pending = self._pending
+        return pending.base + len(pending.ids)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Record(self, row)
+
+    def __contains__(self, id_number):
+        return self.row_of(id_number) is not None
+
+    # ---------- 写入 ----------
+
+    def _append(self, names, ids):
+        """在列尾追加一批记录（不查重、不更新索引），返回这批记录的整数键"""
+        blob = pack_ids(ids)
+        keys = record_keys(blob)
+        row = len(self.name_index)
+        if 0 in keys or set(map(len, ids)) != {ID_WIDTH}:
+            for i, id_number in enumerate(ids):
+                if keys[i] and len(id_number) == ID_WIDTH:
+                    continue
+                keys[i] = 0  # 长度不符时打包被截断，不能按打包后的号码建键
+                self._odd_rows[row + i] = id_number
+                self._odd_ids.setdefault(id_number, row + i)
+        area, birth, male = split_ids(blob)
+
+        # 新姓名的序号即其插入_pool_index时的大小，pool与_pool_index的键顺序一致
+        pool_index = self._pool_index
+        size = len(pool_index)
+        setdefault = pool_index.setdefault
+        name_index = array("I", [setdefault(name, len(pool_index)) for name in names])
+        if len(pool_index) > size:
+            self.pool.extend(islice(pool_index, size, None))
+
+        self.ids += blob
+        self.area += area
+        self.birth += birth
+        self.male += male
+        self.name_index += name_index
+        return keys
+
+    def add(self, name, id_number):
+        """追加一条记录并立即可查；身份证号已存在时不追加，返回False"""
+        with self._lock:
+            pending = self._pending
+            if id_number in pending.rows:
+                return False
+            # 导入时先status()再add()，索引未变时不必重复查找
+            if self._missed != (id_number, self._index):
+                if self._find_indexed(id_number, self._index) is not None:
+                    return False
+            row = pending.base + len(pending.ids)
+            pending.names.append(name)
+            pending.ids.append(id_number)
+            pending.by_name.setdefault(name, []).append(row)
+            pending.rows[id_number] = row  # 最后登记，查询到的行一定可读
+            if len(pending.ids) >= pending.limit:
+                self._flush()
+            return True
+
+    def add_many(self, names, ids):
+        """按顺序追加一批记录，返回各行原先登记的姓名（新增的行为None）
+
+        整批只加锁一次，NumPy可用时整批在有序键中查找；批内重复的身份证号
+        同样只保留第一条。
+        """
+        with self._lock:
+            pending = self._pending
+            found = self._find_many(ids, self._index)
+            existing = []
+            for name, id_number, row in zip(names, ids, found):
+                if row is None:
+                    row = pending.rows.get(id_number)
+                if row is not None:
+                    existing.append(self.name_at(row))
+                    continue
+                row = pending.base + len(pending.ids)
+                pending.names.append(name)
+                pending.ids.append(id_number)
+                pending.by_name.setdefault(name, []).append(row)
+                pending.rows[id_number] = row
+                existing.append(None)
+            # 整批处理完才写入列，此前的查找结果都针对同一个索引
+            if len(pending.ids) >= pending.limit:
+                self._flush()
+            return existing
+
+    def _find_many(self, ids, current):
+        """一批身份证号在索引current中的行号，未找到的为None"""
+        np = _numpy()
+        if np is None:
+            return [self._find_indexed(id_number, current) for id_number in ids]
+        keys = np.frombuffer(record_keys(pack_ids(ids)), dtype=np.uint64)
+        sorted_keys = np.frombuffer(current.keys, dtype=np.uint64)
+        if len(sorted_keys):
+            positions = np.searchsorted(sorted_keys, keys)
+            np.minimum(positions, len(sorted_keys) - 1, out=positions)
+            hits = sorted_keys[positions] == keys
+            key_rows = np.frombuffer(current.key_rows, dtype=np.uint32)
+            rows = key_rows[positions].astype(np.int64)
+            rows[~hits] = -1
+            del key_rows
+        else:
+            rows = np.full(len(keys), -1, dtype=np.int64)
+        del sorted_keys
+        found = [None if row < 0 else row for row in rows.tolist()]
+        if not keys.all() or set(map(len, ids)) != {ID_WIDTH}:
+            for i, id_number in enumerate(ids):
+                if not keys[i] or len(id_number) != ID_WIDTH:
+                    # 格式不符的号码不在有序键中（长度不符时打包后的键也不可信）
+                    found[i] = self._odd_ids.get(id_number)
+        return found
+
+    def flush(self):
+        """把缓冲的新增记录写入列并归并进有序索引"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        pending = self._pending
+        if not pending.ids:
+            return
+        with instrument.timer("table.flush"):
+            np = _numpy()
+            current = self._index
+            keys = self._append(pending.names, pending.ids)
+            rows = array("I", range(pending.base, pending.base + len(keys)))
+            sorted_keys, key_rows = _merge_keys(
+                np, current.keys, current.key_rows, keys, rows
+            )
+            filter = current.filter
+            if len(sorted_keys) > filter.capacity:
+                filter = _new_filter(np, sorted_keys)
+            else:
+                filter.add(np, keys)  # 多置的位只会增加误判，不影响当前索引
+            name_rows, name_starts = _merge_name_rows(
+                np,
+                current,
+                self.name_index,
+                pending.base,
+                len(self.pool),
+            )
+            count = len(self.name_index)
+            self._index = _Index(
+                count, sorted_keys, key_rows, name_rows, name_starts, filter
+            )
+            self._pending = _Pending(count)
+
+    # ---------- 索引 ----------
+
+    def _build_index(self, keys):
+        """由各行的整数键建立有序索引，同时去除重复的身份证号（保留第一条）"""
+        with instrument.timer("table.index"):
+            np = _numpy()
+            sorted_keys, key_rows = _sort_keys(np, keys)
+            sorted_keys, key_rows, duplicates = _dedupe(np, sorted_keys, key_rows)
+            if duplicates and np is not None:
+                # 快速排序不稳定，有重复时按稳定排序重来，保留先出现的行
+                sorted_keys, key_rows = _sort_keys(np, keys, stable=True)
+                sorted_keys, key_rows, duplicates = _dedupe(np, sorted_keys, key_rows)
+            duplicates.extend(
+                row
+                for row, id_number in self._odd_rows.items()
+                if self._odd_ids[id_number] != row
+            )
+            if duplicates:
+                duplicates.sort()
+                self._drop_rows(np, duplicates)
+                key_rows = _renumber(np, key_rows, duplicates)
+            count = len(self.name_index)
+            name_rows, name_starts = _name_rows(np, self.name_index, len(self.pool))
+            self._index = _Index(
+                count,
+                sorted_keys,
+                key_rows,
+                name_rows,
+                name_starts,
+                _new_filter(np, sorted_keys),
+            )
+            self._pending = _Pending(count)
+
+    # ---------- 快照 ----------
+
+    def write_snapshot(self, f):
+        """把各列与索引原样写入二进制文件f（先把缓冲的新增记录写入列），返回行数"""
+        with instrument.timer("table.snapshot"), self._lock:
+            self._flush()
+            index = self._index
+            pool = "\n".join(self.pool).encode("utf-8")
+            odd_rows = array("I", self._odd_rows)
+            odd_ids = "\n".join(self._odd_rows.values()).encode("utf-8")
+            f.write(
+                SNAPSHOT_HEADER.pack(
+                    SNAPSHOT_MAGIC,
+                    SNAPSHOT_VERSION,
+                    BYTE_ORDER,
+                    index.rows,
+                    len(index.keys),
+                    len(self.pool),
+                    len(pool),
+                    len(odd_rows),
+                    len(odd_ids),
+                    index.filter.capacity,
+                )
+            )
+            for section in (
+                self.ids,
+                self.name_index,
+                self.area,
+                self.birth,
+                self.male,
+                pool,
+                odd_rows,
+                odd_ids,
+                index.keys,
+                index.key_rows,
+                index.name_rows,
+                index.name_starts,
+                index.filter.bits,
+            ):
+                f.write(section)
+            return index.rows
+
+    @classmethod
+    def read_snapshot(cls, f):
+        """由write_snapshot()写出的文件恢复，格式不符或文件不完整时抛出ValueError"""
+        header = f.read(SNAPSHOT_HEADER.size)
+        if len(header) != SNAPSHOT_HEADER.size:
+            raise ValueError("记录快照不完整")
+        (
+            magic,
+            version,
+            order,
+            rows,
+            keys,
+            names,
+            pool_size,
+            odd,
+            odd_size,
+            capacity,
+        ) = SNAPSHOT_HEADER.unpack(header)
+        if (
+            magic != SNAPSHOT_MAGIC
+            or version != SNAPSHOT_VERSION
+            or order != BYTE_ORDER
+        ):
+            raise ValueError("记录快照格式不兼容")
+        with instrument.timer("table.restore"):
+            table = cls()
+            table.ids = _read_bytes(f, rows * ID_WIDTH)
+            table.name_index = _read_array(f, "I", rows)
+            table.area = _read_array(f, "I", rows)
+            table.birth = _read_array(f, "I", rows)
+            table.male = _read_bytes(f, rows)
+            table.pool = (
+                _read_bytes(f, pool_size).decode("utf-8").split("\n") if names else []
+            )
+            odd_rows = _read_array(f, "I", odd)
+            odd_ids = _read_bytes(f, odd_size).decode("utf-8").split("\n")
+            sorted_keys = _read_array(f, "Q", keys)
+            key_rows = _read_array(f, "I", keys)
+            name_rows = _read_array(f, "I", rows)
+            name_starts = _read_array(f, "I", names + 1)
+            filter = _Filter(capacity)
+            filter.bits = _read_bytes(f, len(filter.bits))
+            if len(table.pool) != names or (odd and len(odd_ids) != odd):
+                raise ValueError("记录快照已损坏")
+            table._pool_index = dict(zip(table.pool, range(names)))
+            if odd:
+                table._odd_rows = dict(zip(odd_rows, odd_ids))
+                table._odd_ids = dict(zip(odd_ids, odd_rows))
+            table._index = _Index(
+                rows, sorted_keys, key_rows, name_rows, name_starts, filter
+            )
+            table._pending = _Pending(rows)
+            return table
+
+    def _drop_rows(self, np, rows):
+        """删除指定的（已排序的）行，之后的行号前移"""
+        dropped = set(rows)
+        if np is None:
+            keep = [row for row in range(len(self.name_index)) if row not in dropped]
+            self.ids = bytearray().join(
+                self.ids[row * ID_WIDTH : (row + 1) * ID_WIDTH] for row in keep
+            )
+            for column in ("name_index", "area", "birth"):
+                values = getattr(self, column)
+                setattr(
+                    self, column, array(values.typecode, map(values.__getitem__, keep))
+                )
+            self.male = bytearray(map(self.male.__getitem__, keep))
+        else:
+            keep = np.ones(len(self.name_index), dtype=bool)
+            keep[rows] = False
+            ids = np.frombuffer(self.ids, dtype=np.uint8).reshape(-1, ID_WIDTH)
+            self.ids = bytearray(ids[keep].tobytes())
+            del ids
+            for column in ("name_index", "area", "birth"):
+                values = getattr(self, column)
+                kept = np.frombuffer(values, dtype=np.uint32)[keep]
+                setattr(self, column, array(values.typecode, kept.tobytes()))
+            self.male = bytearray(
+                np.frombuffer(self.male, dtype=np.uint8)[keep].tobytes()
+            )
+        self._odd_rows = {
+            row - bisect_left(rows, row): id_number
+            for row, id_number in self._odd_rows.items()
+            if row not in dropped
+        }
+        self._odd_ids = {id_number: row for row, id_number in self._odd_rows.items()}
+
+    # ---------- 查询 ----------
+
+    def row_of(self, id_number):
+        """身份证号所在的行号，未登记时返回None"""
+        # 先取缓冲区再取索引：写入列期间缓冲区中的行要么仍在旧缓冲区，要么已在新索引
+        row = self._pending.rows.get(id_number)
+        if row is not None:
+            return row
+        current = self._index
+        row = self._find_indexed(id_number, current)
+        if row is None:
+            self._missed = (id_number, current)
+        return row
+
+    def _find_indexed(self, id_number, current):
+        key = record_key(id_number)
+        if key is None:
+            return self._odd_ids.get(id_number)
+        return current.find(key)
+
+    def find(self, id_number):
+        """身份证号对应的Record，未登记时返回None"""
+        row = self.row_of(id_number)
+        return None if row is None else Record(self, row)
+
+    def name_of(self, id_number):
+        row = self.row_of(id_number)
+        return None if row is None else self.name_at(row)
+
+    def name_at(self, row):
+        pending = self._pending
+        if row >= pending.base:
+            return pending.names[row - pending.base]
+        return self.pool[self.name_index[row]]
+
+    def id_at(self, row):
+        pending = self._pending
+        if row >= pending.base:
+            return pending.ids[row - pending.base]
+        if self._odd_rows and row in self._odd_rows:
+            return self._odd_rows[row]
+        return self.ids[row * ID_WIDTH : (row + 1) * ID_WIDTH].decode("ascii")
+
+    def fields_at(self, row):
+        """第row行的(区划码, 出生日期, 性别标志)"""
+        pending = self._pending
+        if row >= pending.base:
+            id_number = pending.ids[row - pending.base]
+            return split_id(id_number.encode("ascii", "replace").ljust(ID_WIDTH))
+        return self.area[row], self.birth[row], self.male[row]
+
+    def _rows_for_name(self, name):
+        """同名行号的两部分：(索引, 区段起点, 区段终点, 缓冲区中的行号)"""
+        pending = self._pending
+        current = self._index
+        index = self._pool_index.get(name)
+        start, stop = (0, 0) if index is None else current.name_range(index)
+        new = pending.by_name.get(name, ())
+        if new and new[0] < current.rows:
+            # 取得缓冲区后恰好写入了列，缓冲区中的行已在新索引中
+            new = [row for row in new if row >= current.rows]
+        return current, start, stop, new
+
+    def rows_for_name(self, name, offset=0, limit=None):
+        """按录入顺序返回同名的行号，可分页"""
+        current, start, stop, new = self._rows_for_name(name)
+        base = stop - start
+        end = base + len(new) if limit is None else offset + limit
+        rows = list(
+            current.name_rows[start + min(offset, base) : start + min(end, base)]
+        )
+        rows.extend(new[max(offset - base, 0) : max(end - base, 0)])
+        return rows
+
+    def ids_for_name(self, name, offset=0, limit=None):
+        return [self.id_at(row) for row in self.rows_for_name(name, offset, limit)]
+
+    def count_name(self, name):
+        _, start, stop, new = self._rows_for_name(name)
+        return stop - start + len(new)
+
+    def scan(self):
+        """按录入顺序产出全部(姓名, 身份证号)；开始时的行数为准，遍历期间新增的行不产出"""
+        pending = self._pending
+        count = len(pending.ids)
+        pool = self.pool
+        for start in range(0, pending.base, SCAN_BATCH):
+            stop = min(start + SCAN_BATCH, pending.base)
+            text = self.ids[start * ID_WIDTH : stop * ID_WIDTH].decode(
+                "ascii", "replace"
+            )
+            names = map(pool.__getitem__, self.name_index[start:stop])
+            for row, name in enumerate(names, start):
+                offset = (row - start) * ID_WIDTH
+                if row in self._odd_rows:
+                    yield name, self._odd_rows[row]
+                else:
+                    yield name, text[offset : offset + ID_WIDTH]
+        yield from zip(pending.names[:count], pending.ids[:count])
+
+    def names(self):
+        """全部不重复的姓名（含缓冲区中的新姓名）"""
+        names = set(self.pool)
+        names.update(self._pending.by_name)
+        return names
+
+    def ids_with_prefix(self, prefix, limit=50):
+        """以prefix开头的身份证号，按号码排序，至多limit个
+
+        整数键的大小顺序与号码的字典序一致，数字前缀对应有序键中连续的一段。
+        """
+        prefix = prefix.upper()
+        # 先取缓冲区再取索引，其间恰好写入列的行会出现两次，由集合去重
+        found = {
+            id_number for id_number in self._pending.ids if id_number.startswith(prefix)
+        }
+        found.update(
+            id_number for id_number in self._odd_ids if id_number.startswith(prefix)
+        )
+        current = self._index
+        key_range = _prefix_keys(prefix)
+        if key_range is not None:
+            low, high = key_range
+            keys = current.keys
+            start = bisect_left(keys, low)
+            for i in range(start, min(start + limit, len(keys))):
+                if keys[i] > high:
+                    break
+                found.add(self.id_at(current.key_rows[i]))
+        return sorted(found)[:limit]
+
+    def written(self):
+        """已写入列的行数，这些行在列中的值不会再改变"""
+        return self._pending.base
+
+    @contextmanager
+    def locked(self):
+        """持锁期间不会写入列，可用NumPy等直接读取各列的缓冲区；产出已写入列的行数"""
+        with self._lock:
+            yield self._pending.base
+
+    def order_by(self, key, count, rows=None):
+        """前count行（rows给出时只排这些行）按姓名、出生日期或区划码升序（稳定）排列的行号"""
+        if count > self._pending.base:
+            self.flush()
+        # 各列只追加，切片复制后排序，不妨碍导入线程同时写入
+        if key == SORT_NAME:
+            pool = self.pool[:]
+            ranks = array("I", bytes(4 * len(pool)))
+            for rank, index in enumerate(
+                sorted(range(len(pool)), key=pool.__getitem__)
+            ):
+                ranks[index] = rank
+            column = self.name_index[:count]
+        else:
+            ranks = None
+            column = (self.birth if key == SORT_BIRTH else self.area)[:count]
+
+        np = _numpy()
+        if np is None:
+            if ranks is not None:
+                column = array("I", map(ranks.__getitem__, column))
+            return array(
+                "L",
+                sorted(range(count) if rows is None else rows, key=column.__getitem__),
+            )
+        keys = np.frombuffer(column, dtype=np.uint32)
+        if ranks is not None:
+            keys = np.frombuffer(ranks, dtype=np.uint32)[keys]
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            keys = keys[rows]
+        order = np.argsort(keys, kind="stable")
+        return order if rows is None else rows[order]
+
+
+def _prefix_keys(prefix):
+    """身份证号前缀对应的整数键区间[low, high]，前缀不可能对应有效号码时返回None"""
+    if len(prefix) == ID_WIDTH:
+        key = record_key(prefix)
+        return None if key is None else (key, key)
+    if len(prefix) > ID_WIDTH or prefix and not (prefix.isascii() and prefix.isdigit()):
+        return None
+    scale = 10 ** (ID_WIDTH - 1 - len(prefix))
+    head = int(prefix or "0")
+    return head * scale * 11 + 1, ((head + 1) * scale - 1) * 11 + len(CHECK_CHARS)
+
+
+def store_table(store):
+    """记录库的列式记录表：文本记录库直接返回其记录表，其他后端读取全部记录建立"""
+    table = getattr(store, "table", None)
+    if isinstance(table, RecordTable):
+        return table
+    return RecordTable.from_rows(store.scan())
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _read_bytes(f, size):
+    data = bytearray(size)
+    if f.readinto(data) != size:
+        raise ValueError("记录快照不完整")
+    return data
+
+
+def _read_array(f, typecode, count):
+    values = array(typecode)
+    try:
+        values.fromfile(f, count)
+    except EOFError:
+        raise ValueError("记录快照不完整") from None
+    return values
+
+
+def _batches(rows):
+    names = []
+    ids = []
+    for name, id_number in rows:
+        names.append(name)
+        ids.append(id_number)
+        if len(ids) >= SCAN_BATCH:
+            yield names, ids
+            names = []
+            ids = []
+    if ids:
+        yield names, ids
+
+
+def _sort_keys(np, keys, stable=False):
+    """按键排序，返回(有序的键, 对应的行号)；格式不符的行（键为0）不进入索引"""
+    if np is None:
+        rows = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = array("Q", (keys[row] for row in rows))
+        rows = array("I", rows)
+    else:
+        values = np.frombuffer(keys, dtype=np.uint64)
+        order = np.argsort(values, kind="stable" if stable else "quicksort")
+        sorted_keys = array("Q", values[order].tobytes())
+        rows = array("I", order.astype(np.uint32).tobytes())
+        del values
+    start = bisect_left(sorted_keys, 1)
+    return sorted_keys[start:], rows[start:]
+
+
+def _dedupe(np, sorted_keys, key_rows):
+    """去掉重复的键，返回(键, 行号, 被去掉的行号)；排序稳定时保留先出现的行"""
+    if np is None:
+        keep = [
+            i
+            for i in range(len(sorted_keys))
+            if i == 0 or sorted_keys[i] != sorted_keys[i - 1]
+        ]
+        if len(keep) == len(sorted_keys):
+            return sorted_keys, key_rows, []
+        kept = set(keep)
+        duplicates = [key_rows[i] for i in range(len(key_rows)) if i not in kept]
+        return (
+            array("Q", map(sorted_keys.__getitem__, keep)),
+            array("I", map(key_rows.__getitem__, keep)),
+            duplicates,
+        )
+    keys = np.frombuffer(sorted_keys, dtype=np.uint64)
+    rows = np.frombuffer(key_rows, dtype=np.uint32)
+    repeated = np.zeros(len(keys), dtype=bool)
+    repeated[1:] = keys[1:] == keys[:-1]
+    if not repeated.any():
+        return sorted_keys, key_rows, []
+    return (
+        array("Q", keys[~repeated].tobytes()),
+        array("I", rows[~repeated].tobytes()),
+        rows[repeated].tolist(),
+    )
+
+
+def _renumber(np, key_rows, dropped):
+    """删除dropped（已排序）中的行后，其余行号减去其前被删除的行数"""
+    if np is None:
+        return array("I", (row - bisect_left(dropped, row) for row in key_rows))
+    rows = np.frombuffer(key_rows, dtype=np.uint32)
+    shift = np.searchsorted(np.asarray(dropped, dtype=np.uint32), rows)
+    return array("I", (rows - shift).astype(np.uint32).tobytes())
+
+
+def _merge_keys(np, sorted_keys, key_rows, keys, rows):
+    """把一批(键, 行号)并入有序键数组；格式不符的行（键为0）不进入索引"""
+    if np is None:
+        merged = list(zip(sorted_keys, key_rows))
+        merged.extend((key, row) for key, row in zip(keys, rows) if key)
+        merged.sort()
+        return (
+            array("Q", (key for key, _ in merged)),
+            array("I", (row for _, row in merged)),
+        )
+    new_values = np.frombuffer(keys, dtype=np.uint64)
+    order = np.argsort(new_values)
+    order = order[new_values[order] > 0]
+    new_values = new_values[order]
+    values = np.frombuffer(sorted_keys, dtype=np.uint64)
+    positions = np.searchsorted(values, new_values)
+    new_rows = np.frombuffer(rows, dtype=np.uint32)[order]
+    return (
+        array("Q", np.insert(values, positions, new_values).tobytes()),
+        array("I", np.insert(key_rows, positions, new_rows).tobytes()),
+    )
+
+
+def _new_filter(np, sorted_keys):
+    """登记了全部键的过滤器，容量留出下次重建前可新增的记录"""
+    count = len(sorted_keys)
+    filter = _Filter(count + max(MIN_PENDING, count // 4))
+    filter.add(np, sorted_keys)
+    return filter
+
+
+def _name_rows(np, name_index, names):
+    """按姓名序号计数排序，返回(同名行号（按录入顺序）, 各姓名的起始位置)"""
+    starts = array("I", bytes(4 * (names + 1)))
+    if np is None:
+        for name in name_index:
+            starts[name + 1] += 1
+        for i in range(1, len(starts)):
+            starts[i] += starts[i - 1]
+        positions = list(starts[:-1])
+        rows = array("I", bytes(4 * len(name_index)))
+        for row, name in enumerate(name_index):
+            rows[positions[name]] = row
+            positions[name] += 1
+        return rows, starts
+    values = np.frombuffer(name_index, dtype=np.uint32)
+    np.cumsum(
+        np.bincount(values, minlength=names), out=np.frombuffer(starts, np.uint32)[1:]
+    )
+    rows = np.argsort(values, kind="stable").astype(np.uint32)
+    return array("I", rows.tobytes()), starts
+
+
+def _merge_name_rows(np, current, name_index, base, names):
+    """把第base行起的新行插入同名行号各区段的末尾"""
+    if np is None:
+        return _name_rows(np, name_index, names)
+    new = np.frombuffer(name_index, dtype=np.uint32)[base:]
+    old = np.frombuffer(current.name_starts, dtype=np.uint32)
+    starts = np.full(names + 1, old[-1], dtype=np.int64)
+    starts[: len(old)] = old
+    order = np.argsort(new, kind="stable")
+    rows = np.insert(
+        np.frombuffer(current.name_rows, dtype=np.uint32),
+        starts[new[order].astype(np.int64) + 1],
+        (order + base).astype(np.uint32),
+    )
+    starts[1:] += np.cumsum(np.bincount(new, minlength=names))
+    return array("I", rows.tobytes()), array("I", starts.astype(np.uint32).tobytes())
@@ -0,0 +1,111 @@
+"""身份证号校验"""
+
+from . import instrument
+
+COEFFS = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
+CHECK_CODES = "10X98765432"
+
+# 批量校验的原因码
+REASON_OK = 0
+REASON_LENGTH = 1
+REASON_DIGITS = 2
+REASON_CHECK_CODE = 3
+
+REASON_MESSAGES = {
+    REASON_OK: "合法",
+    REASON_LENGTH: "身份证号长度不正确",
+    REASON_DIGITS: "前17位必须为数字",
+    REASON_CHECK_CODE: "校验码不正确",
+}
+
+
+@instrument.timed("validate.check_code")
+def validate_check_code(id_number):
+    """验证身份证校验码"""
+    if len(id_number) != 18:
+        return False
+    try:
+        total = sum(int(a) * b for a, b in zip(id_number[:17], COEFFS))
+        return id_number[-1].upper() == CHECK_CODES[total % 11]
+    except:
+        return False
+
+
+def check_id_number(id_number):
+    """校验身份证号，返回错误说明，合法时返回None"""
+    reason = check_reason(id_number)
+    if reason == REASON_OK:
+        return None
+    return REASON_MESSAGES[reason]
+
+
+def check_reason(id_number):
+    """校验单个身份证号，返回原因码"""
+    if len(id_number) != 18:
+        return REASON_LENGTH
+    # isdigit()也接受全角等Unicode数字，与批量校验保持一致只认ASCII数字
+    head = id_number[:17]
+    if not (head.isascii() and head.isdigit()):
+        return REASON_DIGITS
+    if not validate_check_code(id_number):
+        return REASON_CHECK_CODE
+    return REASON_OK
+
+
+@instrument.timed("validate.batch")
+def validate_batch(ids):
+    """批量校验一列身份证号
+
+    ids可以是字符串列表、按行分隔的bytes，或dtype为S18的NumPy数组。
+    返回(mask, reasons)：mask为每行是否合法，reasons为对应的原因码。
+    安装了NumPy时两者均为ndarray，否则为list与bytearray。
+    """
+    if isinstance(ids, (bytes, bytearray, memoryview)):
+        ids = [line.strip() for line in bytes(ids).splitlines()]
+
+    try:
+        import numpy as np
+    except ImportError:
+        return _validate_batch_python(ids)
+    return _validate_batch_numpy(np, ids)
+
+
+def _validate_batch_python(ids):
+    reasons = bytearray(len(ids))
+    for i, id_number in enumerate(ids):
+        if isinstance(id_number, bytes):
+            id_number = id_number.decode("ascii", "replace")
+        reasons[i] = check_reason(id_number)
+    return [reason == REASON_OK for reason in reasons], reasons
+
+
+def _validate_batch_numpy(np, ids):
+    if isinstance(ids, np.ndarray) and ids.dtype.kind == "S":
+        lengths = np.char.str_len(ids)
+        column = ids.astype("S18")
+    else:
+        encoded = [
+            s.encode("ascii", "replace") if isinstance(s, str) else bytes(s)
+            for s in ids
+        ]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        column = np.array(encoded, dtype="S18")
+
+    # 每行18个字节的uint8矩阵；不足18位的行已由长度判定
+    matrix = np.frombuffer(column.tobytes(), dtype=np.uint8).reshape(-1, 18)
+    digits = matrix[:, :17] - np.uint8(48)  # 非数字字符回绕后均大于9
+    all_digits = (digits <= 9).all(axis=1)
+
+    weights = np.array(COEFFS, dtype=np.uint16)
+    totals = digits.astype(np.uint16) @ weights
+    table = np.frombuffer(CHECK_CODES.encode("ascii"), dtype=np.uint8)
+    expected = table[totals % 11]
+
+    last = matrix[:, 17]
+    last = np.where(last == ord("x"), np.uint8(ord("X")), last)
+
+    reasons = np.full(len(column), REASON_OK, dtype=np.uint8)
+    reasons[last != expected] = REASON_CHECK_CODE
+    reasons[~all_digits] = REASON_DIGITS
+    reasons[lengths != 18] = REASON_LENGTH
+    return reasons == REASON_OK, reasons
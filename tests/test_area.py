@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from idcard.area import AreaCodeLoader, ShardedAreaIndex
+
+PROVINCES = ["11", "13", "21", "31", "32", "33", "37", "44", "51", "53", "61", "65"]
+
+
+@pytest.fixture(scope="module")
+def shards():
+    index = AreaCodeLoader.load_shards()
+    if not isinstance(index, ShardedAreaIndex):
+        pytest.skip("分片目录不可写，索引只在内存中")
+    yield index
+    index.close()
+
+
+def test_mixed_provinces_map_each_shard_once(shards):
+    for _ in range(3):
+        for prefix in PROVINCES:
+            shards.resolve(prefix + "0101")
+    assert shards.loads == len(PROVINCES)
+    assert sorted(shards.loaded_shards) == PROVINCES
+
+
+def test_bounded_cache_evicts_least_recent(shards):
+    bounded = ShardedAreaIndex(shards.directory, max_shards=2)
+    try:
+        for prefix in PROVINCES[:3] + PROVINCES[:1]:
+            bounded.resolve(prefix + "0101")
+        assert bounded.loads == 4
+        assert bounded.loaded_shards == [PROVINCES[2], PROVINCES[0]]
+    finally:
+        bounded.close()
+
+
+SOURCE = [
+    {
+        "code": 110000000000,
+        "name": "北京市",
+        "level": 1,
+        "children": [
+            {
+                "code": 110100000000,
+                "name": "市辖区",
+                "level": 2,
+                "children": [{"code": 110101000000, "name": "东城区", "level": 3}],
+            }
+        ],
+    },
+    {
+        "code": 320000000000,
+        "name": "江苏省",
+        "level": 1,
+        "children": [
+            {
+                "code": 320500000000,
+                "name": "苏州市",
+                "level": 2,
+                "children": [{"code": 320508000000, "name": "姑苏区", "level": 3}],
+            }
+        ],
+    },
+]
+
+
+@pytest.mark.parametrize("damage", ["delete", "truncate"])
+def test_damaged_shard_is_rebuilt(tmp_path, monkeypatch, damage):
+    source = tmp_path / "area_code.json"
+    source.write_text(json.dumps(SOURCE, ensure_ascii=False), encoding="utf-8")
+    directory = tmp_path / "shards"
+    monkeypatch.setattr(AreaCodeLoader, "SOURCE_PATH", str(source))
+    monkeypatch.setattr(AreaCodeLoader, "HISTORY_PATH", str(tmp_path / "none.json"))
+    monkeypatch.setattr(AreaCodeLoader, "SHARD_DIR", str(directory))
+
+    index = AreaCodeLoader.load_shards()
+    assert index.resolve("320508")[0] == "江苏省苏州市姑苏区"
+    index.close()
+
+    shard = directory / "32.idx"
+    if damage == "delete":
+        shard.unlink()
+    else:
+        shard.write_bytes(shard.read_bytes()[:-8])
+    index = AreaCodeLoader.load_shards()
+    assert isinstance(index, ShardedAreaIndex)
+    assert index.resolve("320508")[0] == "江苏省苏州市姑苏区"
+    assert index.resolve("110101")[0] == "北京市东城区"
+    index.close()
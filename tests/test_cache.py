@@ -0,0 +1,111 @@
+from idcard.cache import LRUCache
+from idcard.parser import CachedParser, parse_id_info
+from idcard.validator import CHECK_CODES, COEFFS
+
+AREA_CODES = {
+    "110101": "北京市东城区",
+    "110000": "北京市",
+    "320504": "江苏省苏州市金阊区",
+}
+
+
+def with_check(head):
+    """补上校验码的18位身份证号"""
+    return head + CHECK_CODES[sum(int(d) * c for d, c in zip(head, COEFFS)) % 11]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a变为最近使用
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    cache.put("a", 10)  # 覆盖不淘汰
+    assert len(cache) == 2
+    cache.put("d", 4)
+    assert cache.get("c") is None
+    assert cache.get("a") == 10
+    assert cache.evictions == 2
+
+
+def test_lru_counters():
+    cache = LRUCache(4)
+    assert cache.get("x", "默认") == "默认"
+    cache.put("x", 0)
+    assert cache.get("x", "默认") == 0  # 假值也算命中
+    cache.get("x")
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 0)
+    assert cache.hit_rate == 2 / 3
+    assert cache.stats() == {
+        "size": 1,
+        "maxsize": 4,
+        "hits": 2,
+        "misses": 1,
+        "evictions": 0,
+        "hit_rate": 2 / 3,
+    }
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses, cache.hit_rate) == (0, 0, 0, 0.0)
+
+
+def test_lru_disabled_when_maxsize_zero():
+    cache = LRUCache(0)
+    cache.put("x", 1)
+    assert cache.get("x") is None
+    assert len(cache) == 0
+
+
+def test_cached_parser_matches_parse_id_info():
+    parser = CachedParser(AREA_CODES, result_cache_size=2)
+    ids = [
+        with_check("11010119900101001"),
+        with_check("11010219900101002"),  # 按市级解析
+        with_check("32050419630903153"),
+        with_check("99999919630903153"),
+    ]
+    for id_number in ids + ids:
+        assert parser.parse(id_number) == parse_id_info(id_number, AREA_CODES)
+    # 户籍地按6位前缀缓存，第二轮全部命中
+    assert parser.locations.misses == 4
+    assert parser.locations.hits == 4
+    # 结果缓存只有2个位置，按顺序循环访问时总是被淘汰
+    assert parser.results.hits == 0
+    assert parser.results.evictions == 6
+
+
+def test_cached_parser_results_are_copies():
+    parser = CachedParser(AREA_CODES, result_cache_size=8)
+    id_number = with_check("11010119900101001")
+    parser.parse(id_number)["户籍地"] = "被改动"
+    assert parser.parse(id_number)["户籍地"] == "北京市东城区"
+    assert parser.stats()["result"]["hits"] == 1
+
+
+def test_cached_parser_keys_on_prefix_without_era():
+    parser = CachedParser(AREA_CODES)
+    parser.parse(with_check("11010119900101001"))
+    parser.parse(with_check("11010120200101001"))
+    assert len(parser.locations) == 1
+    assert parser.locations.get("110101") == "北京市东城区"
+
+
+class EraAreas:
+    """按出生年代返回不同名称的区划索引"""
+
+    def era(self, date):
+        return 0 if date < 20000101 else 1
+
+    def resolve_at(self, code, date):
+        return f"{code}-{self.era(date)}", 3
+
+
+def test_cached_parser_keys_include_era():
+    parser = CachedParser(EraAreas())
+    assert parser.location(with_check("11010119900101001")) == "110101-0"
+    assert parser.location(with_check("11010120200101001")) == "110101-1"
+    assert parser.location(with_check("11010119800101001")) == "110101-0"
+    assert parser.locations.get(("110101", 1)) == "110101-1"
+    assert (parser.locations.hits, parser.locations.misses) == (2, 2)
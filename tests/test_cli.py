@@ -0,0 +1,92 @@
+import io
+import sys
+
+import pytest
+
+from idcard import cli
+from idcard.importer import ImportCheckpoint
+from idcard.store import RecordStore
+from idcard.validator import CHECK_CODES, COEFFS
+
+
+def with_check(head):
+    """补上校验码的18位身份证号"""
+    return head + CHECK_CODES[sum(int(d) * c for d, c in zip(head, COEFFS)) % 11]
+
+
+ZHANG = with_check("11010119900101001")
+LI = with_check("32050419630903153")
+GOOD = f"{ZHANG} 张三\n{LI} 李四\n"
+BAD = "12345 坏号码\n"
+
+
+def import_args(input_path, db):
+    return ["import", str(input_path), "--db", str(db), "--workers", "1"]
+
+
+def names(db):
+    store = RecordStore(str(db), snapshot=False).load()
+    return sorted(store.scan())
+
+
+def test_import_exit_codes(tmp_path, capsys):
+    good = tmp_path / "good.sfzx"
+    good.write_text(GOOD, encoding="utf-8")
+    db = tmp_path / "database.sfz"
+    assert cli.main(import_args(good, db) + ["--no-progress"]) == cli.EXIT_OK
+    assert "成功 2 条" in capsys.readouterr().err
+    assert names(db) == [("张三", ZHANG), ("李四", LI)]
+
+    mixed = tmp_path / "mixed.sfzx"
+    mixed.write_text(GOOD + BAD, encoding="utf-8")
+    other = tmp_path / "other.sfz"
+    assert cli.main(import_args(mixed, other)) == cli.EXIT_REJECTED
+    assert "失败 1 条" in capsys.readouterr().err
+    assert len(names(other)) == 2
+
+    missing = tmp_path / "missing.sfzx"
+    assert cli.main(import_args(missing, db)) == cli.EXIT_ERROR
+    assert "错误" in capsys.readouterr().err
+
+
+def test_import_from_stdin(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(GOOD.encode())))
+    db = tmp_path / "database.sfz"
+    assert cli.main(["import", "-", "--db", str(db)]) == cli.EXIT_OK
+    captured = capsys.readouterr()
+    assert captured.out == ""  # 汇总只写到标准错误
+    assert "成功 2 条" in captured.err
+    assert names(db) == [("张三", ZHANG), ("李四", LI)]
+
+
+def test_validate_writes_rows_to_stdout(tmp_path, monkeypatch, capsys):
+    data = (GOOD + BAD).encode()
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+    assert cli.main(["validate"]) == cli.EXIT_REJECTED
+    captured = capsys.readouterr()
+    rows = [line.split("\t") for line in captured.out.splitlines()]
+    assert [row[:2] for row in rows] == [[ZHANG, "张三"], [LI, "李四"]]
+    assert rows[0][2].startswith("北京市")
+    assert "失败 1 条" in captured.err
+
+
+@pytest.mark.parametrize("resume_same_db", [True, False])
+def test_resume_checkpoint_belongs_to_database(tmp_path, capsys, resume_same_db):
+    input_path = tmp_path / "input.sfzx"
+    input_path.write_text(GOOD, encoding="utf-8")
+    first = tmp_path / "first.sfz"
+    first.write_text(f"张三,{ZHANG},北京市东城区\n", encoding="utf-8")
+    # 导入第一个记录库时在第一行之后中断
+    first_line = len(GOOD.splitlines()[0].encode()) + 1
+    ImportCheckpoint(f"{first}.ckpt").save(str(input_path), first_line)
+
+    db = first if resume_same_db else tmp_path / "second.sfz"
+    assert cli.main(import_args(input_path, db) + ["--resume"]) == cli.EXIT_OK
+    assert names(db) == [("张三", ZHANG), ("李四", LI)]
+    if resume_same_db:
+        assert "成功 1 条" in capsys.readouterr().err
+        assert not (tmp_path / "first.sfz.ckpt").exists()
+    else:
+        # 另一个记录库没有断点，从头导入，第一个记录库的断点保留
+        assert "成功 2 条" in capsys.readouterr().err
+        assert (tmp_path / "first.sfz.ckpt").exists()
@@ -0,0 +1,106 @@
+import pytest
+
+from idcard.area import TIER_EXACT, AreaCodeLoader, AreaIndex
+from idcard.editions import AreaEditions, DatedAreaIndex, edition_date
+from idcard.parser import CachedParser, parse_id_info
+from idcard.validator import CHECK_CODES, COEFFS
+
+JINCHANG = "江苏省苏州市金阊区"
+GUSU = "江苏省苏州市姑苏区"
+EDITIONS = [
+    (19800101, {"320504": JINCHANG, "320505": "江苏省苏州市虎丘区"}),
+    (19950101, {"320504": JINCHANG}),  # 320505本版撤销
+    (20120901, {"320508": GUSU}),
+]
+CURRENT = {"320000": "江苏省", "320500": "江苏省苏州市", "320508": GUSU}
+
+
+def with_check(head):
+    """补上校验码的18位身份证号"""
+    return head + CHECK_CODES[sum(int(d) * c for d, c in zip(head, COEFFS)) % 11]
+
+
+@pytest.fixture
+def editions(tmp_path):
+    path = tmp_path / "area_editions.idx"
+    path.write_bytes(AreaEditions.build(reversed(EDITIONS)))
+    editions = AreaEditions.open(str(path))
+    yield editions
+    editions.close()
+
+
+@pytest.fixture
+def dated(editions):
+    base, resolution = AreaCodeLoader.resolution_table(CURRENT, {}, 32, 32)
+    return DatedAreaIndex(
+        AreaIndex(AreaIndex.build(CURRENT, 0, 0, b"", base, resolution)), editions
+    )
+
+
+def test_edition_date_from_filename():
+    assert edition_date("config/area_editions/1980.json") == 19800101
+    assert edition_date("199907.json") == 19990701
+    assert edition_date("20120901.json") == 20120901
+    with pytest.raises(ValueError):
+        edition_date("current.json")
+
+
+def test_build_and_open(editions):
+    assert editions.dates == [19800101, 19950101, 20120901]
+    assert editions.path.endswith("area_editions.idx")
+    # 只记录名称变化：两个区划码各有一次命名与一次撤销，加上姑苏区
+    assert len(editions) == 5
+
+
+def test_name_at(editions):
+    assert editions.name_at("320504", 19900101) == JINCHANG
+    assert editions.name_at("320505", 19900101) == "江苏省苏州市虎丘区"
+    assert editions.name_at("320505", 19950101) is None  # 已撤销
+    assert editions.name_at("320504", 20150101) is None
+    assert editions.name_at("320508", 20150101) == GUSU
+    assert editions.name_at("320508", 20000101) is None  # 尚未设立
+    assert editions.name_at("110101", 20000101) is None
+    assert editions.name_at("3205", 20000101) is None
+    # 早于第一版的日期按第一版查询
+    assert editions.name_at("320504", 19630903) == JINCHANG
+
+
+def test_era(editions):
+    assert editions.era(19630903) == 0
+    assert editions.era(19800101) == 0
+    assert editions.era(19941231) == 0
+    assert editions.era(19950101) == 1
+    assert editions.era(20200903) == 2
+
+
+def test_resolve_at(dated):
+    assert dated.resolve_at("320504", 19900101) == (JINCHANG, TIER_EXACT)
+    # 撤销的区划码按当前索引逐级解析
+    assert dated.resolve_at("320505", 20000101)[0] == "江苏省苏州市"
+    # 最新一版生效之后按当前索引解析
+    assert dated.resolve_at("320504", 20200903)[0] == "江苏省苏州市"
+    assert dated.resolve_at("320508", 20200903) == (GUSU, TIER_EXACT)
+
+
+def test_newest_edition_uses_current_data():
+    # 最新一版的名称已过时时，其生效之后仍以当前数据为准
+    current = {"320504": GUSU}
+    base, resolution = AreaCodeLoader.resolution_table(current, {}, 32, 32)
+    only_1980 = AreaEditions(AreaEditions.build(EDITIONS[:1]))
+    dated = DatedAreaIndex(
+        AreaIndex(AreaIndex.build(current, 0, 0, b"", base, resolution)), only_1980
+    )
+    assert parse_id_info(with_check("32050419630903153"), dated)["户籍地"] == JINCHANG
+    assert parse_id_info(with_check("32050420200903153"), dated)["户籍地"] == GUSU
+
+
+def test_cached_parser_keys_on_era(dated):
+    parser = CachedParser(dated)
+    old = with_check("32050419630903153")
+    new = with_check("32050420200903153")
+    assert parser.parse(old)["户籍地"] == JINCHANG
+    assert parser.parse(new)["户籍地"] == "江苏省苏州市"
+    assert parser.parse(with_check("32050419700101153"))["户籍地"] == JINCHANG
+    assert len(parser.locations) == 2
+    assert parser.locations.hits == 1
+    assert parser.locations.misses == 2
@@ -0,0 +1,153 @@
+import os
+
+import pytest
+
+from idcard.importer import (
+    REJECT_CONFLICT,
+    BatchImporter,
+    ImportCancelled,
+    ImportCheckpoint,
+)
+from idcard.logstore import LogStore
+from idcard.sqlitestore import SqliteStore
+from idcard.store import RecordStore
+from idcard.validator import CHECK_CODES, COEFFS
+
+AREA_CODES = {"110101": "北京市东城区", "320504": "江苏省苏州市金阊区"}
+
+
+def with_check(head):
+    """补上校验码的18位身份证号"""
+    return head + CHECK_CODES[sum(int(d) * c for d, c in zip(head, COEFFS)) % 11]
+
+
+ZHANG = with_check("11010119900101001")
+LI = with_check("32050419630903153")
+WANG = with_check("11010119850101002")
+LINES = [
+    f"{ZHANG} 张三",
+    f"{LI} 李四",
+    f"{ZHANG} 张三",  # 文件内重复
+    f"{ZHANG} 张三丰",  # 与先出现者冲突
+    "12345 坏号码",
+    "只有一列",
+    f"{WANG} 王五",
+]
+
+
+def write_input(path, copies):
+    lines = []
+    for i in range(copies):
+        lines.extend(LINES)
+        lines.append(f"{with_check(f'3205041963{i % 12 + 1:02d}01{i:03d}')} 编号{i}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def run_import(backend, tmp_path, input_path, workers):
+    directory = tmp_path / f"{backend}-{workers}"
+    directory.mkdir()
+    if backend == "csv":
+        store = RecordStore(str(directory / "database.sfz")).load()
+    elif backend == "log":
+        store = LogStore(str(directory / "records")).load()
+    else:
+        store = SqliteStore(str(directory / "database.db")).load()
+    # 先登记一条已存在的记录
+    store.add("李四", LI, "江苏省苏州市金阊区")
+    importer = BatchImporter(store, AREA_CODES, workers=workers, shard_size=256)
+    result = importer.run(str(input_path))
+    records = sorted(store.scan())
+    store.close()
+    return result, records, directory
+
+
+@pytest.mark.parametrize("backend", ["csv", "log", "sqlite"])
+def test_parallel_import_matches_sequential(backend, tmp_path):
+    input_path = tmp_path / "input.sfzx"
+    write_input(input_path, 40)
+    serial, serial_records, _ = run_import(backend, tmp_path, input_path, 1)
+    parallel, parallel_records, _ = run_import(backend, tmp_path, input_path, 2)
+
+    assert parallel_records == serial_records
+    for result in (serial, parallel):
+        # 张三、王五与40个编号为新增；李四、文件内重复的张三以及之后各份的张三、王五已存在
+        assert result.success == 2 + 40
+        assert result.existing == 40 + 40 + 39 + 39
+        assert result.rejects[REJECT_CONFLICT] == 40
+    assert parallel.rejects == serial.rejects
+
+
+def test_parallel_import_writes_worker_lines(tmp_path):
+    input_path = tmp_path / "input.sfzx"
+    write_input(input_path, 40)
+    _, _, directory = run_import("csv", tmp_path, input_path, 2)
+    lines = (directory / "database.sfz").read_text(encoding="utf-8").splitlines()
+    assert lines[0] == f"李四,{LI},江苏省苏州市金阊区"
+    assert lines[1] == f"张三,{ZHANG},北京市东城区"
+    assert len(lines) == len(set(lines)) == 43
+
+    store = RecordStore(str(directory / "database.sfz"), snapshot=False).load()
+    assert len(store) == 43
+
+
+@pytest.mark.parametrize("backend", ["csv", "log"])
+def test_checkpoint_saved_after_fsync(backend, tmp_path, monkeypatch):
+    input_path = tmp_path / "input.sfzx"
+    write_input(input_path, 40)
+    if backend == "csv":
+        store = RecordStore(str(tmp_path / "database.sfz")).load()
+    else:
+        store = LogStore(str(tmp_path / "records")).load()
+    events = []
+    fsync = os.fsync
+
+    def record_fsync(fd):
+        events.append("fsync")
+        fsync(fd)
+
+    class Checkpoint(ImportCheckpoint):
+        def save(self, filepath, offset):
+            events.append("save")
+            super().save(filepath, offset)
+
+    monkeypatch.setattr(os, "fsync", record_fsync)
+    importer = BatchImporter(store, AREA_CODES, chunk_size=512)
+    importer.run(str(input_path), checkpoint=Checkpoint(f"{store.path}.ckpt"))
+    store.close()
+    saves = [i for i, event in enumerate(events) if event == "save"]
+    assert len(saves) > 1
+    # 每次保存断点之前都已落盘
+    assert all(events[i - 1] == "fsync" for i in saves)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cancel_keeps_checkpoint_and_resumes(workers, tmp_path):
+    input_path = tmp_path / "input.sfzx"
+    write_input(input_path, 40)
+    _, expected, _ = run_import("csv", tmp_path, input_path, 1)
+
+    path = str(tmp_path / "database.sfz")
+    store = RecordStore(path).load()
+    store.add("李四", LI, "江苏省苏州市金阊区")
+    checkpoint = ImportCheckpoint.for_store(store)
+    importer = BatchImporter(
+        store, AREA_CODES, chunk_size=512, workers=workers, shard_size=256
+    )
+    with pytest.raises(ImportCancelled):
+        importer.run(
+            str(input_path), progress=lambda _: importer.cancel(), checkpoint=checkpoint
+        )
+    store.close()
+    offset = checkpoint.load(str(input_path))
+    assert 0 < offset < input_path.stat().st_size
+
+    # 写入器已关闭，中止前的记录都已写入，可从断点继续
+    store = RecordStore(path).load()
+    assert len(store) > 1
+    importer = BatchImporter(
+        store, AREA_CODES, chunk_size=512, workers=workers, shard_size=256
+    )
+    importer.run(str(input_path), start_offset=offset, checkpoint=checkpoint)
+    assert sorted(store.scan()) == expected
+    store.close()
+    assert not os.path.exists(checkpoint.path)
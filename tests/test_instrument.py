@@ -0,0 +1,141 @@
+import json
+import multiprocessing
+import pstats
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from idcard import instrument
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    """在隔离的状态中开启计时，测试结束后恢复"""
+    monkeypatch.setattr(instrument, "_stats", {})
+    monkeypatch.setattr(instrument, "_counters", {})
+    monkeypatch.setattr(instrument, "_profiles", [])
+    monkeypatch.setattr(instrument, "_outputs", {"report": None, "cprofile": None})
+    monkeypatch.setattr(instrument, "_profiling", False)
+    monkeypatch.setattr(instrument, "_owner", None)
+    monkeypatch.setattr(instrument, "enabled", False)
+    return instrument
+
+
+def test_disabled_by_default(profiling):
+    with profiling.timer("x"):
+        pass
+    profiling.count("n")
+    assert profiling.timer("x") is profiling._NULL_TIMER
+    assert profiling.report()["timers"] == {}
+    assert profiling.report()["counters"] == {}
+
+
+def test_timer_and_count_aggregate(profiling):
+    profiling.enable()
+
+    @profiling.timed("work")
+    def work(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    assert work(0.002) == 0.002
+    work(0.001)
+    with profiling.timer("block"):
+        pass
+    profiling.record("batch", 0.5, count=10)
+    profiling.count("rows", 3)
+    profiling.count("rows", 4)
+
+    result = profiling.report()
+    work_stats = result["timers"]["work"]
+    assert work_stats["count"] == 2
+    assert work_stats["min_us"] >= 1000
+    assert work_stats["max_us"] >= 2000
+    assert work_stats["total_s"] >= 0.003
+    assert result["timers"]["block"]["count"] == 1
+    assert result["timers"]["batch"] == {
+        "count": 10,
+        "total_s": 0.5,
+        "mean_us": 50000.0,
+        "min_us": 500000.0,
+        "max_us": 500000.0,
+    }
+    assert result["counters"] == {"rows": 7}
+
+    profiling.disable()
+    work(0)
+    assert profiling.report()["timers"]["work"]["count"] == 2
+    profiling.reset()
+    assert profiling.report()["timers"] == {}
+
+
+def test_report_written_at_exit(profiling, tmp_path):
+    path = tmp_path / "report.json"
+    profiling.enable(str(path))
+    with profiling.timer("import.write"):
+        pass
+    profiling._write_outputs()
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["timers"]["import.write"]["count"] == 1
+    assert set(saved) == {"pid", "uptime_s", "timers", "counters"}
+
+
+def test_report_not_written_by_other_process(profiling, tmp_path, monkeypatch):
+    path = tmp_path / "report.json"
+    profiling.enable(str(path))
+    monkeypatch.setattr(profiling, "_owner", -1)  # 相当于fork出的子进程
+    profiling._write_outputs()
+    assert not path.exists()
+
+
+def busy():
+    return sum(range(10000))
+
+
+def test_profile_thread_writes_pstats(profiling, tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_profiling", True)
+    with profiling.profile_thread():
+        busy()
+    path = tmp_path / "run.pstats"
+    profiling.write_profile(str(path))
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "busy" in functions
+
+
+@pytest.mark.parametrize(
+    "report, cprofile, expected",
+    [
+        ("1", None, (instrument.DEFAULT_REPORT, None)),
+        ("out.json", None, ("out.json", None)),
+        (None, "run.pstats", (instrument.DEFAULT_REPORT, "run.pstats")),
+        (None, None, None),
+    ],
+)
+def test_enable_from_env(profiling, monkeypatch, report, cprofile, expected):
+    calls = []
+    monkeypatch.setattr(profiling, "enable", lambda *args: calls.append(args))
+    for name, value in (
+        (instrument.ENV_REPORT, report),
+        (instrument.ENV_CPROFILE, cprofile),
+    ):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    profiling.enable_from_env()
+    assert calls == ([expected] if expected else [])
+
+
+def child_state():
+    from idcard import instrument
+
+    return instrument.enabled, instrument._outputs["report"]
+
+
+def test_spawned_workers_do_not_enable(monkeypatch, tmp_path):
+    monkeypatch.setenv(instrument.ENV_REPORT, str(tmp_path / "report.json"))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as pool:
+        assert pool.submit(child_state).result() == (False, None)
+    assert not (tmp_path / "report.json").exists()
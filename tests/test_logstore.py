@@ -0,0 +1,248 @@
+import os
+import threading
+
+import pytest
+
+import idcard.logstore
+from idcard import cli
+from idcard.logstore import INDEX_HEADER, REJECTED_FILE, LogStore
+from idcard.sqlitestore import SqliteStore
+from idcard.store import RecordStore
+
+ZHANG = "110101199001010011"
+WANG = "11010119900101002X"
+
+# 格式错误、字段不足、空行与重复身份证号混在一起的旧记录文件
+LEGACY_CSV = (
+    f"张三,{ZHANG},北京市东城区\n"
+    "李四,12345,未知\n"
+    "只有姓名\n"
+    "\n"
+    f"王五,{WANG},北京市东城区\n"
+    f"张三丰,{ZHANG},北京市东城区\n"
+)
+
+
+def open_store(backend, tmp_path, csv_path):
+    if backend == "csv":
+        return RecordStore(str(csv_path)).load()
+    if backend == "log":
+        return LogStore(str(tmp_path / "records"), migrate_from=str(csv_path)).load()
+    return SqliteStore(str(tmp_path / "database.db"), migrate_from=str(csv_path)).load()
+
+
+def abandon(store):
+    """模拟进程崩溃：不写检查点直接丢弃文件句柄"""
+    store._reader.close()
+    store._appender.close()
+
+
+@pytest.mark.parametrize("backend", ["csv", "log", "sqlite"])
+def test_migration_keeps_first_duplicate(backend, tmp_path):
+    csv_path = tmp_path / "database.sfz"
+    csv_path.write_text(LEGACY_CSV, encoding="utf-8")
+    store = open_store(backend, tmp_path, csv_path)
+    assert store.name_of(ZHANG) == "张三"
+    assert store.name_of(WANG) == "王五"
+    store.close()
+
+    store = open_store(backend, tmp_path, csv_path)
+    assert store.name_of(ZHANG) == "张三"
+    assert store.ids_for_name("王五") == [WANG]
+    store.close()
+
+
+def test_log_migration_quarantines_malformed_ids(tmp_path):
+    csv_path = tmp_path / "database.sfz"
+    csv_path.write_text(LEGACY_CSV, encoding="utf-8")
+    directory = tmp_path / "records"
+    store = LogStore(str(directory), migrate_from=str(csv_path)).load()
+    assert len(store) == 2
+    assert "12345" not in store
+    store.close()
+    rejected = (directory / REJECTED_FILE).read_text(encoding="utf-8")
+    assert rejected == "李四,12345,未知\n"
+    with pytest.raises(ValueError):
+        LogStore(str(directory)).load().add("李四", "12345", "未知")
+
+
+def test_log_skips_malformed_records_written_by_old_versions(tmp_path):
+    directory = str(tmp_path / "records")
+    store = LogStore(directory).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    with open(store.path, "ab") as f:
+        f.write(store._encode(1, "12345", "李四", "未知"))
+    store.close()
+    os.remove(os.path.join(directory, "id.idx"))
+
+    store = LogStore(directory).load()
+    assert len(store) == 1
+    assert [name for name, _ in store.scan()] == ["张三"]
+    store.close()
+
+
+def test_log_replays_after_crash(tmp_path):
+    directory = str(tmp_path / "records")
+    store = LogStore(directory).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    store.checkpoint()
+    store.add("王五", WANG, "北京市东城区")
+    abandon(store)
+    with open(store.path, "ab") as f:
+        f.write(b"\x01\x02\x03")  # 写到一半的记录
+    size = os.path.getsize(store.path)
+
+    store = LogStore(directory).load()
+    assert os.path.getsize(store.path) == size - 3
+    assert store.name_of(ZHANG) == "张三"
+    assert store.name_of(WANG) == "王五"
+    assert store.ids_for_name("王五") == [WANG]
+    assert len(store) == 2
+    store.close()
+
+
+def test_log_rebuilds_index_interrupted_during_merge(tmp_path):
+    directory = str(tmp_path / "records")
+    store = LogStore(directory).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    store.checkpoint()
+    store.add("王五", WANG, "北京市东城区")
+    store.checkpoint()
+    abandon(store)
+    # 原地合并开始时头部的覆盖长度被置0
+    index_path = os.path.join(directory, "id.idx")
+    with open(index_path, "r+b") as f:
+        header = list(INDEX_HEADER.unpack(f.read(INDEX_HEADER.size)))
+        header[4] = 0
+        f.seek(0)
+        f.write(INDEX_HEADER.pack(*header))
+
+    store = LogStore(directory).load()
+    assert store.name_of(ZHANG) == "张三"
+    assert store.name_of(WANG) == "王五"
+    assert len(store) == 2
+    store.close()
+
+
+def test_log_checkpoint_merges_in_place(tmp_path):
+    directory = str(tmp_path / "records")
+    store = LogStore(directory).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    store.checkpoint()
+    index_path = os.path.join(directory, "id.idx")
+    inode = os.stat(index_path).st_ino
+    store.add("王五", WANG, "北京市东城区")
+    store.checkpoint()
+    assert os.stat(index_path).st_ino == inode
+    store.close()
+
+    store = LogStore(directory).load()
+    assert store._id_delta == {}
+    assert store.name_of(WANG) == "王五"
+    store.close()
+
+
+def test_log_lookups_during_checkpoints(tmp_path):
+    directory = str(tmp_path / "records")
+    store = LogStore(directory, checkpoint_every=50).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    stop = threading.Event()
+    errors = []
+
+    def lookup():
+        try:
+            while not stop.is_set():
+                assert store.name_of(ZHANG) == "张三"
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    reader = threading.Thread(target=lookup)
+    reader.start()
+    try:
+        with store.open_writer(flush_rows=10) as writer:
+            for i in range(2000):
+                writer.add("测试", f"3301{i:013d}1", "")
+    finally:
+        stop.set()
+        reader.join()
+    assert errors == []
+    assert len(store) == 2001
+    store.close()
+
+
+def superseded_store(directory, **options):
+    """写入20条记录，其中10条改过一次姓名，6条已删除"""
+    store = LogStore(directory, **options).load()
+    ids = [f"3301{i:013d}1" for i in range(20)]
+    for id_number in ids:
+        store.add("旧名", id_number, "浙江省杭州市")
+    for id_number in ids[:10]:
+        store.add("新名", id_number, "浙江省杭州市")
+    for id_number in ids[14:]:
+        store.delete(id_number)
+    return store, ids
+
+
+def log_contents(store, ids):
+    return (
+        len(store),
+        sorted(store.scan()),
+        [store.name_of(id_number) for id_number in ids],
+        store.ids_for_name("新名"),
+        store.ids_for_name("旧名"),
+    )
+
+
+def test_log_compact_keeps_live_records(tmp_path):
+    directory = str(tmp_path / "records")
+    store, ids = superseded_store(directory, compact_ratio=None)
+    assert store.dead_records() == 16
+    before = log_contents(store, ids)
+    size = os.path.getsize(store.path)
+    store.compact()
+    assert store.dead_records() == 0
+    assert log_contents(store, ids) == before
+    store.close()
+
+    assert os.path.getsize(store.path) < size
+    store = LogStore(directory).load()
+    assert log_contents(store, ids) == before
+    assert len(store) == 14
+    store.close()
+
+
+def test_log_compacts_on_close_past_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(idcard.logstore, "COMPACT_MIN_DEAD", 10)
+    directory = str(tmp_path / "records")
+    store, ids = superseded_store(directory)
+    before = log_contents(store, ids)
+    assert store.needs_compaction()  # 16条旧记录，占全部30条写入记录的一半以上
+    size = os.path.getsize(store.path)
+    store.close()
+    assert os.path.getsize(store.path) < size
+
+    store = LogStore(directory).load()
+    assert store.dead_records() == 0
+    assert log_contents(store, ids) == before
+    store.close()
+
+    # 比例未超过阈值时不压缩
+    store, _ = superseded_store(str(tmp_path / "kept"), compact_ratio=0.9)
+    size = os.path.getsize(store.path)
+    store.close()
+    assert os.path.getsize(store.path) == size
+
+
+def test_compact_command(tmp_path, capsys):
+    directory = str(tmp_path / "records")
+    store, ids = superseded_store(directory, compact_ratio=None)
+    before = log_contents(store, ids)
+    store.close()
+    assert cli.main(["compact", "--db", directory]) == cli.EXIT_OK
+    assert "清理旧记录 16 条" in capsys.readouterr().err
+
+    store = LogStore(directory).load()
+    assert store.dead_records() == 0
+    assert log_contents(store, ids) == before
+    store.close()
+    assert cli.main(["compact", "--db", str(tmp_path / "missing")]) == cli.EXIT_ERROR
@@ -0,0 +1,42 @@
+from idcard.importer import ImportResult
+from idcard.progress import ProgressReporter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_finish_emits_coalesced_update():
+    clock = FakeClock()
+    seen = []
+    reporter = ProgressReporter(seen.append, max_rate=1, clock=clock)
+    result = ImportResult(bytes_total=100)
+    for step in range(1, 4):
+        clock.now = step * 0.1
+        result.success = step
+        result.offset = step * 10
+        reporter(result)
+    assert [snapshot.success for snapshot in seen] == [1]
+    reporter.finish()
+    assert seen[-1].success == 3
+    assert seen[-1].bytes_done == 30
+
+
+def test_rate_counts_existing_rows():
+    clock = FakeClock()
+    seen = []
+    reporter = ProgressReporter(seen.append, clock=clock)
+    result = ImportResult()
+    result.success = 10
+    result.existing = 30
+    result.rejects["length"] = 10
+    clock.now = 2.0
+    reporter(result)
+    snapshot = seen[-1]
+    assert snapshot.rows == 50
+    assert snapshot.rows_per_sec == 25
+    assert "已存在：30" in snapshot.format()
@@ -0,0 +1,88 @@
+import pytest
+
+import idcard.table
+from idcard.browse import SORT_AREA, SORT_BIRTH, SORT_NAME, RowSource, store_source
+from idcard.query import RecordFilter, RecordQuery
+from idcard.search import SearchIndex
+from idcard.table import RecordTable
+
+ROWS = [
+    ("张三", "110101199001010011"),
+    ("李四", "320504196309031531"),
+    ("王五", "11010119850101002X"),
+    ("张伟明", "440305200012120022"),
+    ("怪人", "12345"),
+    ("李四", "320504197001010046"),
+]
+ADDED = [("赵六", "320581199912310015"), ("张三", "110101200105050024")]
+
+QUERIES = [
+    RecordQuery(("32",)),
+    RecordQuery((), 19800101, 19991231),
+    RecordQuery(("110101", "4403"), gender="女"),
+    RecordQuery(),
+]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    # 新增记录每两条写入一次列，筛选与排序同时覆盖列中与缓冲区中的行
+    monkeypatch.setattr(idcard.table, "MIN_PENDING", 2)
+    table = RecordTable.from_rows(ROWS)
+    for name, id_number in ADDED:
+        table.add(name, id_number)
+    table.add("新人", "330482201006303031")
+    return table
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_filter_matches_row_by_row(table, query):
+    expected = [
+        row for row in range(len(table)) if query.matches(*table.fields_at(row))
+    ]
+    assert list(map(int, RecordFilter(table).select(query))) == expected
+
+
+@pytest.mark.parametrize(
+    "key, field",
+    [
+        (SORT_NAME, lambda table, row: table.name_at(row)),
+        (SORT_BIRTH, lambda table, row: table.fields_at(row)[1]),
+        (SORT_AREA, lambda table, row: table.fields_at(row)[0]),
+    ],
+)
+def test_browse_sorts_table_rows(table, key, field):
+    view = RowSource(table).ordered_by(key)
+    expected = sorted(range(len(table)), key=lambda row: field(table, row))
+    assert [view.row_number(position) for position in range(len(view))] == expected
+    assert view.rows(0, len(view)) == [
+        (table.name_at(row), table.id_at(row)) for row in expected
+    ]
+
+
+def test_store_source_reads_store_table(tmp_path):
+    from idcard.store import RecordStore
+
+    path = tmp_path / "database.sfz"
+    path.write_text(
+        "".join(f"{name},{id_number},\n" for name, id_number in ROWS), encoding="utf-8"
+    )
+    store = RecordStore(str(path)).load()
+    source = store_source(store)
+    assert source.records is store.table
+    assert source.rows(0, 2) == list(store.scan())[:2]
+
+
+def test_search_uses_table(table):
+    index = SearchIndex(table)
+    everything = [id_number for _, id_number in table.scan()]
+    for prefix in ("3205", "110101199001010011", "11010119850101002x", "1", "9", "12"):
+        expected = sorted(i for i in everything if i.startswith(prefix.upper()))
+        assert index.search_ids(prefix) == expected
+    assert index.count("张三") == 2
+    assert index.search("zw") == ["张伟明"]
+
+    table.add("钱七", "110101199202020033")
+    index.add("钱七", "110101199202020033")
+    assert index.search("钱") == ["钱七"]
+    assert index.has_id("110101199202020033")
@@ -0,0 +1,110 @@
+import pytest
+
+import idcard.search
+from idcard.search import (
+    SearchIndex,
+    char_initial,
+    is_id_query,
+    name_grams,
+    name_initials,
+)
+
+ROWS = [
+    ("张三", "110101199001010011"),
+    ("张三", "110101200105050024"),
+    ("张三丰", "320504196309031531"),
+    ("张伟明", "440305200012120022"),
+    ("张维民", "440305199912120013"),
+    ("赵爽", "11010119850101002X"),
+    ("李四", "320504197001010046"),
+    ("王五", "330482201006303031"),
+]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex.from_rows(ROWS)
+
+
+def test_initials_of_names():
+    assert char_initial("张") == "z"
+    assert char_initial("A") == "a"
+    assert name_initials("张三丰") == "zsf"
+    assert name_initials("赵爽") == "zs"
+    assert name_grams("张伟明") == {"张伟", "伟明", "张\x00明"}
+    assert is_id_query("3205")
+    assert is_id_query("11010119850101002x")
+    assert not is_id_query("张三")
+    assert not is_id_query("x123")
+
+
+def test_prefix_uses_sorted_names(index):
+    assert index.names == sorted(set(name for name, _ in ROWS))
+    assert index.prefix("张") == ["张三", "张三丰", "张伟明", "张维民"]
+    assert index.prefix("张三") == ["张三", "张三丰"]
+    assert index.prefix("张", limit=2) == ["张三", "张三丰"]
+    assert index.prefix("钱") == []
+
+
+def test_initials_ranked_by_count(index):
+    # 张三有两条记录，排在赵爽之前；张三丰的首字母zsf同样以zs开头
+    found = index.initials("zs")
+    assert found[0] == "张三"
+    assert sorted(found) == ["张三", "张三丰", "赵爽"]
+    assert index.initials("ZSF") == ["张三丰"]
+    assert index.initials("z") == []  # 单个字母不匹配
+    assert index.initials("张三") == []
+
+
+def test_fuzzy_shares_grams(index):
+    # 只有“张伟明”与之共享隔一字的字对“张□明”
+    assert index.fuzzy("张卫明") == ["张伟明"]
+    # 相似度为共享字对占两者字对并集的比例，较短的“张三”更相似
+    assert index.fuzzy("张三峰") == ["张三", "张三丰"]
+    assert index.fuzzy("钱七") == []
+
+
+def test_search_orders_prefix_initials_fuzzy(index):
+    assert index.search("张三")[:2] == ["张三", "张三丰"]
+    assert index.search("zs")[0] == "张三"
+    assert index.search("张卫明") == ["张伟明"]
+    assert index.search("  ") == []
+    assert len(index.search("张", limit=3)) == 3
+
+
+def test_search_ids(index):
+    assert index.search_ids("4403") == ["440305199912120013", "440305200012120022"]
+    assert index.search_ids("11010119850101002x") == ["11010119850101002X"]
+    assert index.search_ids("110101", limit=2) == [
+        "11010119850101002X",
+        "110101199001010011",
+    ]
+    assert index.search_ids("9") == []
+    assert index.has_id("11010119850101002x")
+    assert not index.has_id("110101199001010012")
+
+
+def test_names_added_after_build(index):
+    table = index.table
+    for name, id_number in [
+        ("张小明", "110101201001010015"),
+        ("张三", "110101201202020016"),
+    ]:
+        table.add(name, id_number)
+        index.add(name, id_number)
+    assert index.delta_names == {"张小明"}  # 已有的姓名不进入增量表
+    assert index.prefix("张") == ["张三", "张三丰", "张伟明", "张小明", "张维民"]
+    assert "张小明" in index.initials("zxm")
+    assert "张小明" in index.fuzzy("张晓明")
+    assert index.count("张三") == 3
+    assert index.search_ids("1101012010") == ["110101201001010015"]
+
+
+def test_needs_rebuild(index, monkeypatch):
+    monkeypatch.setattr(idcard.search, "MAX_DELTA", 1)
+    index.table.add("钱七", "110101199202020033")
+    index.add("钱七", "110101199202020033")
+    assert not index.needs_rebuild
+    index.table.add("孙八", "110101199303030034")
+    index.add("孙八", "110101199303030034")
+    assert index.needs_rebuild
@@ -0,0 +1,199 @@
+import asyncio
+import json
+
+import pytest
+
+from idcard.server import IdService, start_server
+from idcard.store import RecordStore
+from idcard.validator import CHECK_CODES, COEFFS
+
+AREA_CODES = {"110101": "北京市东城区", "320504": "江苏省苏州市金阊区"}
+
+
+def with_check(head):
+    """补上校验码的18位身份证号"""
+    return head + CHECK_CODES[sum(int(d) * c for d, c in zip(head, COEFFS)) % 11]
+
+
+ZHANG = with_check("11010119900101001")
+LI = with_check("32050419630903153")
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = RecordStore(str(tmp_path / "database.sfz")).load()
+    store.add("张三", ZHANG, "北京市东城区")
+    store.add("张三", LI, "江苏省苏州市金阊区")
+    yield IdService(AREA_CODES, store)
+    store.close()
+
+
+def run(service, client):
+    """在端口0上启动服务，client(port)结束后关闭"""
+
+    async def main():
+        server = await start_server(service, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await client(port)
+
+    return asyncio.run(main())
+
+
+async def read_response(reader):
+    """读取一个响应，返回(状态码, 首部, 响应体)"""
+    status_line = await reader.readline()
+    if not status_line:
+        return None
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        body = b""
+        while True:
+            size = int(await reader.readline(), 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    else:
+        body = await reader.readexactly(int(headers["content-length"]))
+    return status, headers, body
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await read_response(reader)
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+def get(path):
+    return f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+
+def test_check(service):
+    async def client(port):
+        return [
+            await request(port, get(f"/check?id={ZHANG}")),
+            await request(port, get("/check?id=12345")),
+        ]
+
+    (status, headers, body), (_, _, invalid) = run(service, client)
+    assert status == 200
+    assert headers["content-type"].startswith("application/json")
+    assert json.loads(body) == service.check(ZHANG)
+    assert json.loads(body)["info"]["户籍地"] == "北京市东城区"
+    assert json.loads(invalid)["valid"] is False
+
+
+def test_lookup(service):
+    async def client(port):
+        return await request(port, get("/lookup?name=%E5%BC%A0%E4%B8%89&limit=1"))
+
+    status, _, body = run(service, client)
+    assert status == 200
+    assert json.loads(body) == {"name": "张三", "total": 2, "ids": [ZHANG]}
+
+
+BATCH_LINES = [f'"{ZHANG}"', json.dumps({"id": LI}), "12345", "", "11010119900101001X"]
+
+
+def expected_batch(service):
+    ids = [ZHANG, LI, "12345", "11010119900101001X"]
+    return [service.check(id_number) for id_number in ids]
+
+
+def test_batch_with_content_length(service):
+    body = "\n".join(BATCH_LINES).encode("utf-8")
+
+    async def client(port):
+        head = f"POST /batch HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n"
+        return await request(port, head.encode() + body)
+
+    status, headers, data = run(service, client)
+    assert status == 200
+    assert headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+    assert results == expected_batch(service)
+
+
+def test_batch_with_chunked_body(service):
+    # 块边界落在行中间
+    body = ("\n".join(BATCH_LINES) + "\n").encode("utf-8")
+    chunks = [body[:7], body[7:30], body[30:]]
+
+    async def client(port):
+        raw = b"POST /batch HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+        for chunk in chunks:
+            raw += b"%x\r\n%s\r\n" % (len(chunk), chunk)
+        return await request(port, raw + b"0\r\n\r\n")
+
+    status, _, data = run(service, client)
+    assert status == 200
+    results = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+    assert results == expected_batch(service)
+
+
+def test_keep_alive_reuses_connection(service):
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for path in (f"/check?id={ZHANG}", "/lookup?name=%E5%BC%A0%E4%B8%89"):
+            writer.write(get(path))
+            await writer.drain()
+            responses.append(await read_response(reader))
+        body = f"{LI}\n".encode()
+        writer.write(b"POST /batch HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body))
+        writer.write(body)
+        await writer.drain()
+        responses.append(await read_response(reader))
+        writer.write(b"GET /check?id=12345 HTTP/1.1\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        responses.append(await read_response(reader))
+        closed = await reader.read() == b""
+        writer.close()
+        await writer.wait_closed()
+        return responses, closed
+
+    responses, closed = run(service, client)
+    assert [status for status, _, _ in responses] == [200] * 4
+    assert [headers["connection"] for _, headers, _ in responses] == [
+        "keep-alive",
+        "keep-alive",
+        "keep-alive",
+        "close",
+    ]
+    assert closed
+
+
+@pytest.mark.parametrize(
+    "raw, status",
+    [
+        (get("/check"), 400),
+        (get("/lookup"), 400),
+        (get("/lookup?name=x&offset=a"), 400),
+        (b"GARBAGE\r\n\r\n", 400),
+        (b"POST /batch HTTP/1.1\r\nContent-Length: abc\r\n\r\n", 400),
+        (b"GET /check?id=1 HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400),
+        (get("/nothing"), 404),
+        (get("/batch"), 405),
+    ],
+)
+def test_error_responses(service, raw, status):
+    async def client(port):
+        return await request(port, raw)
+
+    response = run(service, client)
+    assert response is not None
+    assert response[0] == status
+    assert "error" in json.loads(response[2])
@@ -0,0 +1,81 @@
+import pytest
+
+from idcard.store import RecordStore
+
+ROWS = [
+    ("张三", "110101199001010011", "北京市东城区"),
+    ("李四", "12345", "未知"),
+    ("王五", "11010119900101002X", "北京市东城区"),
+    ("张三丰", "110101199001010011", "北京市东城区"),
+    ("张三", "320504196309031531", "江苏省苏州市"),
+]
+
+
+def write_rows(path, rows):
+    with open(path, "a", encoding="utf-8") as f:
+        for name, id_number, area in rows:
+            f.write(f"{name},{id_number},{area}\n")
+
+
+def contents(store):
+    table = store.table
+    return (
+        list(store.scan()),
+        [table.fields_at(row) for row in range(len(table))],
+        {name: store.ids_for_name(name) for name, _, _ in ROWS},
+        {id_number: store.name_of(id_number) for _, id_number, _ in ROWS},
+    )
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "database.sfz")
+    write_rows(path, ROWS)
+    return path
+
+
+def test_snapshot_matches_full_load(csv_path):
+    full = RecordStore(csv_path, snapshot=False).load()
+    store = RecordStore(csv_path).load()
+    assert store.save_snapshot()
+
+    restored = RecordStore(csv_path).load()
+    assert restored._snapshot_rows == len(full)
+    assert contents(restored) == contents(full)
+
+    # 快照之后追加的行逐条并入，重复的身份证号仍只保留第一条
+    write_rows(csv_path, [("赵六", "110101200001010033", "北京市东城区"), ROWS[3]])
+    full = RecordStore(csv_path, snapshot=False).load()
+    restored = RecordStore(csv_path).load()
+    assert len(restored) == len(full) == 5
+    assert contents(restored) == contents(full)
+
+
+def test_snapshot_ignored_after_same_length_edit(tmp_path):
+    # 被改动的行前后各有远多于4 KiB的内容
+    filler = [("某人", f"3301{i:013d}1", "浙江省杭州市") for i in range(500)]
+    csv_path = str(tmp_path / "database.sfz")
+    write_rows(csv_path, filler + ROWS + filler)
+    RecordStore(csv_path).load().save_snapshot()
+    with open(csv_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    # 改动位于文件中间且长度不变
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write(text.replace("王五", "王六"))
+
+    store = RecordStore(csv_path).load()
+    assert store._snapshot_rows == 0
+    assert store.name_of("11010119900101002X") == "王六"
+
+
+def test_snapshot_excludes_buffered_writer_rows(csv_path):
+    store = RecordStore(csv_path).load()
+    writer = store.open_writer(flush_rows=100, flush_ms=60000)
+    writer.add("赵六", "110101200001010033", "北京市东城区")
+    assert not store.save_snapshot()
+    writer.close()
+    assert store.save_snapshot()
+
+    restored = RecordStore(csv_path).load()
+    assert restored._snapshot_rows == len(store) == 5
+    assert restored.name_of("110101200001010033") == "赵六"
@@ -0,0 +1,33 @@
+import pytest
+
+from idcard.validator import (
+    REASON_CHECK_CODE,
+    REASON_DIGITS,
+    REASON_LENGTH,
+    REASON_OK,
+    _validate_batch_python,
+    check_reason,
+    validate_batch,
+)
+
+CASES = [
+    ("32050419630903153X", REASON_OK),
+    ("32050419630903153x", REASON_OK),
+    ("320504196309031531", REASON_CHECK_CODE),
+    ("3205041963090315", REASON_LENGTH),
+    ("3205041963O903153X", REASON_DIGITS),
+    ("３2050419630903153X", REASON_DIGITS),  # 全角数字
+    ("٣2050419630903153X", REASON_DIGITS),  # 阿拉伯-印度数字
+]
+
+
+@pytest.mark.parametrize("id_number, reason", CASES)
+def test_check_reason(id_number, reason):
+    assert check_reason(id_number) == reason
+
+
+def test_batch_paths_agree_with_scalar():
+    ids = [id_number for id_number, _ in CASES]
+    expected = [reason for _, reason in CASES]
+    assert list(_validate_batch_python(ids)[1]) == expected
+    assert [int(reason) for reason in validate_batch(ids)[1]] == expected